@@ -1,3 +1,10 @@
 from django.contrib import admin
+from .models import BackgroundTask
 
-# Register your models here.
+
+@admin.register(BackgroundTask)
+class BackgroundTaskAdmin(admin.ModelAdmin):
+    list_display = ('title', 'name', 'status', 'progress', 'attempts', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('title', 'name')
+    readonly_fields = ('created_at', 'started_at', 'finished_at', 'locked_by')
@@ -0,0 +1,115 @@
+# core/instrumentation.py
+"""
+Per-request timings: database (query count and time), template rendering,
+WeasyPrint and anything else wrapped in timed(). ServerTimingMiddleware
+(core/middleware.py) starts the measurement for each request and reports it.
+
+Everything is cheap enough for production: a perf_counter() pair per query
+and per timed block, and the SQL text is only kept for the sampled
+requests (PERF_SLOW_SAMPLE_RATE) so the slow ones can be logged with their
+slowest statements.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# The RequestMetrics of the request being handled (None outside a request)
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    def __init__(self, keep_sql=False):
+        self.started = time.perf_counter()
+        self.db_count = 0
+        self.db_ms = 0.0
+        # name -> milliseconds, e.g. {'tpl': 12.5, 'pdf': 340.1}
+        self.spans = {}
+        self.keep_sql = keep_sql
+        self.queries = []  # (milliseconds, sql), only when keep_sql
+        self._depth = {}
+
+    @property
+    def total_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def add(self, name, ms):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def slowest_queries(self, limit):
+        return sorted(self.queries, key=lambda q: q[0], reverse=True)[:limit]
+
+
+def current():
+    return _current.get()
+
+
+def start(keep_sql=False):
+    """Starts measuring the current request; returns (metrics, token for stop())."""
+    metrics = RequestMetrics(keep_sql)
+    return metrics, _current.set(metrics)
+
+
+def stop(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    """
+    Adds the time spent in the block to the current request's `name` span.
+    Nested blocks of the same name (an include rendering a template inside a
+    template) are only counted once. Does nothing outside a request.
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    depth = metrics._depth.get(name, 0)
+    metrics._depth[name] = depth + 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._depth[name] = depth
+        if depth == 0:
+            metrics.add(name, (time.perf_counter() - started) * 1000)
+
+
+def query_timer(execute, sql, params, many, context):
+    """connection.execute_wrapper() hook: counts and times every query of the request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        ms = (time.perf_counter() - started) * 1000
+        metrics.db_count += 1
+        metrics.db_ms += ms
+        if metrics.keep_sql:
+            metrics.queries.append((ms, sql))
+
+
+_installed = False
+
+
+def install_template_timing():
+    """
+    Times every template render as the 'tpl' span. render() and
+    render_to_string() all go through the backend Template.render.
+    Installed once, by ServerTimingMiddleware.
+    """
+    global _installed
+    if _installed:
+        return
+    from django.template.backends.django import Template
+
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        with timed('tpl'):
+            return original(self, *args, **kwargs)
+
+    Template.render = render
+    _installed = True
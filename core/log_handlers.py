@@ -1,54 +1,238 @@
 # In core/log_handlers.py
 
 import logging
+import os
+import queue
+import threading
+import time
 import traceback # Import the traceback library
 from django.conf import settings
 from discord_webhook import DiscordWebhook, DiscordEmbed
 
+# Discord accepts up to 10 embeds and 6000 characters of embed text per message
+MAX_EMBEDS = 10
+MAX_MESSAGE_CHARS = 5500
+
+
 class DiscordWebhookHandler(logging.Handler):
+    """
+    Sends log records to the Discord webhook without blocking the request:
+    emit() only formats the record and puts it on a bounded queue, and a
+    background thread posts them in batches.
+    - identical errors (same exception type and place, or same message)
+      within dedup_window seconds are sent once, then summed up as
+      "repeated N times"
+    - at most one webhook call per min_interval seconds (Discord's 429
+      retry_after is honoured on top)
+    - when the queue is full new records are dropped and counted; the
+      next message says how many were lost
+    """
+
+    def __init__(self, level=logging.NOTSET, queue_size=500, flush_interval=2.0, dedup_window=300.0,
+                 min_interval=1.0, timeout=5.0, url=None):
+        super().__init__(level)
+        self.queue_size = queue_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self.url = url  # defaults to settings.DISCORD_WEBHOOK_URL
+
+        # Counters, for the drop notice (and tests)
+        self.dropped = 0
+        self.deduplicated = 0
+        self.sent = 0
+        self.failed = 0
+
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    # ----- Called in the logging thread -----
+
     def emit(self, record):
         try:
-            webhook_url = getattr(settings, 'DISCORD_WEBHOOK_URL', None)
+            webhook_url = self.url or getattr(settings, 'DISCORD_WEBHOOK_URL', None)
             if not webhook_url:
                 return
 
-            # --- NEW, SMARTER MESSAGE FORMATTING ---
-
-            # If an exception happened, format it nicely
-            if record.exc_info:
-                exc_type, exc_value, exc_traceback = record.exc_info
-                
-                # Get the last frame of the traceback for the file and line number
-                tb_frame = traceback.extract_tb(exc_traceback)[-1]
-                file_name = tb_frame.filename.split('/')[-1].split('\\')[-1] # Get just the filename
-                line_no = tb_frame.lineno
-                
-                error_title = f"🚨 Unhandled Exception: {exc_type.__name__}"
-                error_description = f"**{exc_value}**\n\n"
-                error_description += f"An error occurred in file `{file_name}` at line `{line_no}`."
-                
-                # Get the full traceback as a string
-                full_traceback = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
-                
-                # Add the traceback in a collapsible code block
-                error_description += f"\n\n**Traceback:**\n```\n{full_traceback[:1500]}...\n```"
-
-            else:
-                # For non-error messages, keep it simple
-                error_title = f'ℹ️ Application Log: {record.levelname}'
-                error_description = self.format(record)
-
-            # Create the embed
-            embed = DiscordEmbed(
-                title=error_title,
-                description=error_description,
-                color='E74C3C'
-            )
-            embed.set_timestamp()
-
-            webhook = DiscordWebhook(url=webhook_url)
-            webhook.add_embed(embed)
-            response = webhook.execute()
-
+            self._ensure_worker()
+            try:
+                self._queue.put_nowait(self._embed(record))
+            except queue.Full:
+                self.dropped += 1
         except Exception:
-            self.handleError(record)
\ No newline at end of file
+            self.handleError(record)
+
+    def _embed(self, record):
+        """Returns (fingerprint, title, description) for the record."""
+        # If an exception happened, format it nicely
+        if record.exc_info:
+            exc_type, exc_value, exc_traceback = record.exc_info
+
+            # Get the last frame of the traceback for the file and line number
+            tb_frame = traceback.extract_tb(exc_traceback)[-1]
+            file_name = tb_frame.filename.split('/')[-1].split('\\')[-1] # Get just the filename
+            line_no = tb_frame.lineno
+
+            error_title = f"🚨 Unhandled Exception: {exc_type.__name__}"
+            error_description = f"**{exc_value}**\n\n"
+            error_description += f"An error occurred in file `{file_name}` at line `{line_no}`."
+
+            # Get the full traceback as a string
+            full_traceback = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
+
+            # Add the traceback in a collapsible code block
+            error_description += f"\n\n**Traceback:**\n```\n{full_traceback[:1500]}...\n```"
+            # The same exception from the same place is the same error, whatever the message
+            fingerprint = (exc_type.__name__, tb_frame.filename, line_no)
+        else:
+            # For non-error messages, keep it simple
+            error_title = f'ℹ️ Application Log: {record.levelname}'
+            error_description = self.format(record)
+            fingerprint = (record.levelname, record.getMessage())
+
+        return fingerprint, error_title, error_description
+
+    def _ensure_worker(self):
+        # (Re)start the worker lazily: after a fork (gunicorn workers) the
+        # parent's thread does not exist in the child
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(maxsize=self.queue_size)
+            self._seen = {}
+            self._last_post = 0.0
+            self._reported_drops = 0
+            self._thread = threading.Thread(target=self._run, name='discord-log-handler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def flush(self, timeout=10.0):
+        """Waits (up to timeout seconds) until everything queued so far has been sent."""
+        if self._queue is None or self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def close(self):
+        self.flush(timeout=2.0)
+        super().close()
+
+    # ----- Background thread -----
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                embeds = self._deduplicate(batch) + self._repeat_summaries()
+                if self.dropped > self._reported_drops:
+                    lost = self.dropped - self._reported_drops
+                    embeds.append(('⚠️ Log records dropped', f"{lost} log record(s) were dropped (queue full)."))
+                    self._reported_drops = self.dropped
+                self._post(embeds)
+            except Exception:
+                # Never let the worker die; the records of this batch are lost
+                self.failed += len(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _collect(self):
+        """Waits for a record, then gathers whatever else arrives within flush_interval."""
+        try:
+            batch = [self._queue.get(timeout=self.dedup_window)]
+        except queue.Empty:
+            # Nothing new: still report repeats whose window ran out
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return batch
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                return batch
+
+    def _deduplicate(self, batch):
+        """Keeps the first record of each fingerprint per dedup_window, counts the rest."""
+        now = time.monotonic()
+        embeds = []
+        for fingerprint, title, description in batch:
+            seen = self._seen.get(fingerprint)
+            if seen and now - seen['since'] < self.dedup_window:
+                seen['repeats'] += 1
+                self.deduplicated += 1
+                continue
+            self._seen[fingerprint] = {'since': now, 'repeats': 0, 'title': title}
+            embeds.append((title, description))
+        return embeds
+
+    def _repeat_summaries(self):
+        """One embed per error whose window ran out with repeats in it."""
+        now = time.monotonic()
+        embeds = []
+        for fingerprint, seen in list(self._seen.items()):
+            if now - seen['since'] < self.dedup_window:
+                continue
+            if seen['repeats']:
+                embeds.append((
+                    f"🔁 Repeated: {seen['title']}",
+                    f"Happened {seen['repeats']} more time(s) in the last {self.dedup_window:.0f} seconds.",
+                ))
+            del self._seen[fingerprint]
+        return embeds
+
+    def _post(self, embeds):
+        """Sends the embeds in as few webhook calls as Discord's limits allow."""
+        message = []
+        size = 0
+        for title, description in embeds:
+            length = len(title) + len(description)
+            if message and (len(message) == MAX_EMBEDS or size + length > MAX_MESSAGE_CHARS):
+                self._send(message)
+                message, size = [], 0
+            message.append((title, description))
+            size += length
+        if message:
+            self._send(message)
+
+    def _send(self, message):
+        webhook_url = self.url or getattr(settings, 'DISCORD_WEBHOOK_URL', None)
+        for attempt in range(2):
+            # Rate limit: keep min_interval between calls
+            wait = self._last_post + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+
+            webhook = DiscordWebhook(url=webhook_url, timeout=self.timeout)
+            for title, description in message:
+                # Create the embed
+                embed = DiscordEmbed(title=title, description=description, color='E74C3C')
+                embed.set_timestamp()
+                webhook.add_embed(embed)
+            try:
+                response = webhook.execute()
+            except Exception:
+                self._last_post = time.monotonic()
+                break
+            self._last_post = time.monotonic()
+
+            if response.status_code == 429 and attempt == 0:
+                # Discord says how long to back off
+                try:
+                    retry_after = float(response.json().get('retry_after', 1))
+                except ValueError:
+                    retry_after = 1.0
+                time.sleep(min(retry_after, 30))
+                continue
+            if response.status_code < 300:
+                self.sent += len(message)
+                return
+            break
+        self.failed += len(message)
@@ -0,0 +1,298 @@
+# core/management/commands/benchmark_portal.py
+
+import json
+import random
+import time
+import tracemalloc
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core.models import BackgroundTask
+from core.tasks import run_task, worker_name
+from inventory.models import InventoryItem, InventoryStatusCounter
+from jobs.models import DeliveryTicket, Job, ReceivingTicket
+from jobs.utils import outstanding_items
+
+# (endpoint, weight): how often each one comes up in the workload mix.
+# Roughly what the yard team does in a day: lots of searching and job pages,
+# fewer tickets, PDFs and exports.
+WORKLOAD = [
+    ('dashboard', 8),
+    ('inventory_list', 5),
+    ('inventory_list_search', 3),
+    ('item_details', 4),
+    ('inventory_filtered_list', 4),
+    ('ajax_inventory_search', 12),
+    ('ajax_inventory_search_prefix', 8),
+    ('job_list', 6),
+    ('job_list_search', 3),
+    ('job_detail', 6),
+    ('job_detail_sections', 6),
+    ('ajax_smart_search', 8),
+    ('delivery_quick_create', 2),
+    ('receiving_quick_create', 2),
+    ('ticket_pdf', 2),
+    ('export_inventory', 1),
+    ('job_export', 1),
+]
+
+# Endpoints that only enqueue a background task: the task runs inline, in
+# the timed request, so the export itself is measured (not just the redirect)
+RUNS_TASK = {'export_inventory', 'job_export'}
+
+# Sample targets (jobs, serials...) are drawn from pools of this size
+POOL_SIZE = 200
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Replays a weighted workload mix of portal requests through the Django test client as a logged-in '
+        'user and reports p50/p95/p99 latency, queries per request and peak memory per endpoint. '
+        'Peak memory is what one request allocates in this process (tracemalloc, reset before each request; '
+        'PDF render workers are not included). Exports run their background task inline. '
+        'Requests that write are rolled back. Run it against a seeded database (see seed_fleet); '
+        'write the results with --output and compare them with --baseline.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests in the workload mix.')
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per endpoint first.')
+        parser.add_argument('--only', nargs='+', choices=[name for name, _ in WORKLOAD], help='Endpoints to run.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--username', default='benchmark', help='User to log in as (created if missing).')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed p95 slowdown against the baseline, as a fraction (0.2 = 20%%).',
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        workload = [(name, weight) for name, weight in WORKLOAD if not options['only'] or name in options['only']]
+
+        self._load_targets()
+        user, _ = User.objects.get_or_create(username=options['username'], defaults={'is_staff': True})
+        self.client = Client()
+        self.client.force_login(user)
+
+        mix = self.rng.choices([name for name, _ in workload], weights=[w for _, w in workload], k=options['requests'])
+        samples = {name: {'ms': [], 'queries': [], 'errors': 0, 'peak_mb': []} for name, _ in workload}
+
+        tracemalloc.start()
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for name, _ in workload:
+                for _ in range(options['warmup']):
+                    self._request(name)
+
+            self.stdout.write(f"Replaying {len(mix)} requests over {len(workload)} endpoints...")
+            for name in mix:
+                elapsed, queries, peak, ok = self._request(name)
+                sample = samples[name]
+                sample['ms'].append(elapsed)
+                sample['queries'].append(queries)
+                sample['peak_mb'].append(peak)
+                sample['errors'] += not ok
+        tracemalloc.stop()
+
+        results = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'database': connection.vendor,
+                'items': InventoryItem.objects.count(),
+                'jobs': Job.objects.count(),
+                'requests': len(mix),
+                'seed': options['seed'],
+            },
+            'endpoints': {name: self._summary(sample) for name, sample in samples.items() if sample['ms']},
+        }
+        self._report(results['endpoints'])
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['baseline']:
+            self._compare(results['endpoints'], options['baseline'], options['threshold'])
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    # ----- Targets -----
+
+    def _load_targets(self):
+        """Picks the jobs, tickets, serials and buckets the requests point at."""
+        self.jobs = list(
+            Job.objects.filter(status='open').exclude(delivery_tickets=None)
+            .order_by('-date').values_list('id', flat=True)[:POOL_SIZE]
+        )
+        if not self.jobs:
+            raise CommandError('No open jobs with delivery tickets; seed some data first (manage.py seed_fleet).')
+        self.serials = list(InventoryItem.objects.order_by('-id').values_list('serial_number', flat=True)[:POOL_SIZE * 10])
+        self.available = list(
+            InventoryItem.objects.filter(status='available').order_by('-id').values_list('serial_number', flat=True)[:POOL_SIZE * 10]
+        )
+        self.buckets = list(
+            InventoryStatusCounter.objects.filter(count__gt=0).order_by('-count')
+            .values_list('category_id', 'location')[:POOL_SIZE]
+        )
+        self.tickets = [
+            ('delivery', pk) for pk in DeliveryTicket.objects.order_by('-id').values_list('id', flat=True)[:POOL_SIZE]
+        ] + [
+            ('receiving', pk) for pk in ReceivingTicket.objects.order_by('-id').values_list('id', flat=True)[:POOL_SIZE]
+        ]
+
+    def _substring(self):
+        serial = self.rng.choice(self.serials)
+        start = self.rng.randint(0, max(0, len(serial) - 5))
+        return serial[start:start + 5]
+
+    # ----- Requests -----
+
+    def _calls(self, name):
+        """Returns the (method, url, data) calls that make up one request of `name`."""
+        job = self.rng.choice(self.jobs)
+        if name == 'dashboard':
+            return [('get', reverse('dashboard'), None)]
+        if name == 'inventory_list':
+            return [('get', reverse('inventory_list'), None)]
+        if name == 'inventory_list_search':
+            return [('get', reverse('inventory_list'), {'q': self._substring()})]
+        if name == 'item_details':
+            category_id, location = self.rng.choice(self.buckets)
+            return [('get', reverse('get_item_details', args=[category_id, location]), None)]
+        if name == 'inventory_filtered_list':
+            status = self.rng.choice(InventoryItem.STATUS_CHOICES)[0]
+            return [('get', reverse('inventory_filtered_list'), {'status': status})]
+        if name == 'ajax_inventory_search':
+            return [('get', reverse('ajax_inventory_search'), {'q': self._substring()})]
+        if name == 'ajax_inventory_search_prefix':
+            return [('get', reverse('ajax_inventory_search'), {'q': self.rng.choice(self.serials)[:-2], 'mode': 'prefix'})]
+        if name == 'job_list':
+            return [('get', reverse('job_list'), None)]
+        if name == 'job_list_search':
+            return [('get', reverse('job_list'), {'q': f"Rig {self.rng.randint(1, 60)}"})]
+        if name == 'job_detail':
+            return [('get', reverse('job_detail', args=[job]), None)]
+        if name == 'job_detail_sections':
+            # What htmx loads right after the job detail page
+            return [
+                ('get', reverse('job_section_outstanding', args=[job]), None),
+                ('get', reverse('job_section_attachments', args=[job]), None),
+                ('get', reverse('job_section_tickets', args=[job]), None),
+            ]
+        if name == 'ajax_smart_search':
+            search_type = self.rng.choice(['available', 'on_job'])
+            return [('get', reverse('ajax_smart_search', args=[job]), {'q': self._substring(), 'type': search_type})]
+        if name == 'delivery_quick_create':
+            serials = self.rng.sample(self.available, min(10, len(self.available)))
+            return [('post', reverse('delivery_ticket_quick_create', args=[job]), {'serial_numbers_text': '\n'.join(serials)})]
+        if name == 'receiving_quick_create':
+            serials = list(outstanding_items(Job.objects.get(id=job)).values_list('serial_number', flat=True)[:10])
+            return [('post', reverse('receiving_ticket_quick_create', args=[job]), {'serial_numbers_text': '\n'.join(serials)})]
+        if name == 'ticket_pdf':
+            ticket_type, ticket_id = self.rng.choice(self.tickets)
+            return [('get', reverse('ticket_pdf', args=[ticket_type, ticket_id]), None)]
+        if name == 'export_inventory':
+            return [('get', reverse('export_inventory_to_excel'), {'status': 'available'})]
+        if name == 'job_export':
+            return [('get', reverse('job_export', args=[job]), None)]
+        raise CommandError(f"Unknown endpoint {name}")
+
+    def _request(self, name):
+        """Makes one request of `name`; returns (milliseconds, queries, peak MB allocated, ok)."""
+        calls = self._calls(name)
+        ok = True
+        tasks = []
+        # Everything is rolled back, so POSTs (and exports) leave no rows behind
+        with transaction.atomic():
+            last_task = BackgroundTask.objects.order_by('-id').values_list('id', flat=True).first() or 0
+            with CaptureQueriesContext(connection) as queries:
+                tracemalloc.reset_peak()
+                started = time.perf_counter()
+                for method, url, data in calls:
+                    response = getattr(self.client, method)(url, data or {})
+                    ok = ok and response.status_code < 400
+                if name in RUNS_TASK:
+                    tasks = self._run_enqueued(last_task)
+                    ok = ok and bool(tasks) and all(task.status == 'succeeded' for task in tasks)
+                elapsed = (time.perf_counter() - started) * 1000
+                peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+            transaction.set_rollback(True)
+        # ...but files are not: drop the export files
+        for task in tasks:
+            if task.result_file:
+                task.result_file.delete(save=False)
+        return elapsed, len(queries.captured_queries), peak, ok
+
+    def _run_enqueued(self, last_task):
+        """Runs the tasks the request queued (ids after last_task), the way the worker would."""
+        tasks = list(BackgroundTask.objects.filter(id__gt=last_task, status='queued').order_by('id'))
+        for task in tasks:
+            task.status = 'running'
+            task.attempts += 1
+            task.locked_by = worker_name()[:100]
+            task.started_at = timezone.now()
+            task.save(update_fields=['status', 'attempts', 'locked_by', 'started_at'])
+            run_task(task)
+        return tasks
+
+    # ----- Results -----
+
+    def _summary(self, sample):
+        timings, queries = sample['ms'], sample['queries']
+        return {
+            'count': len(timings),
+            'errors': sample['errors'],
+            'p50_ms': round(percentile(timings, 0.50), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'p99_ms': round(percentile(timings, 0.99), 2),
+            'mean_ms': round(sum(timings) / len(timings), 2),
+            'queries_mean': round(sum(queries) / len(queries), 1),
+            'queries_max': max(queries),
+            'peak_mb': round(max(sample['peak_mb']), 1),
+        }
+
+    def _report(self, endpoints):
+        self.stdout.write(
+            f"{'endpoint':<30} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak MB':>8} {'errors':>7}"
+        )
+        for name, r in endpoints.items():
+            self.stdout.write(
+                f"{name:<30} {r['count']:>5} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+                f"{r['queries_mean']:>8.1f} {r['peak_mb']:>8.1f} {r['errors']:>7}"
+            )
+
+    def _compare(self, endpoints, baseline_path, threshold):
+        """Fails when an endpoint's p95 or query count got worse than the baseline allows."""
+        with open(baseline_path) as f:
+            baseline = json.load(f)['endpoints']
+
+        regressions = []
+        for name, r in endpoints.items():
+            before = baseline.get(name)
+            if not before:
+                continue
+            change = (r['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0
+            line = f"{name:<30} p95 {before['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms ({change:+.0%})"
+            if change > threshold:
+                regressions.append(line)
+            elif r['queries_max'] > before['queries_max']:
+                regressions.append(f"{line}, queries {before['queries_max']} -> {r['queries_max']}")
+            else:
+                self.stdout.write(line)
+
+        if regressions:
+            for line in regressions:
+                self.stdout.write(self.style.ERROR(line))
+            raise CommandError(f"{len(regressions)} endpoint(s) regressed against {baseline_path}.")
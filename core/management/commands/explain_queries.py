@@ -0,0 +1,50 @@
+# core/management/commands/explain_queries.py
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from core.query_audit import CANONICAL_QUERIES, Samples, explain, full_scans
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the canonical queries of the hot views (core/query_audit.py) against the '
+        'configured database and flags the ones that read a large table in full. '
+        'Use --strict to fail (e.g. in CI) when anything is flagged.'
+    )
+
+    def add_arguments(self, parser):
+        names = [name for name, _, _ in CANONICAL_QUERIES]
+        parser.add_argument('--only', nargs='+', choices=names, help='Queries to explain.')
+        parser.add_argument('--verbose', action='store_true', help='Print the plan of every query.')
+        parser.add_argument('--strict', action='store_true', help='Exit with an error when a query is flagged.')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in ('sqlite', 'mysql', 'postgresql'):
+            raise CommandError(f"Don't know how to read {vendor} plans.")
+
+        tables = connection.introspection.table_names()
+        samples = Samples()
+        flagged = []
+        for name, view, build in CANONICAL_QUERIES:
+            if options['only'] and name not in options['only']:
+                continue
+            queryset = build(samples)
+            plan = explain(queryset, vendor)
+            scans = full_scans(plan, vendor, limited=queryset.query.high_mark is not None, tables=tables)
+
+            if scans:
+                flagged.append(name)
+                self.stdout.write(self.style.WARNING(f"{name:<25} {view:<38} FULL SCAN: {', '.join(scans)}"))
+            else:
+                self.stdout.write(f"{name:<25} {view:<38} ok")
+            if options['verbose'] or scans:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if flagged and options['strict']:
+            raise CommandError(f"{len(flagged)} query(ies) read a large table in full: {', '.join(flagged)}")
+        if flagged:
+            self.stdout.write(self.style.WARNING(f"{len(flagged)} query(ies) flagged."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"No full scans on {vendor}."))
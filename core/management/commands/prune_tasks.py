@@ -0,0 +1,26 @@
+# core/management/commands/prune_tasks.py
+
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import BackgroundTask
+
+class Command(BaseCommand):
+    help = 'Deletes finished background tasks (and their result files) older than --days.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=7)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        old_tasks = BackgroundTask.objects.filter(status__in=['succeeded', 'failed'], finished_at__lt=cutoff)
+
+        removed = 0
+        for task in old_tasks.iterator():
+            for field_file in (task.input_file, task.result_file):
+                if field_file:
+                    field_file.delete(save=False)
+            task.delete()
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} finished task(s).'))
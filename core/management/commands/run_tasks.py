@@ -0,0 +1,50 @@
+# core/management/commands/run_tasks.py
+
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from core.tasks import claim_next, requeue_stale, run_task, worker_name
+
+class Command(BaseCommand):
+    help = (
+        'Runs queued background tasks (imports, exports, job ZIPs, inspection reports...). '
+        'Start as many workers as needed; they coordinate through the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Run every task that is due, then exit.')
+        parser.add_argument('--sleep', type=float, default=2.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument(
+            '--stale-after', type=int, default=60,
+            help='Minutes after which a running task is considered abandoned by its worker.',
+        )
+
+    def handle(self, *args, **options):
+        worker = worker_name()
+        stale_after = timedelta(minutes=options['stale_after'])
+        self.stdout.write(self.style.SUCCESS(f'Worker {worker} started.'))
+
+        while True:
+            close_old_connections()
+            requeued = requeue_stale(stale_after)
+            if requeued:
+                self.stdout.write(self.style.WARNING(f'Requeued {requeued} abandoned task(s).'))
+
+            task = claim_next(worker)
+            if task is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                continue
+
+            self.stdout.write(f'Running task {task.pk}: {task.title} (attempt {task.attempts})')
+            task = run_task(task)
+            if task.status == 'succeeded':
+                self.stdout.write(self.style.SUCCESS(f'Task {task.pk} succeeded.'))
+            elif task.status == 'queued':
+                self.stdout.write(self.style.WARNING(f'Task {task.pk} failed, will retry: {task.error}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Task {task.pk} failed: {task.error}'))
+
+        self.stdout.write(self.style.SUCCESS('Queue is empty.'))
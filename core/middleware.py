@@ -0,0 +1,82 @@
+# core/middleware.py
+import json
+import logging
+import random
+from contextlib import ExitStack
+from django.conf import settings
+from django.db import connections
+from . import instrumentation
+
+logger = logging.getLogger('core.performance')
+
+# Server-Timing descriptions of the spans
+SPAN_DESCRIPTIONS = {
+    'tpl': 'Templates',
+    'pdf': 'WeasyPrint',
+}
+
+
+class ServerTimingMiddleware:
+    """
+    Measures every request (total, database, templates, WeasyPrint) and
+    reports it twice:
+    - a Server-Timing header, which the browser dev tools show per request
+    - a JSON log line on the 'core.performance' logger, for requests slower
+      than PERF_SLOW_REQUEST_MS (a warning; for a sample of them,
+      PERF_SLOW_SAMPLE_RATE, with their slowest SQL statements), or for every
+      request (at INFO) when PERF_LOG_ALL_REQUESTS is on
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.log_all = getattr(settings, 'PERF_LOG_ALL_REQUESTS', False)
+        self.slow_ms = getattr(settings, 'PERF_SLOW_REQUEST_MS', 1000)
+        self.sample_rate = getattr(settings, 'PERF_SLOW_SAMPLE_RATE', 0.1)
+        self.slow_queries = getattr(settings, 'PERF_SLOW_QUERIES', 5)
+        instrumentation.install_template_timing()
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start(keep_sql=random.random() < self.sample_rate)
+        try:
+            with ExitStack() as stack:
+                for alias in settings.DATABASES:
+                    stack.enter_context(connections[alias].execute_wrapper(instrumentation.query_timer))
+                response = self.get_response(request)
+            total_ms = metrics.total_ms
+        finally:
+            instrumentation.stop(token)
+
+        response['Server-Timing'] = self._header(metrics, total_ms)
+        self._log(request, response, metrics, total_ms)
+        return response
+
+    def _header(self, metrics, total_ms):
+        entries = [f'db;dur={metrics.db_ms:.1f};desc="{metrics.db_count} queries"']
+        for name, ms in metrics.spans.items():
+            description = SPAN_DESCRIPTIONS.get(name)
+            entries.append(f'{name};dur={ms:.1f}' + (f';desc="{description}"' if description else ''))
+        entries.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(entries)
+
+    def _log(self, request, response, metrics, total_ms):
+        if total_ms < self.slow_ms and not self.log_all:
+            return
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': getattr(request.resolver_match, 'view_name', None),
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(metrics.db_ms, 1),
+            'db_queries': metrics.db_count,
+            **{f'{name}_ms': round(ms, 1) for name, ms in metrics.spans.items()},
+        }
+        if total_ms < self.slow_ms:
+            logger.info(json.dumps(record))
+            return
+
+        if metrics.keep_sql:
+            record['slowest_sql'] = [
+                {'ms': round(ms, 1), 'sql': sql} for ms, sql in metrics.slowest_queries(self.slow_queries)
+            ]
+        logger.warning(json.dumps(record))
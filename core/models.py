@@ -1,3 +1,74 @@
+import os
+import uuid
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+def task_file_path(instance, filename):
+    # A random directory per file: task files are served from MEDIA_URL, so they must not be guessable
+    return f"tasks/{uuid.uuid4().hex}/{os.path.basename(filename)}"
+
+
+class BackgroundTask(models.Model):
+    """
+    A unit of work for the database-backed task queue (see core/tasks.py).
+    Views enqueue a task and return at once; `manage.py run_tasks` workers pick
+    it up, and the task page polls its status and progress over htmx.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+
+    name = models.CharField(max_length=100, help_text="Registered task name, e.g. 'inventory.import_file'.")
+    title = models.CharField(max_length=255, help_text="What the user sees, e.g. 'Inventory import: fleet.xlsx'.")
+    params = models.JSONField(default=dict, blank=True)
+    input_file = models.FileField(upload_to=task_file_path, blank=True, null=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    progress = models.PositiveSmallIntegerField(null=True, blank=True, help_text="0-100, empty when unknown.")
+    progress_message = models.CharField(max_length=255, blank=True)
+
+    # Outcome: a JSON result (message, link, import summary...) and/or a file to download
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.FileField(upload_to=task_file_path, blank=True, null=True)
+    error = models.TextField(blank=True)
+
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=100, blank=True)
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            # The worker's "next task" lookup
+            models.Index(fields=['status', 'run_after'], name='core_task_status_run_after'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} ({self.get_status_display()})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+    def set_progress(self, done, total=None, message=''):
+        """
+        Records progress from inside a running task. Written with a plain UPDATE
+        (not save()) so it never overwrites other fields, and it commits right
+        away unless the task is inside a transaction itself.
+        """
+        self.progress = min(100, int(done * 100 / total)) if total else None
+        self.progress_message = message[:255]
+        BackgroundTask.objects.filter(pk=self.pk).update(
+            progress=self.progress, progress_message=self.progress_message
+        )
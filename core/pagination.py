@@ -0,0 +1,105 @@
+# core/pagination.py
+"""
+Keyset ("seek") pagination: instead of OFFSET, each page starts right after
+the last row of the previous one, so page 1000 costs the same as page 1 and
+rows added in the meantime don't shift the pages.
+
+    page = keyset_paginate(Job.objects.all(), ['-date', '-id'], request.GET.get('after'), 50)
+
+The ordering must end with a unique field (usually the primary key); its
+fields must be plain columns (or annotations) of the model, and none
+of its fields may be NULL. Backed by an index on the same fields, every page
+is a single index range scan.
+"""
+import base64
+import binascii
+import json
+from django.db.models import Q
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor, previous_cursor):
+        self.object_list = items
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(values):
+    raw = json.dumps([str(v) for v in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """Returns the cursor's values, or None for a missing or tampered cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError, UnicodeDecodeError):
+        return None
+    if not isinstance(values, list) or len(values) != size or not all(isinstance(v, str) for v in values):
+        return None
+    return values
+
+
+def _seek(ordering, values, forward):
+    """
+    Q for rows strictly after (forward) or before the row with these values:
+    (a > x) OR (a = x AND b > y) OR ... with each comparison flipped for '-field'.
+    """
+    condition = Q()
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        lookup = 'lt' if descending == forward else 'gt'
+        step = Q(**{f"{ordering[j].lstrip('-')}": values[j] for j in range(i)}) & Q(**{f"{name}__{lookup}": values[i]})
+        condition |= step
+    return condition
+
+
+def _row_values(obj, fields):
+    return [getattr(obj, f.lstrip('-')) for f in fields]
+
+
+def keyset_paginate(queryset, ordering, after=None, per_page=50, before=None):
+    """
+    Returns a KeysetPage of up to per_page rows of queryset in `ordering`,
+    starting after the `after` cursor (or ending before the `before` cursor).
+    Invalid cursors are treated as "first page".
+    """
+    after_values = decode_cursor(after, len(ordering))
+    before_values = None if after_values else decode_cursor(before, len(ordering))
+
+    if before_values:
+        # Walk backwards from the cursor, then put the rows back in order
+        reverse = [f[1:] if f.startswith('-') else f'-{f}' for f in ordering]
+        rows = list(queryset.filter(_seek(ordering, before_values, forward=False)).order_by(*reverse)[:per_page + 1])
+        more_before = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        previous_cursor = encode_cursor(_row_values(rows[0], ordering)) if rows and more_before else None
+        next_cursor = encode_cursor(_row_values(rows[-1], ordering)) if rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    if after_values:
+        queryset = queryset.filter(_seek(ordering, after_values, forward=True))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = encode_cursor(_row_values(rows[-1], ordering)) if has_next else None
+    previous_cursor = encode_cursor(_row_values(rows[0], ordering)) if after_values and rows else None
+    return KeysetPage(rows, next_cursor, previous_cursor)
@@ -0,0 +1,198 @@
+# core/query_audit.py
+"""
+The canonical queries behind the hot views, for `manage.py explain_queries`.
+
+Each entry is (name, view, builder): builder(samples) returns the queryset
+the view runs, built the same way as in the view (same helpers, same
+filters and ordering), with sample ids/values taken from the database.
+When a view changes its query shape, change its entry here too; a new hot
+view gets a new entry.
+
+full_scans() reads the EXPLAIN output of the configured database and lists
+the tables that are read in full. Tables in SMALL_TABLES (a few hundred
+rows at most) are allowed to be scanned, and so is walking an index under a
+LIMIT (a keyset page stops after its rows).
+"""
+import json
+import re
+from django.db.models import Q, Sum
+from django.utils import timezone
+from inventory.models import InventoryItem, InventoryStatusCounter, ItemMovement
+from inventory.search import prefix_search_items, search_items
+from inventory.utils import category_page_queryset, filter_items_by_status
+from jobs.models import DeliveryTicket, DeliveryTicketItem, Job, ReceivingTicket, ReceivingTicketItem
+from jobs.utils import annotate_job_counts, outstanding_items
+from core.models import BackgroundTask
+
+SMALL_TABLES = {
+    'inventory_productcategory',
+    'inventory_inventorystatuscounter',
+    'jobs_customer',
+    'jobs_contract',
+    'jobs_contract_items',
+    'jobs_numbersequence',
+}
+
+
+class Samples:
+    """Real ids and values to plug into the queries (so the planner sees realistic input)."""
+
+    def __init__(self):
+        item = InventoryItem.objects.order_by('-id').first()
+        self.item_id = item.id if item else 0
+        self.serial = item.serial_number if item else 'X'
+        self.category_id = item.category_id if item else 0
+        self.location = item.location if item else 'WH'
+
+        job = Job.objects.filter(status='open').order_by('-date', '-id').first() or Job.objects.first()
+        self.job_id = job.id if job else 0
+        self.job = job
+
+        ticket = DeliveryTicket.objects.filter(job_id=self.job_id).order_by('-id').first()
+        self.delivery_ticket_id = ticket.id if ticket else 0
+        ticket = ReceivingTicket.objects.filter(job_id=self.job_id).order_by('-id').first()
+        self.receiving_ticket_id = ticket.id if ticket else 0
+
+        # Part of a serial, as typed into the search boxes
+        self.fragment = self.serial[-5:]
+
+
+def _filtered_list_page(s):
+    # A page that reads one category to the end and stops in the next (see page_by_category)
+    queryset, _, _ = filter_items_by_status(InventoryItem.objects.all(), 'available')
+    counts = [(s.category_id, 'A', 40), (s.category_id + 1, 'B', 1000)]
+    page, _ = category_page_queryset(queryset.select_related('category'), counts, 0, None, 101)
+    return page
+
+
+def _ticket_history(s):
+    job = Job(id=s.job_id)
+    deliveries = job.delivery_tickets.values('id', 'ticket_date')
+    receivings = job.receiving_tickets.values('id', 'ticket_date')
+    return deliveries.union(receivings, all=True).order_by('-ticket_date', '-id')[:25]
+
+
+CANONICAL_QUERIES = [
+    # ----- inventory/views.py -----
+    ('inventory_summary', 'inventory_list_view', lambda s: (
+        InventoryStatusCounter.objects.values('location', 'category__id', 'category__name')
+        .annotate(quantity=Sum('count')).filter(quantity__gt=0).order_by('location', 'category__name')
+    )),
+    ('item_details', 'get_item_details_view', lambda s: (
+        InventoryItem.objects.filter(category_id=s.category_id, location=s.location)
+    )),
+    ('filtered_list_categories', 'inventory_filtered_list_view', lambda s: (
+        InventoryStatusCounter.objects.filter(count__gt=0, status='available')
+        .values_list('category_id', 'category__name').annotate(items=Sum('count')).order_by('category__name')
+    )),
+    ('filtered_list_page', 'inventory_filtered_list_view', _filtered_list_page),
+    ('item_search', 'ajax_inventory_search_view', lambda s: (
+        search_items(InventoryItem.objects.select_related('category'), s.fragment)[:50]
+    )),
+    ('item_prefix_search', 'ajax_inventory_search_view', lambda s: (
+        prefix_search_items(InventoryItem.objects.all(), s.serial[:-2])[:50]
+    )),
+    ('item_history_page', 'item_history_view', lambda s: (
+        ItemMovement.objects.filter(item_id=s.item_id).select_related('job', 'user').order_by('-timestamp', '-id')[:51]
+    )),
+    ('export_chunk', 'inventory.export_items task', lambda s: (
+        InventoryItem.objects.filter(status='on_job', category_id=s.category_id, serial_number__gt=s.fragment)
+        .order_by('serial_number')
+        .values_list('serial_number', 'category__name', 'location', 'status', 'updated_at')[:2000]
+    )),
+
+    # ----- core/views.py -----
+    ('dashboard_open_jobs', 'dashboard_view', lambda s: (
+        Job.objects.filter(status='open').select_related('customer').order_by('-date')
+    )),
+
+    # ----- jobs/views.py -----
+    ('job_list_page', 'job_list_view', lambda s: (
+        annotate_job_counts(Job.objects.select_related('customer')).order_by('-date', '-id')[:51]
+    )),
+    ('available_in_yard', 'load_available_items_view', lambda s: (
+        InventoryItem.objects.filter(status='available', location=s.location).select_related('category')
+    )),
+    ('outstanding_items', 'job_section_outstanding_view', lambda s: outstanding_items(s.job)),
+    ('ticket_history', 'job_section_tickets_view', _ticket_history),
+    ('delivery_ticket_lines', 'job_ticket_lines_view', lambda s: (
+        DeliveryTicketItem.objects.filter(ticket_id=s.delivery_ticket_id)
+        .select_related('item').order_by('item__serial_number')
+    )),
+    ('receiving_ticket_lines', 'job_ticket_lines_view', lambda s: (
+        ReceivingTicketItem.objects.filter(ticket_id=s.receiving_ticket_id)
+        .select_related('item').order_by('item__serial_number')
+    )),
+    ('item_deliveries', 'delivery lines of an item', lambda s: (
+        DeliveryTicketItem.objects.filter(item_id=s.item_id).select_related('ticket').order_by('-ticket__ticket_date')
+    )),
+    ('returnable_on_job', 'receiving_ticket_quick_create_view', lambda s: (
+        InventoryItem.objects.filter(
+            serial_number__in=[s.serial], status='on_job',
+            id__in=DeliveryTicketItem.objects.filter(ticket__job_id=s.job_id, is_returnable=True).values('item_id'),
+        )
+    )),
+    ('pending_inspection', 'end_job_view', lambda s: (
+        InventoryItem.objects.filter(receiving_tickets__job_id=s.job_id, status='pending_inspection').distinct()
+    )),
+    ('ticket_edit_candidates', 'ticket_edit_view', lambda s: (
+        InventoryItem.objects.filter(Q(status='available') | Q(id__in=[s.item_id])).select_related('category')
+    )),
+
+    # ----- core/tasks.py -----
+    ('next_task', 'run_tasks worker', lambda s: (
+        BackgroundTask.objects.filter(status='queued', run_after__lte=timezone.now()).order_by('run_after', 'id')[:1]
+    )),
+]
+
+
+# ----- Reading the plans -----
+
+def explain(queryset, vendor):
+    """The plan as text; JSON on MySQL, where it names the access type of every table."""
+    if vendor == 'mysql':
+        return queryset.explain(format='json')
+    return queryset.explain()
+
+
+def _mysql_tables(node):
+    """Yields every {"table_name": ..., "access_type": ...} block of a MySQL JSON plan."""
+    if isinstance(node, dict):
+        if 'table_name' in node and 'access_type' in node:
+            yield node
+        for value in node.values():
+            yield from _mysql_tables(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _mysql_tables(value)
+
+
+def _sqlite_table(name, index, tables):
+    """Subquery tables show up under their alias (U0, V1...); the index name tells which table it is."""
+    if name in tables or not index:
+        return name
+    index = index.removeprefix('sqlite_autoindex_')
+    owners = [table for table in tables if index.startswith(table + '_')]
+    return max(owners, key=len) if owners else name
+
+
+def full_scans(plan, vendor, limited=False, tables=()):
+    """
+    Returns the (non-small) tables the plan reads in full. limited: the query
+    has a LIMIT, so an index walk stops early. tables: the table names of the
+    database, to resolve sqlite's aliases.
+    """
+    scans = set()
+    if vendor == 'sqlite':
+        # "SCAN inventory_inventoryitem" reads the table, "SCAN U0 USING [COVERING] INDEX x"
+        # walks a whole index (unless a LIMIT stops it)
+        for name, index in re.findall(r'\bSCAN (\w+)(?: USING (?:COVERING )?INDEX (\w+))?', plan):
+            if name == 'CONSTANT' or (index and limited):
+                continue
+            scans.add(_sqlite_table(name, index, tables))
+    elif vendor == 'mysql':
+        full = ('ALL',) if limited else ('ALL', 'index')
+        scans = {t['table_name'] for t in _mysql_tables(json.loads(plan)) if t['access_type'] in full}
+    elif vendor == 'postgresql':
+        scans = set(re.findall(r'Seq Scan on (\w+)', plan))
+    return sorted(scans - SMALL_TABLES)
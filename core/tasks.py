@@ -0,0 +1,148 @@
+# core/tasks.py
+"""
+A small database-backed task queue, no broker needed.
+
+    @task('inventory.import_file')
+    def import_file(task, filename):
+        ...
+        task.set_progress(done, total, "Importing...")
+        return {'message': "Done."}
+
+    enqueue('inventory.import_file', title="Import", params={'filename': name}, input_file=upload)
+
+Task functions live in each app's tasks.py (imported by CoreConfig.ready)
+and get the BackgroundTask plus its params. Whatever they return is stored
+as task.result; a file can be attached with task.result_file.save(). Workers
+(`manage.py run_tasks`) retry failed tasks with a growing delay, unless the
+task raised TaskFailed, which is a final, user-facing failure.
+
+Task files (input_file, result_file) are stored in MEDIA_ROOT, so a worker
+must see the web process' MEDIA_ROOT: in deployment start.sh runs the
+worker in the web service's container.
+"""
+import logging
+import os
+import socket
+from datetime import timedelta
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubled for every further attempt
+RETRY_DELAY = 30
+
+_registry = {}
+
+
+class TaskFailed(Exception):
+    """A task failed for good (bad input, not a transient error); shown to the user, never retried."""
+
+
+def task(name, max_attempts=3):
+    """Registers a task function under `name`."""
+    def register(func):
+        _registry[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, *, title, params=None, input_file=None, user=None):
+    """
+    Queues a task and returns its BackgroundTask. input_file (e.g. an uploaded
+    file) is stored with the task, so the worker can read it later.
+    """
+    if name not in _registry:
+        raise KeyError(f"Unknown task '{name}'.")
+
+    task = BackgroundTask(
+        name=name,
+        title=title[:255],
+        params=params or {},
+        max_attempts=_registry[name][1],
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+    if input_file is not None:
+        task.input_file.save(os.path.basename(input_file.name), input_file, save=False)
+    task.save()
+    return task
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_next(worker):
+    """
+    Marks the oldest due task as running and returns it (None when the queue is empty).
+    Where the database supports it, SKIP LOCKED lets several workers claim in parallel.
+    """
+    skip_locked = connection.features.has_select_for_update_skip_locked
+    with transaction.atomic():
+        task = (
+            BackgroundTask.objects
+            .select_for_update(skip_locked=skip_locked)
+            .filter(status='queued', run_after__lte=timezone.now())
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if task is None:
+            return None
+        task.status = 'running'
+        task.attempts += 1
+        task.locked_by = worker[:100]
+        task.started_at = timezone.now()
+        task.save(update_fields=['status', 'attempts', 'locked_by', 'started_at'])
+    return task
+
+
+def run_task(task):
+    """Runs a claimed task and records the outcome (success, retry or failure)."""
+    func, _ = _registry.get(task.name, (None, None))
+    try:
+        if func is None:
+            raise TaskFailed(f"Unknown task '{task.name}'.")
+        result = func(task, **task.params)
+    except Exception as e:
+        retry = not isinstance(e, TaskFailed) and task.attempts < task.max_attempts
+        if isinstance(e, TaskFailed):
+            logger.warning("Task %s (%s) failed: %s", task.pk, task.name, e)
+        else:
+            logger.exception("Task %s (%s) failed on attempt %s", task.pk, task.name, task.attempts)
+        # The traceback goes to the log; the user sees the message
+        task.error = str(e) or e.__class__.__name__
+        if retry:
+            task.status = 'queued'
+            task.run_after = timezone.now() + timedelta(seconds=RETRY_DELAY * 2 ** (task.attempts - 1))
+            task.progress_message = f"Attempt {task.attempts} failed, retrying..."
+            task.save(update_fields=['status', 'run_after', 'error', 'progress_message'])
+            return task
+        task.status = 'failed'
+    else:
+        task.status = 'succeeded'
+        task.result = result
+        task.progress = 100
+        task.error = ''
+
+    task.finished_at = timezone.now()
+    task.save()
+    # The upload is not needed any more
+    if task.input_file:
+        task.input_file.delete(save=True)
+    return task
+
+
+def requeue_stale(timeout):
+    """
+    Handles tasks whose worker died mid-run (running for more than `timeout`):
+    they go back in the queue, or fail once they are out of attempts.
+    Returns the number of tasks requeued.
+    """
+    now = timezone.now()
+    stale = BackgroundTask.objects.filter(status='running', started_at__lt=now - timeout)
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', finished_at=now, error="The worker running this task stopped.",
+    )
+    return stale.update(status='queued', locked_by='', run_after=now)
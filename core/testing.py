@@ -0,0 +1,216 @@
+# core/testing.py
+"""
+Query-budget checks for the app's views (used by core/, inventory/ and jobs/tests.py).
+
+Each app's test lists the requests to make against a seeded fleet. The
+fleet is built at SMALL_SIZE, every request is made and its queries are
+recorded; the fleet then grows to LARGE_SIZE and every request is made
+again. A view whose query count changed has an N+1 (or similar), and the
+test fails listing the SQL that repeats.
+"""
+import re
+import shutil
+import tempfile
+from collections import Counter
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern
+from core.models import BackgroundTask
+from inventory.models import InventoryItem, ProductCategory
+from jobs import search as job_search
+from jobs import sequences
+from jobs.models import (
+    Contract, Customer, DeliveryTicket, DeliveryTicketItem, Job, JobAttachment,
+    ReceivingTicket, ReceivingTicketItem,
+)
+
+SMALL_SIZE = 10
+LARGE_SIZE = 1000
+
+# How many times a query may be listed in a failure message
+MAX_LISTED = 5
+
+
+class Fleet:
+    """
+    A realistic dataset: categories, yard items in every status, customers
+    with contracts, jobs, and one "focus" job with delivery/receiving history,
+    attachments and a finished export task. The objects the URLs point at
+    (focus job, tickets, task...) stay the same as the fleet grows.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self.user = User.objects.create_user('budget', password='budget', is_staff=True)
+        self.customer = Customer.objects.create(name='Focus Customer')
+        self.category = ProductCategory.objects.create(name='Focus Category', unit='joint')
+        Contract.objects.create(customer=self.customer).items.add(self.category)
+        self.job = Job.objects.create(
+            job_type='1101', customer=self.customer, rig='Rig 1', well='Well 1', location='Western Desert',
+        )
+        self.delivery_ticket = DeliveryTicket.objects.create(job=self.job, created_by=self.user)
+        self.receiving_ticket = ReceivingTicket.objects.create(job=self.job, created_by=self.user)
+        self.task = BackgroundTask.objects.create(
+            name='inventory.export_items', title='Export', status='succeeded', progress=100,
+            result={'message': 'Exported.'}, created_by=self.user,
+        )
+        self.task.result_file.save('export.csv', ContentFile(b'Serial Number\n'), save=True)
+        self._serial = 0
+
+    def _items(self, count, category_ids, **fields):
+        items = []
+        for i in range(count):
+            self._serial += 1
+            items.append(InventoryItem(
+                serial_number=f'QB-{self._serial:07d}',
+                category_id=category_ids[i % len(category_ids)],
+                location=InventoryItem.LOCATION_CHOICES[i % 2][0],
+                **fields,
+            ))
+        InventoryItem.objects.bulk_create(items)
+        # bulk_create doesn't return ids on every backend
+        return list(InventoryItem.objects.filter(serial_number__in=[i.serial_number for i in items]).order_by('id'))
+
+    def grow(self, size):
+        """Adds rows until the fleet has `size` of everything that scales."""
+        n = size - self.size
+        if n <= 0:
+            return self
+        tenth = max(1, n // 10)
+
+        categories = ProductCategory.objects.bulk_create([
+            ProductCategory(name=f'QB Category {self.size + i}', unit='pcs') for i in range(tenth)
+        ])
+        category_ids = [self.category.id] + list(
+            ProductCategory.objects.filter(name__in=[c.name for c in categories]).values_list('id', flat=True)
+        )
+        self.customer.contract.items.add(*category_ids[1:])
+
+        # Yard items in every status
+        for status, _ in InventoryItem.STATUS_CHOICES:
+            self._items(n, category_ids, status=status, recut_reason='Thread damage' if status == 're-cut' else None)
+
+        # Other customers and jobs
+        customers = Customer.objects.bulk_create([Customer(name=f'QB Customer {self.size + i}') for i in range(tenth)])
+        customers = list(Customer.objects.filter(name__in=[c.name for c in customers]))
+        jobs = sequences.assign_numbers([
+            Job(
+                job_type=Job.JOB_TYPE_CHOICES[i % len(Job.JOB_TYPE_CHOICES)][0], customer=customers[i % len(customers)],
+                rig=f'Rig {i % 40}', well=f'Well {self.size + i}', location=f'Field {i % 12}',
+            )
+            for i in range(n)
+        ])
+        Job.objects.bulk_create(jobs)
+        job_search.reindex_jobs(Job.objects.filter(job_number__in=[j.job_number for j in jobs]).values_list('id', flat=True))
+
+        # Focus job history: delivery tickets of 10 items, half of them received back.
+        # Tickets alternate so both kinds are on the first history page.
+        delivered = self._items(n, category_ids, status='on_job')
+        for start in range(0, n, 10):
+            batch = delivered[start:start + 10]
+            ticket = DeliveryTicket.objects.create(job=self.job, created_by=self.user)
+            DeliveryTicketItem.objects.bulk_create([DeliveryTicketItem(ticket=ticket, item=item) for item in batch])
+            if start % 20 == 0:
+                receiving = ReceivingTicket.objects.create(job=self.job, created_by=self.user)
+                ReceivingTicketItem.objects.bulk_create([ReceivingTicketItem(ticket=receiving, item=item) for item in batch])
+                InventoryItem.objects.filter(id__in=[item.id for item in batch]).update(status='pending_inspection')
+
+        # The focus tickets grow too
+        lines = self._items(tenth, category_ids, status='on_job')
+        DeliveryTicketItem.objects.bulk_create([DeliveryTicketItem(ticket=self.delivery_ticket, item=item) for item in lines])
+        ReceivingTicketItem.objects.bulk_create([
+            ReceivingTicketItem(ticket=self.receiving_ticket, item=item) for item in self._items(tenth, category_ids, status='pending_inspection')
+        ])
+
+        for i in range(tenth):
+            attachment = JobAttachment(job=self.job, caption=f'Photo {self.size + i}')
+            attachment.file.save(f'photo_{self.size + i}.txt', ContentFile(b'x'), save=True)
+
+        self.size = size
+        return self
+
+
+def _normalise(sql):
+    # Same statement, different literals, savepoint names or IN (...) sizes -> same shape
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+\b|"s\d+_x\d+"|`s\d+_x\d+`', '?', sql)
+    sql = re.sub(r'\?(?:, \?)+', '?...', sql)
+    return re.sub(r'(\([^()]*\))(?:, \1)+', r'\1...', sql)
+
+
+class TemporaryMediaMixin:
+    """Points MEDIA_ROOT (and the PDF cache) at a temporary directory for the test class."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._media = tempfile.mkdtemp()
+        cls._settings = override_settings(MEDIA_ROOT=cls._media, PDF_CACHE_DIR=f'{cls._media}/pdf_cache')
+        cls._settings.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._settings.disable()
+        shutil.rmtree(cls._media, ignore_errors=True)
+        super().tearDownClass()
+
+
+class QueryBudgetMixin(TemporaryMediaMixin):
+    """
+    Mix into a TestCase and set requests to a method (fleet) -> [(label, method, url, data[, headers]), ...]
+    and url_patterns (the app's urlpatterns; every named URL must be requested).
+    A label starts with the URL name, e.g. 'job_list (search)'.
+    The fleet's files go to a temporary MEDIA_ROOT.
+    """
+    url_patterns = []
+    # The requests depend on the fleet's ids, so this is a method, not a list
+    requests = None
+
+    @classmethod
+    def setUpClass(cls):
+        assert cls.requests is not None, f"{cls.__name__} doesn't define requests(fleet)"
+        assert cls.url_patterns, f"{cls.__name__} doesn't define url_patterns"
+        super().setUpClass()
+
+    def _run(self, fleet):
+        self.client.force_login(fleet.user)
+        results = {}
+        for label, method, url, data, *headers in self.requests(fleet):
+            # Each request is rolled back, so POSTs don't change what the next request sees
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    response = getattr(self.client, method)(url, data or {}, headers=headers[0] if headers else None)
+                transaction.set_rollback(True)
+            self.assertLess(response.status_code, 400, f"{label}: {method.upper()} {url} returned {response.status_code}")
+            results[label] = [q['sql'] for q in queries.captured_queries]
+        return results
+
+    def test_every_url_is_covered(self):
+        fleet = Fleet().grow(SMALL_SIZE)
+        requested = {label.split(' ')[0] for label, *_ in self.requests(fleet)}
+        names = {p.name for p in self.url_patterns if isinstance(p, URLPattern) and p.name}
+        self.assertEqual(names - requested, set(), "URLs without a query budget check")
+
+    def test_query_count_does_not_grow_with_data(self):
+        fleet = Fleet().grow(SMALL_SIZE)
+        small = self._run(fleet)
+        fleet.grow(LARGE_SIZE)
+        large = self._run(fleet)
+
+        failures = []
+        for label, large_queries in large.items():
+            small_queries = small[label]
+            if len(small_queries) == len(large_queries):
+                continue
+            grown = Counter(map(_normalise, large_queries)) - Counter(map(_normalise, small_queries))
+            listed = '\n'.join(
+                f"    {count:>5} x more: {sql}" for sql, count in grown.most_common(MAX_LISTED)
+            )
+            failures.append(
+                f"{label}: {len(small_queries)} queries with {SMALL_SIZE} rows, "
+                f"{len(large_queries)} with {LARGE_SIZE}\n{listed}"
+            )
+        self.assertFalse(failures, "Query counts grow with the data:\n" + '\n'.join(failures))
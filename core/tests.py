@@ -1,3 +1,180 @@
-from django.test import TestCase
+import json
+import logging
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from core.query_audit import full_scans
+from core.testing import Fleet, QueryBudgetMixin, TemporaryMediaMixin
+from inventory.models import InventoryItem
+from .log_handlers import DiscordWebhookHandler
+from . import urls
 
-# Create your tests here.
+
+class CoreQueryBudgetTests(QueryBudgetMixin, TestCase):
+    url_patterns = urls.urlpatterns
+
+    def requests(self, fleet):
+        task = fleet.task.id
+        return [
+            ('dashboard', 'get', reverse('dashboard'), None),
+            ('task_status', 'get', reverse('task_status', args=[task]), None),
+            ('task_progress', 'get', reverse('task_progress', args=[task]), None),
+            ('task_download', 'get', reverse('task_download', args=[task]), None),
+        ]
+
+
+class QueryBudgetMixinTests(SimpleTestCase):
+    def test_a_budget_without_requests_does_not_run(self):
+        class NoRequests(QueryBudgetMixin, TestCase):
+            url_patterns = urls.urlpatterns
+
+        with self.assertRaisesMessage(AssertionError, "NoRequests doesn't define requests(fleet)"):
+            NoRequests.setUpClass()
+
+
+class ServerTimingTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('timing', password='timing'))
+
+    @override_settings(PERF_LOG_ALL_REQUESTS=True)
+    def test_header_and_log_line(self):
+        with self.assertLogs('core.performance', 'INFO') as logs:
+            response = self.client.get(reverse('dashboard'))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertRegex(timing, r'total;dur=[\d.]+$')
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual((record['view'], record['status']), ('dashboard', 200))
+        self.assertGreater(record['db_queries'], 0)
+
+    def test_fast_requests_are_not_logged_by_default(self):
+        with self.assertNoLogs('core.performance', 'INFO'):
+            response = self.client.get(reverse('dashboard'))
+        self.assertIn('Server-Timing', response)
+
+    @override_settings(PERF_SLOW_REQUEST_MS=0, PERF_SLOW_SAMPLE_RATE=1, PERF_SLOW_QUERIES=2)
+    def test_slow_requests_list_their_slowest_sql(self):
+        with self.assertLogs('core.performance', 'WARNING') as logs:
+            self.client.get(reverse('dashboard'))
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(len(record['slowest_sql']), 2)
+        self.assertGreaterEqual(record['slowest_sql'][0]['ms'], record['slowest_sql'][1]['ms'])
+
+
+class WebhookStandIn:
+    """A local HTTP server in place of Discord: records the JSON of every POST."""
+
+    def __init__(self, delay=0.0):
+        self.messages = []
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                time.sleep(delay)
+                stand_in.messages.append(json.loads(body))
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}/webhook'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def embeds(self):
+        return [embed for message in self.messages for embed in message['embeds']]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class DiscordWebhookHandlerTests(SimpleTestCase):
+    def setUp(self):
+        self.logger = logging.getLogger('core.tests.discord')
+        self.logger.propagate = False
+
+    def _handler(self, stand_in, **options):
+        handler = DiscordWebhookHandler(url=stand_in.url, **{'flush_interval': 0.2, 'min_interval': 0, **options})
+        self.logger.addHandler(handler)
+        self.addCleanup(self.logger.removeHandler, handler)
+        self.addCleanup(stand_in.close)
+        return handler
+
+    def _fail(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            self.logger.exception('Internal Server Error')
+
+    def test_emit_does_not_wait_and_repeats_are_deduplicated(self):
+        stand_in = WebhookStandIn(delay=0.5)
+        handler = self._handler(stand_in)
+
+        started = time.monotonic()
+        for _ in range(20):
+            self._fail()
+        self.logger.error('Something else')
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        handler.flush()
+        # One webhook call, one embed per distinct error
+        self.assertEqual(len(stand_in.messages), 1)
+        self.assertEqual(
+            [embed['title'] for embed in stand_in.embeds()],
+            ['🚨 Unhandled Exception: ValueError', 'ℹ️ Application Log: ERROR'],
+        )
+        self.assertEqual((handler.sent, handler.deduplicated), (2, 19))
+
+    def test_repeats_are_summed_up_after_the_window(self):
+        stand_in = WebhookStandIn()
+        self._handler(stand_in, dedup_window=0.3)
+
+        for _ in range(3):
+            self._fail()
+        deadline = time.monotonic() + 3
+        while len(stand_in.embeds()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        summary = stand_in.embeds()[1]
+        self.assertEqual(summary['title'], '🔁 Repeated: 🚨 Unhandled Exception: ValueError')
+        self.assertIn('2 more time(s)', summary['description'])
+
+    def test_full_queue_drops_and_reports(self):
+        stand_in = WebhookStandIn(delay=0.2)
+        handler = self._handler(stand_in, queue_size=2)
+
+        for i in range(10):
+            self.logger.error('Error %s', i)
+        self.assertGreater(handler.dropped, 0)
+
+        handler.flush()
+        notices = [e for e in stand_in.embeds() if e['title'] == '⚠️ Log records dropped']
+        self.assertEqual(notices[0]['description'], f"{handler.dropped} log record(s) were dropped (queue full).")
+
+
+class ExplainQueriesTests(TemporaryMediaMixin, TestCase):
+    def test_canonical_queries_use_indexes(self):
+        Fleet().grow(20)
+        out = StringIO()
+        call_command('explain_queries', '--strict', stdout=out)
+        self.assertIn('No full scans', out.getvalue())
+
+    def test_full_scans_are_flagged(self):
+        # No index starts with location
+        plan = InventoryItem.objects.filter(location='Yard').order_by().explain()
+        self.assertEqual(full_scans(plan, 'sqlite'), ['inventory_inventoryitem'])
+        self.assertEqual(full_scans('SCAN inventory_productcategory', 'sqlite'), [])
@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
+    path('tasks/<int:task_id>/', views.task_status_view, name='task_status'),
+    path('tasks/<int:task_id>/progress/', views.task_progress_view, name='task_progress'),
+    path('tasks/<int:task_id>/download/', views.task_download_view, name='task_download'),
 ]
\ No newline at end of file
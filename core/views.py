@@ -1,24 +1,29 @@
-from django.shortcuts import render
+import os
+from django.shortcuts import render, get_object_or_404
 from django.db.models import Count
-from inventory.models import InventoryItem
+from django.http import FileResponse, Http404
+from .models import BackgroundTask
+from inventory.counters import status_totals
 from jobs.models import Job
 from django.contrib.auth.decorators import login_required 
 
 
 @login_required
 def dashboard_view(request):
-    available_count = InventoryItem.objects.filter(status='available').count()
-    on_job_count = InventoryItem.objects.filter(status='on_job').count()
-    re_cut_count = InventoryItem.objects.filter(status='re-cut').count()
-    sold_count = InventoryItem.objects.filter(status='sold').count()
-    pending_inspection_count = InventoryItem.objects.filter(status='pending_inspection').count()
+    # One indexed query over the status counters instead of a COUNT(*) per status
+    totals = status_totals()
+    available_count = totals['available']
+    on_job_count = totals['on_job']
+    re_cut_count = totals['re-cut']
+    sold_count = totals['sold']
+    pending_inspection_count = totals['pending_inspection']
 
-    lih_count = InventoryItem.objects.filter(status='lih').count()
-    junk_count = InventoryItem.objects.filter(status='junk').count()
+    lih_count = totals['lih']
+    junk_count = totals['junk']
 
     total_items = available_count + on_job_count + re_cut_count + pending_inspection_count + sold_count + lih_count + junk_count
 
-    active_jobs = Job.objects.filter(status='open').order_by('-date')
+    active_jobs = Job.objects.filter(status='open').select_related('customer').order_by('-date')
 
     context = {
         'total_items': total_items,
@@ -31,4 +36,35 @@ def dashboard_view(request):
         'lih_count': lih_count,
         'junk_count': junk_count,
     }
-    return render(request, 'core/dashboard.html', context)
\ No newline at end of file
+    return render(request, 'core/dashboard.html', context)
+
+
+def _user_task(request, task_id):
+    # Tasks are private to whoever started them (and staff)
+    task = get_object_or_404(BackgroundTask, id=task_id)
+    if not (request.user.is_staff or task.created_by_id == request.user.id):
+        raise Http404
+    return task
+
+
+@login_required
+def task_status_view(request, task_id):
+    task = _user_task(request, task_id)
+    return render(request, 'core/task_status.html', {'task': task})
+
+
+@login_required
+def task_progress_view(request, task_id):
+    # htmx partial; it keeps polling itself until the task is finished
+    task = _user_task(request, task_id)
+    return render(request, 'core/_task_progress.html', {'task': task})
+
+
+@login_required
+def task_download_view(request, task_id):
+    task = _user_task(request, task_id)
+    if task.status != 'succeeded' or not task.result_file:
+        raise Http404
+    return FileResponse(
+        task.result_file.open('rb'), as_attachment=True, filename=os.path.basename(task.result_file.name)
+    )
@@ -0,0 +1,149 @@
+# inventory/counters.py
+from collections import Counter
+from django.db import transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from .models import InventoryItem, InventoryStatusCounter
+
+# Keep IN (...) lists to a sane size
+CHUNK_SIZE = 2000
+# Counter buckets per UPDATE (each one adds a WHEN to the statement)
+BUCKET_CHUNK_SIZE = 500
+
+
+def count_rows(rows):
+    """Counts (status, location, category_id) tuples into buckets."""
+    return Counter(tuple(row) for row in rows)
+
+
+def diff(before, after):
+    """Returns after - before per bucket, keeping negative values."""
+    deltas = Counter(after)
+    deltas.subtract(before)
+    return deltas
+
+
+def _grouped(queryset):
+    grouped = (
+        queryset.order_by()
+        .values_list('status', 'location', 'category_id')
+        .annotate(n=Count('id'))
+    )
+    return Counter({(status, location, category_id): n for status, location, category_id, n in grouped})
+
+
+def snapshot(pks, using='default', lock=False):
+    """Returns the current bucket counts of the given item ids."""
+    counts = Counter()
+    pks = list(pks)
+    for start in range(0, len(pks), CHUNK_SIZE):
+        queryset = InventoryItem._base_manager.using(using).filter(pk__in=pks[start:start + CHUNK_SIZE])
+        if lock:
+            counts.update(count_rows(
+                queryset.order_by().select_for_update().values_list('status', 'location', 'category_id')
+            ))
+        else:
+            counts.update(_grouped(queryset))
+    return counts
+
+
+def snapshot_serials(serials, using='default'):
+    """Same as snapshot(), but for items looked up by serial number."""
+    counts = Counter()
+    serials = list(serials)
+    for start in range(0, len(serials), CHUNK_SIZE):
+        queryset = InventoryItem._base_manager.using(using).filter(
+            serial_number__in=serials[start:start + CHUNK_SIZE]
+        )
+        counts.update(_grouped(queryset))
+    return counts
+
+
+def _bucket_q(buckets):
+    condition = Q()
+    for status, location, category_id in buckets:
+        condition |= Q(status=status, location=location, category_id=category_id)
+    return condition
+
+
+def _add(deltas, using):
+    """One UPDATE adding each bucket's delta; returns the number of rows updated."""
+    return InventoryStatusCounter.objects.using(using).filter(_bucket_q(deltas)).update(count=F('count') + Case(
+        *[
+            When(status=status, location=location, category_id=category_id, then=Value(delta))
+            for (status, location, category_id), delta in deltas.items()
+        ],
+        default=Value(0),
+    ))
+
+
+def apply_deltas(deltas, using='default'):
+    """
+    Adds each delta to its counter row, creating missing rows.
+    Must run inside the same transaction as the item write.
+    One UPDATE per BUCKET_CHUNK_SIZE buckets, however many buckets change; missing
+    rows cost a SELECT and an INSERT more.
+    """
+    deltas = [(bucket, delta) for bucket, delta in deltas.items() if delta]
+    for start in range(0, len(deltas), BUCKET_CHUNK_SIZE):
+        chunk = dict(deltas[start:start + BUCKET_CHUNK_SIZE])
+        if _add(chunk, using) == len(chunk):
+            continue
+
+        # Some buckets have no row yet: create them at 0 (ignore_conflicts, in
+        # case someone else creates them in the meantime), then add their deltas
+        existing = set(
+            InventoryStatusCounter.objects.using(using).filter(_bucket_q(chunk))
+            .values_list('status', 'location', 'category_id')
+        )
+        missing = {bucket: delta for bucket, delta in chunk.items() if bucket not in existing}
+        InventoryStatusCounter.objects.using(using).bulk_create([
+            InventoryStatusCounter(status=status, location=location, category_id=category_id, count=0)
+            for status, location, category_id in missing
+        ], ignore_conflicts=True)
+        _add(missing, using)
+
+
+def live_counts(using='default'):
+    """Counts every bucket straight from InventoryItem (full scan)."""
+    return _grouped(InventoryItem._base_manager.using(using).all())
+
+
+def stored_counts(using='default'):
+    return Counter({
+        (status, location, category_id): count
+        for status, location, category_id, count in InventoryStatusCounter.objects.using(using)
+        .values_list('status', 'location', 'category_id', 'count')
+    })
+
+
+def find_drift(using='default'):
+    """Returns {bucket: (stored, live)} for every bucket that does not match."""
+    stored = stored_counts(using)
+    live = live_counts(using)
+    return {
+        key: (stored.get(key, 0), live.get(key, 0))
+        for key in set(stored) | set(live)
+        if stored.get(key, 0) != live.get(key, 0)
+    }
+
+
+def rebuild(using='default'):
+    """Replaces the whole counter table with live counts."""
+    with transaction.atomic(using=using):
+        InventoryStatusCounter.objects.using(using).all().delete()
+        InventoryStatusCounter.objects.using(using).bulk_create([
+            InventoryStatusCounter(status=status, location=location, category_id=category_id, count=n)
+            for (status, location, category_id), n in live_counts(using).items()
+        ])
+
+
+def status_totals(using='default'):
+    """Returns {status: total} across all locations and categories (one query)."""
+    totals = {key: 0 for key, _ in InventoryItem.STATUS_CHOICES}
+    for status, total in (
+        InventoryStatusCounter.objects.using(using)
+        .values_list('status')
+        .annotate(total=Sum('count'))
+    ):
+        totals[status] = total or 0
+    return totals
@@ -0,0 +1,128 @@
+# inventory/exports.py
+import csv
+import zlib
+from operator import itemgetter
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+from .models import InventoryItem
+from .utils import category_counts, walk_by_category
+
+# Rows fetched per database round trip
+CHUNK_SIZE = 2000
+# Compress in blocks of roughly this many bytes
+GZIP_BLOCK_SIZE = 64 * 1024
+
+HEADERS = ['Serial Number', 'Category', 'Location', 'Status', 'Updated At']
+LOCATION_LABELS = dict(InventoryItem.LOCATION_CHOICES)
+STATUS_LABELS = dict(InventoryItem.STATUS_CHOICES)
+
+
+def export_rows(queryset, include_reason=False):
+    """
+    Yields one list per item, in export column order and in the list page's
+    order (category name, serial number). The rows are read CHUNK_SIZE at a
+    time, category by category (see walk_by_category): iterator() doesn't
+    stream on PyMySQL (the whole result is buffered client-side), while each
+    chunk is a short index range scan. values_list, so model instances are
+    never built or cached.
+    """
+    fields = ['serial_number', 'category__name', 'location', 'status', 'updated_at']
+    if include_reason:
+        fields.append('recut_reason')
+
+    rows = walk_by_category(
+        queryset.values_list(*fields), [category_id for category_id, _, _ in category_counts()], chunk_size=CHUNK_SIZE,
+        serial_of=itemgetter(0),
+    )
+    for values in rows:
+        yield _export_row(values, include_reason)
+
+
+def _export_row(values, include_reason):
+    row = [
+        values[0],
+        values[1],
+        LOCATION_LABELS.get(values[2], values[2]),
+        STATUS_LABELS.get(values[3], values[3]),
+        values[4].strftime('%Y-%m-%d %H:%M'),
+    ]
+    if include_reason:
+        row.append(values[5])
+    return row
+
+
+def _counted(rows, progress):
+    """Passes the rows through, reporting the running count every CHUNK_SIZE rows."""
+    for count, row in enumerate(rows, start=1):
+        if progress and count % CHUNK_SIZE == 0:
+            progress(count)
+        yield row
+
+
+def write_items_xlsx(queryset, title, output, include_reason=False, progress=None):
+    """
+    Writes the items to output (a binary file) with an openpyxl write-only
+    workbook, which flushes rows to disk as they are appended.
+    progress(rows written) is called every CHUNK_SIZE rows.
+    """
+    headers = HEADERS + (['Reason'] if include_reason else [])
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for col_num in range(1, len(headers) + 1):
+        sheet.column_dimensions[get_column_letter(col_num)].width = 20
+
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.font = Font(bold=True)
+        header_cells.append(cell)
+    sheet.append(header_cells)
+
+    for row in _counted(export_rows(queryset, include_reason), progress):
+        sheet.append(row)
+
+    workbook.save(output)
+
+
+class _Echo:
+    """File-like object for csv.writer that just hands back each line."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(queryset, include_reason, progress=None):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADERS + (['Reason'] if include_reason else []))
+    for row in _counted(export_rows(queryset, include_reason), progress):
+        yield writer.writerow(row)
+
+
+def _gzip_stream(lines):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip container
+    block = []
+    block_size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        block.append(data)
+        block_size += len(data)
+        if block_size >= GZIP_BLOCK_SIZE:
+            chunk = compressor.compress(b''.join(block))
+            block, block_size = [], 0
+            if chunk:
+                yield chunk
+    yield compressor.compress(b''.join(block)) + compressor.flush()
+
+
+def write_items_csv(queryset, output, include_reason=False, compress=False, progress=None):
+    """
+    Writes the items to output (a binary file) as CSV, optionally gzipped,
+    without ever holding more than one chunk of rows.
+    """
+    lines = _csv_lines(queryset, include_reason, progress)
+    chunks = _gzip_stream(lines) if compress else (line.encode('utf-8') for line in lines)
+    for chunk in chunks:
+        output.write(chunk)
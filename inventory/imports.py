@@ -0,0 +1,120 @@
+# inventory/imports.py
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from .utils import missing_import_columns, new_import_summary, process_inventory_rows
+
+# Rows validated and saved per transaction
+IMPORT_CHUNK_SIZE = 5000
+
+
+class SerialSeenSet:
+    """
+    The serials already imported from a file, for file-wide duplicate checks.
+    Kept as a sorted array of 64-bit hashes (8 bytes per serial) instead of a
+    set of strings, so even a million-row file costs only a few MB.
+    """
+
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    @staticmethod
+    def _hash(serials):
+        return pd.util.hash_pandas_object(serials, index=False).to_numpy()
+
+    def contains(self, serials):
+        """Boolean Series: which of these serials were added before."""
+        if not len(self._hashes):
+            return pd.Series(False, index=serials.index)
+        hashes = self._hash(serials)
+        positions = np.searchsorted(self._hashes, hashes).clip(max=len(self._hashes) - 1)
+        return pd.Series(self._hashes[positions] == hashes, index=serials.index)
+
+    def add(self, serials):
+        self._hashes = np.union1d(self._hashes, self._hash(serials))
+
+
+def read_csv_chunks(file, chunk_size=IMPORT_CHUNK_SIZE):
+    # Everything is read as text: per-chunk type inference would turn the
+    # same serial into '123' in one chunk and '123.0' in another
+    return pd.read_csv(file, chunksize=chunk_size, dtype=str)
+
+
+def read_xlsx_chunks(file, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Yields DataFrames of up to chunk_size rows from the first sheet.
+    openpyxl's read-only mode streams the sheet XML instead of loading it whole.
+    """
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        # Not a readable workbook (corrupt, or not Excel at all)
+        raise ValueError(f"Could not read the Excel file ({e}).")
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [f"Unnamed: {i}" if c is None else c for i, c in enumerate(header)]
+
+        chunk = []
+        start = 0
+        for values in rows:
+            chunk.append(values[:len(columns)])
+            if len(chunk) == chunk_size:
+                yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk)))
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=columns, index=range(start, start + len(chunk)))
+    finally:
+        workbook.close()
+
+
+def import_inventory_file(file, filename, *, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    """
+    Streams an uploaded .csv/.xlsx file through process_inventory_rows chunk
+    by chunk, each chunk in its own transaction. Memory use follows the chunk
+    size, not the file size. Returns the same summary as process_inventory_file.
+    - progress(rows read so far) is called after every chunk
+    Raises ValueError for other file types and unreadable files.
+    """
+    if filename.endswith('.xlsx'):
+        chunks = read_xlsx_chunks(file, chunk_size)
+    elif filename.endswith('.csv'):
+        chunks = read_csv_chunks(file, chunk_size)
+    else:
+        raise ValueError("Unsupported file format. Please upload a .xlsx or .csv file.")
+
+    summary = new_import_summary()
+    seen_serials = SerialSeenSet()
+    columns = None
+    has_rows = False
+    rows_read = 0
+
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        rows_read += len(chunk)
+
+        if columns is None:
+            columns = [str(c).strip() for c in chunk.columns]
+            missing = missing_import_columns(columns)
+            if missing:
+                summary["errors"].append(f"Missing required columns: {', '.join(sorted(missing))}")
+                return summary
+
+        chunk.columns = columns
+        chunk = chunk.dropna(how="all")
+        if not chunk.empty:
+            has_rows = True
+            process_inventory_rows(chunk, summary, seen_serials=seen_serials)
+
+        if progress:
+            progress(rows_read)
+
+    if columns is None:
+        summary["errors"].append("The uploaded file is empty.")
+    elif not has_rows:
+        summary["errors"].append("The file contains only empty rows.")
+    return summary
@@ -0,0 +1,72 @@
+# inventory/management/commands/benchmark_import.py
+
+import random
+import time
+import pandas as pd
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from inventory.utils import import_upsert_mode, process_inventory_file
+
+LOCATIONS = ['Maadi Yard', 'abu rudies yard', 'maadi-yard']
+STATUSES = ['available', 'On Job', 'pending inspection', 're cut', '']
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks process_inventory_file throughput on synthetic fleet sheets: a first '
+        'import (creates), a re-import with changes (updates) and an identical re-import '
+        '(no changes). Everything is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1_000, 10_000, 100_000])
+        parser.add_argument('--categories', type=int, default=25)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--upsert', choices=['staging', 'orm'],
+            help='Upsert mode to benchmark (defaults to settings.INVENTORY_IMPORT_UPSERT).',
+        )
+
+    def handle(self, *args, **options):
+        if options['upsert']:
+            settings.INVENTORY_IMPORT_UPSERT = options['upsert']
+        self.stdout.write(f"Upsert mode: {import_upsert_mode()}")
+
+        rng = random.Random(options['seed'])
+        prefix = f'BM{rng.getrandbits(24):06X}'
+
+        self.stdout.write(f"{'rows':>10} {'pass':<10} {'seconds':>10} {'rows/s':>10} {'queries':>8}")
+
+        for size in sorted(options['sizes']):
+            with transaction.atomic():
+                df = self._sheet(rng, prefix, size, options['categories'])
+                changed = df.copy()
+                changed['Status'] = [rng.choice(STATUSES) for _ in range(size)]
+
+                for name, sheet in (('create', df), ('update', changed), ('unchanged', changed)):
+                    with CaptureQueriesContext(connection) as queries:
+                        started = time.perf_counter()
+                        summary = process_inventory_file(sheet)
+                        elapsed = time.perf_counter() - started
+
+                    self.stdout.write(
+                        f"{size:>10} {name:<10} {elapsed:>10.2f} {size / elapsed:>10.0f} "
+                        f"{len(queries.captured_queries):>8}"
+                    )
+                    if summary['errors']:
+                        self.stdout.write(self.style.WARNING(f"  {len(summary['errors'])} rows had errors"))
+
+                transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Done. Synthetic items were rolled back.'))
+
+    def _sheet(self, rng, prefix, size, categories):
+        # A fleet sheet as users upload it: mixed-case aliases, stray whitespace
+        return pd.DataFrame({
+            'CategoryName': [f'{prefix} Category {rng.randrange(categories)}' for _ in range(size)],
+            'SerialNumber': [f' {prefix.lower()}-{i:08d} ' for i in range(size)],
+            'Location': [rng.choice(LOCATIONS) for _ in range(size)],
+            'Status': [rng.choice(STATUSES) for _ in range(size)],
+            'Unit': [rng.choice(['', 'joint', 'pcs']) for _ in range(size)],
+        })
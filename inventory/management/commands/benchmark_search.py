@@ -0,0 +1,80 @@
+# inventory/management/commands/benchmark_search.py
+
+import random
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from inventory.models import InventoryItem, ProductCategory
+from inventory.search import prefix_search_items, search_items
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks serial number search (plain icontains vs. trigram index vs. prefix) '
+        'on synthetic items. Everything is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--queries', type=int, default=50, help='Searches per method and size.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = sorted(options['sizes'])
+
+        self.stdout.write(f"{'items':>10} {'method':<10} {'p50 ms':>10} {'p95 ms':>10}")
+
+        with transaction.atomic():
+            category = ProductCategory.objects.create(name=f'Benchmark {rng.getrandbits(32):08x}')
+            serials = []
+
+            for size in sizes:
+                # Grow the synthetic fleet up to this size
+                new_items = []
+                while len(serials) < size:
+                    serial = f'BM-{rng.getrandbits(40):010X}'
+                    serials.append(serial)
+                    new_items.append(InventoryItem(
+                        serial_number=serial, category=category, location='maadi-yard',
+                    ))
+                InventoryItem.objects.bulk_create(new_items, batch_size=5000)
+
+                queries = [self._substring(rng, rng.choice(serials)) for _ in range(options['queries'])]
+                prefixes = [rng.choice(serials)[:8] for _ in range(options['queries'])]
+
+                results = {
+                    'icontains': self._time(queries, lambda q: InventoryItem.objects.filter(
+                        Q(serial_number__icontains=q) | Q(category__name__icontains=q)
+                    )[:30]),
+                    'trigram': self._time(queries, lambda q: search_items(InventoryItem.objects.all(), q)[:30]),
+                    'prefix': self._time(prefixes, lambda q: prefix_search_items(InventoryItem.objects.all(), q)[:30]),
+                }
+
+                for method, timings in results.items():
+                    self.stdout.write(
+                        f"{size:>10} {method:<10} {statistics.median(timings):>10.2f} "
+                        f"{self._p95(timings):>10.2f}"
+                    )
+
+            transaction.set_rollback(True)
+
+        self.stdout.write(self.style.SUCCESS('Done. Synthetic items were rolled back.'))
+
+    def _substring(self, rng, serial):
+        # A 5-character slice from the random part of the serial
+        start = rng.randint(3, len(serial) - 5)
+        return serial[start:start + 5].lower()
+
+    def _time(self, queries, search):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            list(search(query))
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _p95(self, timings):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
@@ -0,0 +1,16 @@
+# inventory/management/commands/rebuild_search_index.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the serial number trigram search index from scratch.'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding the serial number search index...')
+
+        with transaction.atomic():
+            total = rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} items.'))
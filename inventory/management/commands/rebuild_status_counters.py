@@ -0,0 +1,35 @@
+# inventory/management/commands/rebuild_status_counters.py
+
+from django.core.management.base import BaseCommand
+from inventory import counters
+from inventory.models import ProductCategory
+
+class Command(BaseCommand):
+    help = 'Rebuilds the inventory status counters from live item counts and reports any drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report drift, do not rebuild the table.',
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.find_drift()
+
+        if not drift:
+            self.stdout.write(self.style.SUCCESS('Status counters match the live counts.'))
+        else:
+            category_names = dict(ProductCategory.objects.values_list('id', 'name'))
+            self.stdout.write(self.style.WARNING(f'Found drift in {len(drift)} counter(s):'))
+            for (status, location, category_id), (stored, live) in sorted(drift.items(), key=str):
+                self.stdout.write(
+                    f"  {category_names.get(category_id, category_id)} / {location} / {status}: "
+                    f"stored {stored}, live {live}"
+                )
+
+        if options['check']:
+            return
+
+        counters.rebuild()
+        self.stdout.write(self.style.SUCCESS('Rebuilt the status counter table.'))
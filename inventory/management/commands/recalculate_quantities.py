@@ -1,26 +1,84 @@
 # inventory/management/commands/recalculate_quantities.py
 
-from django.core.management.base import BaseCommand
-from inventory.models import ProductCategory, InventoryItem
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from django.utils.dateparse import parse_datetime
+from django.utils import timezone
+from core.tasks import enqueue
+from inventory.models import InventoryItem, ProductCategory
+from inventory.utils import recalculate_category_quantities
 
 class Command(BaseCommand):
     help = 'Recalculates the TOTAL quantity for each ProductCategory based on all its items.'
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write(self.style.SUCCESS('Starting TOTAL quantity recalculation...'))
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--categories',
+            nargs='+',
+            type=int,
+            metavar='ID',
+            help='Only recalculate these category IDs (e.g. the ones touched by an import batch).',
+        )
+        parser.add_argument(
+            '--since',
+            help=(
+                "Only recalculate categories with items updated at or after this time, e.g. '2026-01-01 08:00', "
+                "plus the categories whose quantity disagrees with the status counters (items moved to another "
+                "category or deleted leave no updated_at behind). A run without --since is the authoritative one."
+            ),
+        )
+        parser.add_argument(
+            '--background',
+            action='store_true',
+            help='Queue the recalculation for a run_tasks worker instead of running it here.',
+        )
 
-        all_categories = ProductCategory.objects.all()
+    def handle(self, *args, **options):
+        category_ids = options['categories']
 
-        for category in all_categories:
-            # Count ALL items in this category, regardless of status.
-            total_count = InventoryItem.objects.filter(category=category).count()
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f"Could not parse --since value '{options['since']}'.")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
 
-            # Update the category's quantity field to the total count.
-            category.quantity = total_count
-            category.save()
+            recent_ids = set(
+                InventoryItem.objects.filter(updated_at__gte=since)
+                .order_by().values_list('category_id', flat=True).distinct()
+            )
+            # Every item write keeps the status counters in step (deletes and category
+            # moves included), so a category that lost items shows up here
+            recent_ids |= set(
+                ProductCategory.objects.annotate(counted=Coalesce(Sum('status_counters__count'), 0))
+                .exclude(quantity=F('counted')).values_list('id', flat=True)
+            )
+            category_ids = recent_ids if category_ids is None else recent_ids & set(category_ids)
+
+        if options['background']:
+            task = enqueue(
+                'inventory.recalculate_quantities',
+                title='Recalculate category quantities',
+                params={'category_ids': None if category_ids is None else sorted(category_ids)},
+            )
+            self.stdout.write(self.style.SUCCESS(f'Queued as background task {task.pk}.'))
+            return
+
+        if category_ids is None:
+            self.stdout.write(self.style.SUCCESS('Starting TOTAL quantity recalculation...'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Starting TOTAL quantity recalculation for {len(category_ids)} categories...'
+            ))
+
+        changed = recalculate_category_quantities(category_ids)
 
+        for category in changed:
             self.stdout.write(
-                f"Updated '{category.name}': Found a total of {total_count} items."
+                f"Updated '{category.name}': Found a total of {category.quantity} items."
             )
 
-        self.stdout.write(self.style.SUCCESS('Finished recalculating all total quantities.'))
\ No newline at end of file
+        self.stdout.write(self.style.SUCCESS(
+            f'Finished recalculating total quantities ({len(changed)} changed).'
+        ))
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    InventoryStatusCounter = apps.get_model('inventory', 'InventoryStatusCounter')
+    grouped = (
+        InventoryItem.objects.order_by()
+        .values_list('status', 'location', 'category_id')
+        .annotate(n=Count('id'))
+    )
+    InventoryStatusCounter.objects.bulk_create([
+        InventoryStatusCounter(status=status, location=location, category_id=category_id, count=n)
+        for status, location, category_id, n in grouped
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryStatusCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('available', 'Available'), ('on_job', 'On Job'), ('re-cut', 'Re-cut'), ('lih', 'LIH'), ('junk', 'Junk'), ('pending_inspection', 'Pending Inspection'), ('sold', 'Sold')], max_length=20)),
+                ('location', models.CharField(choices=[('maadi-yard', 'Maadi Yard'), ('abu-rudies-yard', 'Abu Rudies Yard')], max_length=50)),
+                ('count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_counters', to='inventory.productcategory')),
+            ],
+            options={
+                'unique_together': {('status', 'location', 'category')},
+            },
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    InventoryItem = apps.get_model('inventory', 'InventoryItem')
+    SerialNumberTrigram = apps.get_model('inventory', 'SerialNumberTrigram')
+    items = InventoryItem.objects.order_by('pk').values_list('id', 'serial_number')
+    last_pk = 0
+    while True:
+        pairs = list(items.filter(pk__gt=last_pk)[:2000])
+        if not pairs:
+            return
+        rows = []
+        for item_id, serial in pairs:
+            serial = (serial or '').lower()
+            for gram in {serial[i:i + 3] for i in range(len(serial) - 2)}:
+                rows.append(SerialNumberTrigram(item_id=item_id, trigram=gram))
+        SerialNumberTrigram.objects.bulk_create(rows, batch_size=5000)
+        last_pk = pairs[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_inventorystatuscounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SerialNumberTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='serial_trigrams', to='inventory.inventoryitem')),
+            ],
+            options={
+                'unique_together': {('trigram', 'item')},
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
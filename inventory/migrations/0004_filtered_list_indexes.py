@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_serialnumbertrigram'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['category', 'serial_number'], name='inv_item_category_serial'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['status', 'category', 'serial_number'], name='inv_item_status_cat_serial'),
+        ),
+    ]
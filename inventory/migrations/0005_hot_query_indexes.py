@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_filtered_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['status', 'location'], name='inv_item_status_location'),
+        ),
+        migrations.AddIndex(
+            model_name='inventoryitem',
+            index=models.Index(fields=['category', 'location'], name='inv_item_category_location'),
+        ),
+    ]
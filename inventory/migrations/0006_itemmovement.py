@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:42
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_hot_query_indexes'),
+        ('jobs', '0004_hot_query_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ItemMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField(default=django.utils.timezone.now)),
+                ('kind', models.CharField(choices=[('delivery', 'Delivery'), ('receiving', 'Receiving'), ('inspection', 'Inspection'), ('ticket_edit', 'Ticket edit'), ('status_change', 'Status change')], max_length=20)),
+                ('from_status', models.CharField(blank=True, choices=[('available', 'Available'), ('on_job', 'On Job'), ('re-cut', 'Re-cut'), ('lih', 'LIH'), ('junk', 'Junk'), ('pending_inspection', 'Pending Inspection'), ('sold', 'Sold')], max_length=20)),
+                ('to_status', models.CharField(choices=[('available', 'Available'), ('on_job', 'On Job'), ('re-cut', 'Re-cut'), ('lih', 'LIH'), ('junk', 'Junk'), ('pending_inspection', 'Pending Inspection'), ('sold', 'Sold')], max_length=20)),
+                ('reference', models.CharField(blank=True, help_text="Ticket number, e.g. 'DT-004'.", max_length=100)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movements', to='inventory.inventoryitem')),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='item_movements', to='jobs.job')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['item', 'timestamp'], name='inv_move_item_time'), models.Index(fields=['job', 'timestamp'], name='inv_move_job_time')],
+            },
+        ),
+    ]
@@ -1,5 +1,10 @@
 # inventory/models.py
-from django.db import models
+from django.conf import settings
+from django.db import models, router, transaction
+from django.utils import timezone
+
+# Changing any of these moves an item between status counter buckets.
+COUNTED_FIELDS = {'status', 'location', 'category', 'category_id'}
 
 class ProductCategory(models.Model):
     name = models.CharField(max_length=255, unique=True)
@@ -13,6 +18,63 @@ class ProductCategory(models.Model):
     def __str__(self):
         return self.name
 
+class InventoryItemQuerySet(models.QuerySet):
+    """
+    Keeps InventoryStatusCounter and the serial search index in sync for
+    every bulk write path. bulk_update() goes through update(), so it is
+    covered too.
+    """
+
+    def update(self, **kwargs):
+        counted = COUNTED_FIELDS.intersection(kwargs)
+        searched = 'serial_number' in kwargs
+        if not counted and not searched:
+            return super().update(**kwargs)
+
+        from . import counters, search
+        with transaction.atomic(using=self.db):
+            # Lock the rows and remember which bucket each one was in
+            rows = list(self.order_by().select_for_update().values_list('pk', 'status', 'location', 'category_id'))
+            pks = [row[0] for row in rows]
+            before = counters.count_rows(row[1:] for row in rows)
+            updated = super().update(**kwargs)
+            if counted:
+                counters.apply_deltas(counters.diff(before, counters.snapshot(pks, using=self.db)), using=self.db)
+            if searched:
+                search.reindex_items(pks, using=self.db)
+        return updated
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from . import counters, search
+        objs = list(objs)
+        serials = [obj.serial_number for obj in objs]
+        with transaction.atomic(using=self.db):
+            if kwargs.get('ignore_conflicts') or kwargs.get('update_conflicts'):
+                # Existing rows may be skipped or rewritten, so diff by serial number
+                before = counters.snapshot_serials(serials, using=self.db)
+                created = super().bulk_create(objs, *args, **kwargs)
+                after = counters.snapshot_serials(serials, using=self.db)
+                counters.apply_deltas(counters.diff(before, after), using=self.db)
+            else:
+                created = super().bulk_create(objs, *args, **kwargs)
+                counters.apply_deltas(counters.count_rows(
+                    (obj.status, obj.location, obj.category_id) for obj in objs
+                ), using=self.db)
+            # Not every backend returns the new ids, so index by serial number
+            search.index_serials(serials, using=self.db)
+        return created
+
+    def delete(self):
+        from . import counters
+        with transaction.atomic(using=self.db):
+            before = counters.count_rows(
+                self.order_by().select_for_update().values_list('status', 'location', 'category_id')
+            )
+            result = super().delete()
+            counters.apply_deltas(counters.diff(before, {}), using=self.db)
+        return result
+
+
 class InventoryItem(models.Model):
     LOCATION_CHOICES = [
         ('maadi-yard', 'Maadi Yard'),
@@ -38,8 +100,123 @@ class InventoryItem(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = InventoryItemQuerySet.as_manager()
+
     class Meta:
         ordering = ['category__name', 'serial_number']
+        indexes = [
+            # The filtered list and the export read each category's items in serial order
+            # from these (see utils.page_by_category, utils.walk_by_category)
+            models.Index(fields=['category', 'serial_number'], name='inv_item_category_serial'),
+            models.Index(fields=['status', 'category', 'serial_number'], name='inv_item_status_cat_serial'),
+            # Items by status in a yard (delivery form, status filters)
+            models.Index(fields=['status', 'location'], name='inv_item_status_location'),
+            # A category's items in a yard (inventory list details)
+            models.Index(fields=['category', 'location'], name='inv_item_category_location'),
+        ]
+
+    def __str__(self):
+        return f"{self.category.name} - S/N: {self.serial_number}"
+
+    def save(self, *args, **kwargs):
+        from . import counters, search
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            # Lock the stored row and read its bucket and serial number (None: a new item)
+            stored = None
+            if self.pk:
+                stored = (
+                    InventoryItem._base_manager.using(using).filter(pk=self.pk).order_by().select_for_update()
+                    .values_list('status', 'location', 'category_id', 'serial_number').first()
+                )
+            super().save(*args, **kwargs)
+            before = counters.count_rows([stored[:3]]) if stored else {}
+            after = counters.count_rows([(self.status, self.location, self.category_id)])
+            counters.apply_deltas(counters.diff(before, after), using=using)
+
+            # The search index only depends on the serial number
+            update_fields = kwargs.get('update_fields')
+            serial_saved = update_fields is None or 'serial_number' in update_fields
+            if serial_saved and (stored is None or stored[3] != self.serial_number):
+                search.reindex_items([self.pk], using=using)
+
+    def delete(self, *args, **kwargs):
+        from . import counters
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            before = counters.snapshot([self.pk], using=using, lock=True)
+            result = super().delete(*args, **kwargs)
+            counters.apply_deltas(counters.diff(before, {}), using=using)
+        return result
+
+
+class InventoryStatusCounter(models.Model):
+    """
+    Running item count per (status, location, category) bucket.
+    Maintained by InventoryItem writes; rebuild with `manage.py rebuild_status_counters`.
+    """
+    status = models.CharField(max_length=20, choices=InventoryItem.STATUS_CHOICES)
+    location = models.CharField(max_length=50, choices=InventoryItem.LOCATION_CHOICES)
+    category = models.ForeignKey(ProductCategory, on_delete=models.CASCADE, related_name='status_counters')
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('status', 'location', 'category')
+
+    def __str__(self):
+        return f"{self.category_id} / {self.location} / {self.status}: {self.count}"
+
+
+class ItemMovement(models.Model):
+    """
+    Append-only ledger of what happened to an item: deliveries, receipts,
+    inspection outcomes, ticket edits and manual status changes. Written in
+    the same transaction as the change (see inventory/movements.py) and never
+    updated. Items from before the ledger get their history from the tickets
+    with `manage.py backfill_item_movements`.
+    """
+    KIND_CHOICES = [
+        ('delivery', 'Delivery'),
+        ('receiving', 'Receiving'),
+        ('inspection', 'Inspection'),
+        ('ticket_edit', 'Ticket edit'),
+        ('status_change', 'Status change'),
+    ]
+
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='movements')
+    timestamp = models.DateTimeField(default=timezone.now)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Blank when unknown (backfilled history)
+    from_status = models.CharField(max_length=20, choices=InventoryItem.STATUS_CHOICES, blank=True)
+    to_status = models.CharField(max_length=20, choices=InventoryItem.STATUS_CHOICES)
+    job = models.ForeignKey('jobs.Job', on_delete=models.SET_NULL, null=True, blank=True, related_name='item_movements')
+    reference = models.CharField(max_length=100, blank=True, help_text="Ticket number, e.g. 'DT-004'.")
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # An item's history, newest first, and its latest movement ("where is it").
+            # The primary key is part of every index, which keeps (timestamp, id) keyset pages on it.
+            models.Index(fields=['item', 'timestamp'], name='inv_move_item_time'),
+            # Everything that went through a job
+            models.Index(fields=['job', 'timestamp'], name='inv_move_job_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id}: {self.from_status or '?'} -> {self.to_status} ({self.kind})"
+
+
+class SerialNumberTrigram(models.Model):
+    """
+    One row per distinct 3-character slice of an item's lower-cased serial number.
+    Lets substring searches use an index instead of a leading-wildcard LIKE.
+    Maintained by InventoryItem writes; rebuild with `manage.py rebuild_search_index`.
+    """
+    item = models.ForeignKey(InventoryItem, on_delete=models.CASCADE, related_name='serial_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('trigram', 'item')
 
     def __str__(self):
-        return f"{self.category.name} - S/N: {self.serial_number}"
\ No newline at end of file
+        return f"{self.trigram} -> {self.item_id}"
@@ -0,0 +1,48 @@
+# inventory/movements.py
+"""
+Writing and reading the ItemMovement ledger.
+
+Every code path that moves an item (delivery, receiving, inspection report,
+ticket edit, manual status change) calls record() inside its own
+transaction, so the ledger and the item status never disagree. Reads are
+index seeks on (item, timestamp): the latest movement answers "where is this
+item", and the history page walks the same index in keyset pages.
+"""
+from django.utils import timezone
+from .models import InventoryItem, ItemMovement
+
+
+def record(changes, kind, *, job=None, reference='', user=None, timestamp=None, using='default'):
+    """
+    Appends one movement per (item_id, from_status, to_status) in `changes`
+    (a single INSERT). Call it inside the transaction that changes the items.
+    """
+    timestamp = timestamp or timezone.now()
+    job_id = getattr(job, 'pk', job)
+    user = user if user is None or user.is_authenticated else None
+    movements = [
+        ItemMovement(
+            item_id=item_id, timestamp=timestamp, kind=kind, from_status=from_status or '', to_status=to_status,
+            job_id=job_id, reference=reference, user=user,
+        )
+        for item_id, from_status, to_status in changes
+    ]
+    ItemMovement.objects.using(using).bulk_create(movements, batch_size=1000)
+    return len(movements)
+
+
+def where_is(serial_number):
+    """
+    Returns (item, job) for a serial number: job is the Job the item is on
+    (None when it is in a yard, sold...). item is None for an unknown serial.
+    At most two index seeks: the unique serial number, then the item's latest
+    movement that has a job.
+    """
+    item = InventoryItem.objects.select_related('category').filter(serial_number=serial_number).first()
+    if item is None or item.status != 'on_job':
+        return item, None
+    movement = (
+        item.movements.filter(job__isnull=False).select_related('job__customer')
+        .order_by('-timestamp', '-id').first()
+    )
+    return item, movement.job if movement else None
@@ -0,0 +1,114 @@
+# inventory/search.py
+from django.db.models import Count, Q
+from .models import InventoryItem, ProductCategory, SerialNumberTrigram
+
+# Keep IN (...) lists to a sane size
+CHUNK_SIZE = 2000
+
+
+def trigrams(value):
+    """Returns the set of 3-character slices of a lower-cased value."""
+    value = (value or '').lower()
+    return {value[i:i + 3] for i in range(len(value) - 2)}
+
+
+def _trigram_rows(pairs):
+    return [
+        SerialNumberTrigram(item_id=item_id, trigram=gram)
+        for item_id, serial in pairs
+        for gram in trigrams(serial)
+    ]
+
+
+def index_items(pairs, using='default'):
+    """Adds index rows for (item id, serial number) pairs."""
+    SerialNumberTrigram.objects.using(using).bulk_create(
+        _trigram_rows(pairs), batch_size=5000, ignore_conflicts=True
+    )
+
+
+def index_serials(serials, using='default'):
+    """Adds index rows for the items with these serial numbers."""
+    serials = list(serials)
+    for start in range(0, len(serials), CHUNK_SIZE):
+        pairs = InventoryItem._base_manager.using(using).filter(
+            serial_number__in=serials[start:start + CHUNK_SIZE]
+        ).order_by().values_list('id', 'serial_number')
+        index_items(pairs, using=using)
+
+
+def reindex_items(pks, using='default'):
+    """Drops and rebuilds the index rows of the given item ids."""
+    pks = list(pks)
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        SerialNumberTrigram.objects.using(using).filter(item_id__in=chunk).delete()
+        pairs = InventoryItem._base_manager.using(using).filter(pk__in=chunk).order_by().values_list('id', 'serial_number')
+        SerialNumberTrigram.objects.using(using).bulk_create(
+            _trigram_rows(pairs), batch_size=5000, ignore_conflicts=True
+        )
+
+
+def rebuild_index(using='default', batch_size=CHUNK_SIZE):
+    """Rebuilds the whole index, walking the items in primary key order."""
+    SerialNumberTrigram.objects.using(using).all().delete()
+    items = InventoryItem._base_manager.using(using).order_by('pk').values_list('id', 'serial_number')
+    last_pk = 0
+    total = 0
+    while True:
+        pairs = list(items.filter(pk__gt=last_pk)[:batch_size])
+        if not pairs:
+            return total
+        SerialNumberTrigram.objects.using(using).bulk_create(_trigram_rows(pairs), batch_size=5000)
+        last_pk = pairs[-1][0]
+        total += len(pairs)
+
+
+def serial_q(query):
+    """
+    Q matching items whose serial number contains `query` (case-insensitive).
+    Same result as serial_number__icontains, but the candidate set comes from
+    the trigram index; the icontains check only runs on those candidates.
+    Queries shorter than a trigram match serials starting with them instead.
+    """
+    grams = trigrams(query)
+    if not grams:
+        # Shorter than one trigram: nothing to look up in the index, and a
+        # 1-2 character icontains matches most of the table, all of which the
+        # ordering would sort. A prefix is a range of the serial_number index.
+        return Q(serial_number__istartswith=query)
+
+    candidates = (
+        SerialNumberTrigram.objects
+        .filter(trigram__in=grams)
+        .values('item_id')
+        .annotate(hits=Count('trigram'))
+        .filter(hits=len(grams))
+        .values('item_id')
+    )
+    return Q(id__in=candidates, serial_number__icontains=query)
+
+
+def category_q(query):
+    """Q matching items whose category name contains `query` (small table)."""
+    return Q(category_id__in=ProductCategory.objects.filter(name__icontains=query).values('id'))
+
+
+def search_items(queryset, query, *, categories=True):
+    """
+    Filters `queryset` the same way as
+    Q(serial_number__icontains=query) | Q(category__name__icontains=query)
+    (serial_number__istartswith for queries under 3 characters, see serial_q).
+    """
+    condition = serial_q(query)
+    if categories:
+        condition |= category_q(query)
+    return queryset.filter(condition)
+
+
+def prefix_search_items(queryset, query):
+    """
+    Fast path for scanner input: serials starting with `query`.
+    A prefix LIKE can use the unique index on serial_number.
+    """
+    return queryset.filter(serial_number__istartswith=query)
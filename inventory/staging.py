@@ -0,0 +1,221 @@
+# inventory/staging.py
+import csv
+import io
+from collections import Counter
+from django.db import connection
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from . import counters, search
+from .models import InventoryItem
+
+# Rows per multi-row INSERT into the staging table
+STAGING_INSERT_BATCH = 1000
+
+STAGING_TABLE = 'inventory_import_staging'
+STAGING_COLUMNS = ['row_no', 'serial_number', 'category_id', 'location', 'status']
+
+# Backends with a native INSERT ... SELECT upsert; the rest use bulk_create(update_conflicts=True)
+NATIVE_UPSERT_VENDORS = {'mysql', 'postgresql', 'sqlite'}
+
+
+def _names():
+    qn = connection.ops.quote_name
+    return {'staging': qn(STAGING_TABLE), 'item': qn(InventoryItem._meta.db_table)}
+
+
+def _drop_staging(cursor):
+    # On MySQL a plain DROP TABLE commits the transaction; DROP TEMPORARY TABLE doesn't
+    temporary = 'TEMPORARY ' if connection.vendor == 'mysql' else ''
+    cursor.execute(f"DROP {temporary}TABLE IF EXISTS {_names()['staging']}")
+
+
+def _create_staging(cursor):
+    # Copying the column definitions from the item table keeps types and collations
+    # identical, so the joins below can use the item table's indexes.
+    # item_id is empty after the load (NULL on SQLite and PostgreSQL, 0 on MySQL): the
+    # matching UPDATE in staged_upsert sets it to the item's id, or 0 for "no such item yet".
+    _drop_staging(cursor)
+    cursor.execute(
+        "CREATE TEMPORARY TABLE {staging} AS "
+        "SELECT 0 AS row_no, serial_number, category_id, location, status, id AS item_id "
+        "FROM {item} WHERE 1 = 0".format(**_names())
+    )
+
+
+def _load_staging(cursor, values):
+    """Bulk-loads (row_no, serial, category_id, location, status) tuples."""
+    staging = _names()['staging']
+    columns = ', '.join(STAGING_COLUMNS)
+
+    if connection.vendor == 'postgresql' and hasattr(cursor, 'copy_expert'):
+        # psycopg2: one COPY instead of many INSERTs
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(values)
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        return
+
+    max_params = connection.features.max_query_params
+    batch_size = min(STAGING_INSERT_BATCH, max_params // len(STAGING_COLUMNS)) if max_params else STAGING_INSERT_BATCH
+    placeholder = '(' + ', '.join(['%s'] * len(STAGING_COLUMNS)) + ')'
+    for start in range(0, len(values), batch_size):
+        batch = values[start:start + batch_size]
+        cursor.execute(
+            f"INSERT INTO {staging} ({columns}) VALUES " + ', '.join([placeholder] * len(batch)),
+            [value for row in batch for value in row],
+        )
+
+
+# Whether a staged row (s) matches the item (i) it joined to
+UNCHANGED = "(i.category_id = s.category_id AND i.location = s.location AND i.status = s.status)"
+CHANGED = f"NOT {UNCHANGED}"
+
+
+def _upsert_sql():
+    names = _names()
+    select = (
+        "INSERT INTO {item} (serial_number, category_id, location, status, created_at, updated_at) "
+        "SELECT s.serial_number, s.category_id, s.location, s.status, %s, %s FROM {staging} s "
+    ).format(**names)
+
+    if connection.vendor == 'mysql':
+        return select + (
+            "ON DUPLICATE KEY UPDATE category_id = s.category_id, location = s.location, status = s.status"
+        )
+    # PostgreSQL and SQLite. SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT.
+    return select + (
+        "WHERE 1 = 1 ON CONFLICT (serial_number) DO UPDATE SET "
+        "category_id = EXCLUDED.category_id, location = EXCLUDED.location, status = EXCLUDED.status "
+        "WHERE NOT ({item}.category_id = EXCLUDED.category_id AND {item}.location = EXCLUDED.location "
+        "AND {item}.status = EXCLUDED.status)"
+    ).format(**names)
+
+
+def staged_upsert(rows, summary):
+    """
+    Set-based version of utils._orm_upsert, for validated import rows
+    (_row, SerialNumber, category_id, Location, Status). Must run in a transaction.
+
+    The rows are bulk-loaded into a temporary staging table. Created, updated
+    and unchanged rows are then worked out with joins, and everything is
+    applied with a single INSERT ... SELECT upsert, so the number of
+    round trips doesn't grow with the number of rows (except for the load itself).
+    Adds to summary like _orm_upsert and returns the ids of the categories whose size changed.
+    """
+    names = _names()
+    values = list(zip(
+        rows["_row"].tolist(), rows["SerialNumber"].tolist(), rows["category_id"].tolist(),
+        rows["Location"].tolist(), rows["Status"].tolist(),
+    ))
+
+    with connection.cursor() as cursor:
+        _create_staging(cursor)
+        _load_staging(cursor, values)
+
+        # Match the staged rows to existing items
+        cursor.execute(
+            "UPDATE {staging} SET item_id = COALESCE("
+            "(SELECT i.id FROM {item} i WHERE i.serial_number = {staging}.serial_number), 0)".format(**names)
+        )
+
+        # No changes, but it's not an error
+        cursor.execute(
+            "SELECT s.row_no, s.serial_number FROM {staging} s INNER JOIN {item} i ON i.id = s.item_id "
+            "WHERE {unchanged} ORDER BY s.row_no".format(unchanged=UNCHANGED, **names)
+        )
+        summary["warnings"].extend(
+            f"Row {row_no}: Serial '{serial}' already exists (no changes)." for row_no, serial in cursor.fetchall()
+        )
+
+        if connection.vendor not in NATIVE_UPSERT_VENDORS:
+            return _bulk_create_upsert(cursor, rows, summary)
+
+        # Lock the items about to change and count the buckets they leave...
+        changed_ids = "SELECT s.item_id FROM {staging} s INNER JOIN {item} i ON i.id = s.item_id WHERE {changed}".format(
+            changed=CHANGED, **names
+        )
+        before = counters.count_rows(
+            InventoryItem._base_manager.filter(id__in=RawSQL(changed_ids, ()))
+            .order_by().select_for_update().values_list('status', 'location', 'category_id')
+        )
+
+        # ...and the buckets the new and changed rows land in
+        cursor.execute(
+            "SELECT s.status, s.location, s.category_id, COUNT(*), "
+            "SUM(CASE WHEN s.item_id = 0 THEN 1 ELSE 0 END) "
+            "FROM {staging} s LEFT OUTER JOIN {item} i ON i.id = s.item_id "
+            "WHERE s.item_id = 0 OR {changed} "
+            "GROUP BY s.status, s.location, s.category_id".format(changed=CHANGED, **names)
+        )
+        after = Counter()
+        created = 0
+        affected_category_ids = set()
+        for status, location, category_id, total, new in cursor.fetchall():
+            after[(status, location, category_id)] += total
+            created += int(new)
+            if new:
+                affected_category_ids.add(category_id)
+
+        # Both the old and the new category of moved items
+        cursor.execute(
+            "SELECT DISTINCT i.category_id, s.category_id FROM {staging} s "
+            "INNER JOIN {item} i ON i.id = s.item_id WHERE i.category_id <> s.category_id".format(**names)
+        )
+        for old_category_id, new_category_id in cursor.fetchall():
+            affected_category_ids.update((old_category_id, new_category_id))
+
+        now = connection.ops.adapt_datetimefield_value(timezone.now())
+        cursor.execute(_upsert_sql(), [now, now])
+
+        # Index the new serials (updates never change a serial)
+        cursor.execute(
+            "SELECT i.id, i.serial_number FROM {staging} s "
+            "INNER JOIN {item} i ON i.serial_number = s.serial_number WHERE s.item_id = 0".format(**names)
+        )
+        search.index_items(cursor.fetchall())
+        counters.apply_deltas(counters.diff(before, after))
+
+        _drop_staging(cursor)
+
+    summary["created"] += created
+    summary["updated"] += sum(before.values())
+    return affected_category_ids
+
+
+def _bulk_create_upsert(cursor, rows, summary):
+    """Fallback for backends without a native upsert statement."""
+    names = _names()
+    cursor.execute(
+        "SELECT s.row_no, i.category_id FROM {staging} s LEFT OUTER JOIN {item} i ON i.id = s.item_id "
+        "WHERE s.item_id = 0 OR {changed}".format(changed=CHANGED, **names)
+    )
+    old_categories = dict(cursor.fetchall())
+    _drop_staging(cursor)
+
+    pending = rows[rows["_row"].isin(old_categories.keys())]
+    # InventoryItemQuerySet.bulk_create keeps the counters and the search index in sync
+    InventoryItem.objects.bulk_create(
+        [
+            InventoryItem(serial_number=serial, category_id=category_id, location=location, status=status)
+            for serial, category_id, location, status in zip(
+                pending["SerialNumber"].tolist(), pending["category_id"].tolist(),
+                pending["Location"].tolist(), pending["Status"].tolist(),
+            )
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['serial_number'],
+        update_fields=['category', 'location', 'status'],
+    )
+
+    affected_category_ids = set()
+    for row_no, category_id in zip(pending["_row"].tolist(), pending["category_id"].tolist()):
+        old_category_id = old_categories[row_no]
+        if old_category_id is None:
+            summary["created"] += 1
+            affected_category_ids.add(category_id)
+        else:
+            summary["updated"] += 1
+            if old_category_id != category_id:
+                affected_category_ids.update((old_category_id, category_id))
+    return affected_category_ids
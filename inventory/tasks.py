@@ -0,0 +1,62 @@
+# inventory/tasks.py
+import tempfile
+from django.core.files import File
+from django.urls import reverse
+from core.tasks import TaskFailed, task
+from .exports import write_items_csv, write_items_xlsx
+from .imports import import_inventory_file
+from .models import InventoryItem
+from .utils import filter_items_by_status, recalculate_category_quantities
+
+
+# Imports commit chunk by chunk: a retry would start again from row 1 and report a
+# misleading created/updated summary, so a failed import is not retried (upload it again)
+@task('inventory.import_file', max_attempts=1)
+def import_file(task, filename):
+    """Imports an uploaded .xlsx/.csv file (stored as task.input_file)."""
+    def progress(rows):
+        task.set_progress(rows, None, f"{rows:,} rows processed...")
+
+    with task.input_file.open('rb') as file:
+        try:
+            summary = import_inventory_file(file, filename, progress=progress)
+        except ValueError as e:
+            raise TaskFailed(f"An error occurred while processing the file: {e}")
+
+    return {
+        'message': f"Import finished: {summary['created']} created, {summary['updated']} updated, "
+                   f"{summary['skipped']} skipped.",
+        'level': 'warning' if summary['errors'] else 'success',
+        'summary': summary,
+        'link_url': reverse('import_results') + f'?task={task.pk}',
+        'link_label': 'View import results',
+    }
+
+
+@task('inventory.export_items')
+def export_items(task, status=None, format='xlsx'):
+    """Exports the (optionally status-filtered) inventory to task.result_file."""
+    queryset, _, title = filter_items_by_status(InventoryItem.objects.all(), status)
+    include_reason = status == 're-cut'
+    total = queryset.count()
+
+    def progress(rows):
+        task.set_progress(rows, total, f"{rows:,} of {total:,} items written...")
+
+    # The file is spooled to a temporary file, then handed to the storage
+    with tempfile.TemporaryFile() as output:
+        if format in ('csv', 'csv.gz'):
+            write_items_csv(queryset, output, include_reason, compress=format == 'csv.gz', progress=progress)
+        else:
+            format = 'xlsx'
+            write_items_xlsx(queryset, title, output, include_reason, progress=progress)
+        output.seek(0)
+        task.result_file.save(f"{title}.{format}", File(output), save=True)
+
+    return {'message': f"Exported {total:,} items."}
+
+
+@task('inventory.recalculate_quantities')
+def recalculate_quantities(task, category_ids=None):
+    changed = recalculate_category_quantities(category_ids)
+    return {'message': f"Finished recalculating total quantities ({len(changed)} changed)."}
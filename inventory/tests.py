@@ -1,3 +1,356 @@
-from django.test import TestCase
+import csv
+from io import BytesIO, StringIO
+from unittest import mock
+from openpyxl import Workbook
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Count
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from core.pagination import encode_cursor
+from core.testing import QueryBudgetMixin
+from jobs.models import Contract, Customer, Job
+from .models import InventoryItem, InventoryStatusCounter, ItemMovement, ProductCategory
+from . import counters, exports, imports, movements, search, transitions, urls, utils
 
-# Create your tests here.
+
+class InventoryQueryBudgetTests(QueryBudgetMixin, TestCase):
+    url_patterns = urls.urlpatterns
+
+    def requests(self, fleet):
+        # Status changes cover the focus delivery ticket's items (they grow with the fleet)
+        selected = list(fleet.delivery_ticket.lines.values_list('item_id', flat=True))
+        serial = fleet.delivery_ticket.lines.order_by('id').values_list('item__serial_number', flat=True).first()
+        upload = SimpleUploadedFile(
+            'fleet.csv', b'CategoryName,SerialNumber,Location,Status,Unit\nFocus Category,QB-NEW-1,maadi-yard,,\n'
+        )
+        return [
+            ('inventory_list', 'get', reverse('inventory_list'), None),
+            ('inventory_list (search)', 'get', reverse('inventory_list'), {'q': 'QB-0'}),
+            ('get_item_details', 'get', reverse('get_item_details', args=[fleet.category.id, 'maadi-yard']), None),
+            ('inventory_filtered_list', 'get', reverse('inventory_filtered_list'), None),
+            ('inventory_filtered_list (status)', 'get', reverse('inventory_filtered_list'), {'status': 'available'}),
+            ('inventory_filtered_list (search)', 'get', reverse('inventory_filtered_list'), {'q': 'QB-0'}),
+            ('inventory_filtered_list (next page)', 'get', reverse('inventory_filtered_list'),
+             {'status': 'available', 'after': encode_cursor(['Focus Category', 'QB-0000001'])}, {'HX-Request': 'true'}),
+            ('download_template', 'get', reverse('download_template'), None),
+            ('inventory_import', 'get', reverse('inventory_import'), None),
+            ('inventory_import (upload)', 'post', reverse('inventory_import'), {'inventory_file': upload}),
+            ('import_results', 'get', reverse('import_results'), None),
+            ('inventory_change_status', 'get', reverse('inventory_change_status'), None),
+            ('inventory_change_status (update)', 'post', reverse('inventory_change_status'),
+             {'selected_items': selected, 'new_status': 'sold'}),
+            ('inventory_change_status (not allowed)', 'post', reverse('inventory_change_status'),
+             {'selected_items': selected, 'new_status': 'available'}),
+            ('ajax_inventory_search', 'get', reverse('ajax_inventory_search'), {'q': 'QB-0'}),
+            ('ajax_inventory_search (prefix)', 'get', reverse('ajax_inventory_search'), {'q': 'QB-00', 'mode': 'prefix'}),
+            ('export_inventory_to_excel', 'get', reverse('export_inventory_to_excel'), {'status': 'available'}),
+            ('item_where_is', 'get', reverse('item_where_is'), {'serial': serial}),
+            ('item_history', 'get', reverse('item_history', args=[serial]), None),
+        ]
+
+
+class SearchIndexTests(TestCase):
+    def test_save_reindexes_only_a_changed_serial(self):
+        category = ProductCategory.objects.create(name='Casing', unit='joint')
+        item = InventoryItem.objects.create(serial_number='IDX-1000', category=category, location='maadi-yard')
+
+        with mock.patch.object(search, 'reindex_items', wraps=search.reindex_items) as reindex:
+            item.status = 'junk'
+            item.save()
+            self.assertFalse(reindex.called)
+
+            item.serial_number = 'IDX-2000'
+            item.save()
+            reindex.assert_called_once()
+
+        found = search.search_items(InventoryItem.objects.all(), 'X-20')
+        self.assertEqual(list(found), [item])
+        self.assertFalse(search.search_items(InventoryItem.objects.all(), 'X-10').exists())
+
+    def test_short_queries_match_a_prefix(self):
+        category = ProductCategory.objects.create(name='Casing', unit='joint')
+        items = InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=serial, category=category, location='maadi-yard') for serial in ('AB-1', 'XAB-2')
+        ])
+        found = search.search_items(InventoryItem.objects.all(), 'ab', categories=False)
+        self.assertEqual([item.serial_number for item in found], ['AB-1'])
+        self.assertEqual(search.search_items(InventoryItem.objects.all(), 'ab-', categories=False).count(), len(items))
+
+
+class RecalculateQuantitiesTests(TestCase):
+    def test_since_picks_up_categories_that_lost_items(self):
+        old, new = (ProductCategory.objects.create(name=name, unit='joint') for name in ('Old', 'New'))
+        InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=f'RQ-{i}', category=old, location='maadi-yard') for i in range(3)
+        ])
+        call_command('recalculate_quantities', stdout=StringIO())
+        # QuerySet.update leaves updated_at alone; the counters still follow the move
+        InventoryItem.objects.filter(serial_number__in=['RQ-0', 'RQ-1']).update(category=new)
+
+        call_command('recalculate_quantities', since='2999-01-01 00:00', stdout=StringIO())
+        old.refresh_from_db()
+        new.refresh_from_db()
+        self.assertEqual((old.quantity, new.quantity), (1, 2))
+
+
+class ItemMovementTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('yard', password='yard')
+        self.client.force_login(self.user)
+        category = ProductCategory.objects.create(name='Drill Pipe', unit='joint')
+        self.item = InventoryItem.objects.create(serial_number='DP-001', category=category, location='maadi-yard')
+        customer = Customer.objects.create(name='Ledger Customer')
+        Contract.objects.create(customer=customer).items.add(category)
+        self.job = Job.objects.create(job_type='1101', customer=customer, rig='Rig 7', well='Well 7', location='Field')
+
+    def test_delivery_receiving_and_manual_change_are_recorded(self):
+        self.client.post(reverse('job_detail', args=[self.job.id]), {'submit_delivery': '1', 'selected_items': [self.item.id]})
+        self.assertEqual(movements.where_is('DP-001'), (self.item, self.job))
+
+        self.client.post(reverse('job_detail', args=[self.job.id]), {'submit_receiving': '1', 'used_items': [self.item.id]})
+        self.client.post(reverse('inventory_change_status'), {'selected_items': [self.item.id], 'new_status': 'available'})
+        self.assertEqual(movements.where_is('DP-001'), (self.item, None))
+
+        history = list(self.item.movements.order_by('timestamp', 'id').values_list('kind', 'from_status', 'to_status', 'job'))
+        self.assertEqual(history, [
+            ('delivery', 'available', 'on_job', self.job.id),
+            ('receiving', 'on_job', 'pending_inspection', self.job.id),
+            ('status_change', 'pending_inspection', 'available', None),
+        ])
+
+        response = self.client.get(reverse('item_history', args=['DP-001']))
+        self.assertContains(response, self.job.job_number)
+        self.assertContains(response, 'Status change')
+
+    def test_where_is_redirects_to_the_history(self):
+        response = self.client.get(reverse('item_where_is'), {'serial': 'DP-001'})
+        self.assertRedirects(response, reverse('item_history', args=['DP-001']))
+        response = self.client.get(reverse('item_where_is'), {'serial': 'NOPE'})
+        self.assertRedirects(response, reverse('inventory_list'))
+
+
+# An import file as the template lays it out; None is an empty cell
+IMPORT_HEADER = ['CategoryName', 'SerialNumber', 'Location', 'Status', 'Unit']
+IMPORT_ROWS = [
+    ['Casing', 'im-1', 'Maadi Yard', None, 'joint'],        # row 2: created, serial upper-cased
+    ['Casing', 'IM-2', 'abu-rudies-yard', 'Junk', None],    # row 3: created
+    ['Casing', 'IM-1', 'maadi-yard', None, None],           # row 4: duplicate of row 2
+    ['Tubing', 'IM-3', 'Cairo', 'Lost', 'pcs'],             # row 5: bad location and status
+    [None, None, 'maadi-yard', None, None],                 # row 6: no serial, no category
+    ['New Pipe', 'IM-4', 'maadi-yard', 'on job', 'm'],      # row 7: created, with its category
+    ['Casing', 'EX-1', 'maadi-yard', 'available', None],    # row 8: exists, unchanged
+    ['Casing', 'EX-2', 'Abu Rudies Yard', None, None],      # row 9: exists, moved yard
+    [None, None, None, None, None],                         # empty: ignored
+]
+LOCATIONS = sorted(key for key, _ in InventoryItem.LOCATION_CHOICES)
+STATUSES = sorted(key for key, _ in InventoryItem.STATUS_CHOICES)
+
+
+def import_csv(rows=IMPORT_ROWS):
+    text = StringIO()
+    writer = csv.writer(text)
+    writer.writerow(IMPORT_HEADER)
+    writer.writerows([['' if value is None else value for value in row] for row in rows])
+    return BytesIO(text.getvalue().encode())
+
+
+def import_xlsx(rows=IMPORT_ROWS):
+    workbook = Workbook()
+    workbook.active.append(IMPORT_HEADER)
+    for row in rows:
+        workbook.active.append(row)
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    return output
+
+
+class InventoryImportTests(TestCase):
+    def setUp(self):
+        self.casing = ProductCategory.objects.create(name='Casing')
+        InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=serial, category=self.casing, location='maadi-yard') for serial in ('EX-1', 'EX-2')
+        ])
+
+    def _check(self, summary):
+        self.assertEqual((summary['created'], summary['updated'], summary['skipped']), (3, 1, 3))
+        self.assertEqual(summary['errors'], [
+            "Row 4: Duplicate SerialNumber 'IM-1' in the uploaded file.",
+            f"Row 5: Location 'Cairo' is invalid. Use: {LOCATIONS} | Status 'Lost' is invalid. Use: {STATUSES}",
+            "Row 6: SerialNumber is empty. | CategoryName is empty.",
+        ])
+        self.assertEqual(summary['warnings'], ["Row 8: Serial 'EX-1' already exists (no changes)."])
+
+        items = dict(InventoryItem.objects.values_list('serial_number', 'status'))
+        self.assertEqual(items, {
+            'IM-1': 'available', 'IM-2': 'junk', 'IM-4': 'on_job', 'EX-1': 'available', 'EX-2': 'available',
+        })
+        self.assertEqual(InventoryItem.objects.get(serial_number='EX-2').location, 'abu-rudies-yard')
+        # An unknown category is created with the file's unit; a known one gets its missing unit
+        self.assertEqual(
+            dict(ProductCategory.objects.values_list('name', 'unit')), {'Casing': 'joint', 'New Pipe': 'm'}
+        )
+        self.assertEqual(
+            dict(ProductCategory.objects.values_list('name', 'quantity')), {'Casing': 4, 'New Pipe': 1}
+        )
+
+    def test_csv(self):
+        self._check(imports.import_inventory_file(import_csv(), 'fleet.csv'))
+
+    def test_xlsx(self):
+        self._check(imports.import_inventory_file(import_xlsx(), 'fleet.xlsx'))
+
+    def test_chunks_give_the_same_result(self):
+        # Row 4 repeats row 2's serial in the next chunk
+        self._check(imports.import_inventory_file(import_csv(), 'fleet.csv', chunk_size=2))
+        self._check_counters()
+
+    def test_xlsx_chunks(self):
+        self._check(imports.import_inventory_file(import_xlsx(), 'fleet.xlsx', chunk_size=3))
+        self._check_counters()
+
+    def _check_counters(self):
+        counted = InventoryStatusCounter.objects.filter(count__gt=0).values_list(
+            'status', 'location', 'category_id', 'count'
+        )
+        actual = InventoryItem.objects.order_by().values_list('status', 'location', 'category_id').annotate(Count('id'))
+        self.assertEqual(sorted(counted), sorted(actual))
+
+    def test_staging_and_orm_upserts_agree(self):
+        results = {}
+        for mode in ('staging', 'orm'):
+            # Each mode starts from the same items: the first run is rolled back
+            with override_settings(INVENTORY_IMPORT_UPSERT=mode), transaction.atomic():
+                summary = imports.import_inventory_file(import_csv(), 'fleet.csv')
+                results[mode] = (
+                    summary,
+                    sorted(InventoryItem.objects.values_list('serial_number', 'category__name', 'location', 'status')),
+                    sorted(InventoryStatusCounter.objects.filter(count__gt=0).values_list(
+                        'status', 'location', 'category__name', 'count'
+                    )),
+                    sorted(ProductCategory.objects.values_list('name', 'unit', 'quantity')),
+                )
+                transaction.set_rollback(True)
+        self.assertEqual(results['staging'], results['orm'])
+        self.assertEqual(results['orm'][0]['created'], 3)
+
+    def test_blank_cells_are_empty_not_nan(self):
+        # An empty cell used to be imported as the text 'nan' (serial 'NAN', category 'nan')
+        summary = imports.import_inventory_file(import_csv([[None, 'IM-9', None, None, None]]), 'fleet.csv')
+        self.assertEqual(summary['errors'], ["Row 2: CategoryName is empty. | Location is empty."])
+        self.assertFalse(ProductCategory.objects.filter(name__iexact='nan').exists())
+
+    def test_missing_columns(self):
+        upload = BytesIO(b'Serial Number,Category,Location\nX-1,Casing,maadi-yard\n')
+        summary = imports.import_inventory_file(upload, 'fleet.csv')
+        self.assertEqual(summary['errors'], ['Missing required columns: CategoryName, SerialNumber, Status, Unit'])
+
+
+class ExportRowsTests(TestCase):
+    def test_pages_keep_the_category_and_serial_order(self):
+        tubing, casing = (ProductCategory.objects.create(name=name, unit='joint') for name in ('Tubing', 'Casing'))
+        # Inserted out of order: the export is sorted by category name, then serial number
+        InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=f'EX-{i}', category=tubing if i % 2 else casing, location='maadi-yard',
+                          status='available' if i == 3 else 'junk')
+            for i in (5, 2, 7, 4, 1, 6, 3, 0)
+        ])
+        with mock.patch.object(exports, 'CHUNK_SIZE', 2):
+            rows = list(exports.export_rows(InventoryItem.objects.filter(status='junk')))
+        self.assertEqual(
+            [(row[1], row[0]) for row in rows],
+            [('Casing', 'EX-0'), ('Casing', 'EX-2'), ('Casing', 'EX-4'), ('Casing', 'EX-6'),
+             ('Tubing', 'EX-1'), ('Tubing', 'EX-5'), ('Tubing', 'EX-7')],
+        )
+        self.assertEqual(rows[0][1:4], ['Casing', 'Maadi Yard', 'Junk'])
+
+
+class PageByCategoryTests(TestCase):
+    def setUp(self):
+        categories = [ProductCategory.objects.create(name=name, unit='joint') for name in ('Tubing', 'Casing', 'Drill Pipe')]
+        # Inserted out of order: pages follow category name, then serial number
+        InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=f'PG-{i}', category=categories[i % 3], location='maadi-yard', status='available')
+            for i in (7, 2, 9, 4, 1, 8, 0, 5, 3, 6)
+        ])
+        self.expected = sorted(
+            InventoryItem.objects.values_list('category__name', 'serial_number'), key=lambda row: (row[0], row[1])
+        )
+
+    def _walk(self, queryset, per_page):
+        rows, start_at = [], None
+        while True:
+            page, start_at = utils.page_by_category(queryset, utils.category_counts('available'), start_at, per_page)
+            self.assertLessEqual(len(page), per_page)
+            rows += [(item.category.name, item.serial_number) for item in page]
+            if start_at is None:
+                return rows
+
+    def test_pages_follow_the_category_and_serial_order(self):
+        queryset = InventoryItem.objects.filter(status='available').select_related('category')
+        for per_page in (1, 2, 3, 4, 100):
+            with self.subTest(per_page=per_page):
+                self.assertEqual(self._walk(queryset, per_page), self.expected)
+
+    def test_search_skips_categories_without_matches(self):
+        # The counts overestimate a search: Tubing (PG-0, 3, 6, 9) has no match
+        queryset = InventoryItem.objects.filter(status='available').exclude(serial_number__in=['PG-0', 'PG-3', 'PG-6', 'PG-9'])
+        rows = self._walk(queryset.select_related('category'), 2)
+        self.assertEqual(rows, [row for row in self.expected if row[0] != 'Tubing'])
+
+
+class StatusTransitionTests(TestCase):
+    def setUp(self):
+        category = ProductCategory.objects.create(name='Casing', unit='joint')
+        statuses = ['available', 'available', 'on_job', 're-cut', 'junk']
+        InventoryItem.objects.bulk_create([
+            InventoryItem(serial_number=f'CS-{i}', category=category, location='maadi-yard', status=status)
+            for i, status in enumerate(statuses)
+        ])
+        self.items = {item.serial_number: item for item in InventoryItem.objects.all()}
+
+    def _check(self):
+        ids = [self.items[s].id for s in ('CS-0', 'CS-2', 'CS-4')]
+        result = transitions.change_status('junk', ids=ids + [999999], serials=['CS-3', 'NOPE'])
+
+        self.assertEqual(result['changed'], ['CS-0', 'CS-3'])
+        self.assertEqual(result['rejected'], [('CS-2', 'on_job'), ('CS-4', 'junk')])
+        self.assertEqual(result['not_found'], [999999, 'NOPE'])
+
+        statuses = dict(InventoryItem.objects.values_list('serial_number', 'status'))
+        self.assertEqual(statuses, {'CS-0': 'junk', 'CS-1': 'available', 'CS-2': 'on_job', 'CS-3': 'junk', 'CS-4': 'junk'})
+        self.assertEqual(counters.find_drift(), {})
+        self.assertEqual(
+            sorted(ItemMovement.objects.values_list('item__serial_number', 'from_status', 'to_status')),
+            [('CS-0', 'available', 'junk'), ('CS-3', 're-cut', 'junk')],
+        )
+
+    def test_update_returning(self):
+        self._check()
+
+    def test_lock_and_update(self):
+        # The MySQL path (no UPDATE ... RETURNING)
+        with mock.patch.object(transitions, '_returns_from_update', return_value=False):
+            self._check()
+
+    def test_chunks(self):
+        with mock.patch.object(transitions, 'CHUNK_SIZE', 2):
+            self._check()
+
+    def test_serial_typed_in_another_case(self):
+        result = transitions.change_status('junk', serials=['cs-3'])
+        # Changed where the collation ignores case (MySQL), not found where it doesn't, never both
+        if connection.vendor == 'mysql':
+            self.assertEqual((result['changed'], result['not_found']), (['CS-3'], []))
+        else:
+            self.assertEqual((result['changed'], result['not_found']), ([], ['cs-3']))
+
+    def test_case_insensitive_match_is_reported_once(self):
+        # What a case-insensitive database returns for 'cs-3'
+        with mock.patch.object(transitions, '_ids_of_serials', wraps=transitions._ids_of_serials) as lookup:
+            lookup.side_effect = lambda serials, *args: ({'cs-3': self.items['CS-3'].id}, [])
+            result = transitions.change_status('junk', serials=['cs-3'])
+        self.assertEqual(result, {'changed': ['CS-3'], 'rejected': [], 'not_found': []})
@@ -0,0 +1,168 @@
+# inventory/transitions.py
+"""
+Bulk manual status changes ("Change status" page).
+
+Only the transitions in ALLOWED_TRANSITIONS can be made by hand; moving an
+item onto or off a job takes a delivery or receiving ticket. The check is
+part of the UPDATE itself (WHERE status IN (allowed sources)), so a row
+that changed in the meantime is simply not updated, and there is no
+separate lock-and-read first:
+- PostgreSQL and SQLite (3.35+): one UPDATE ... RETURNING per chunk and
+  source status gives back the changed rows (the source status is the
+  old status the counters and the ledger need)
+- MySQL has no UPDATE ... RETURNING: the rows are locked and read with
+  SELECT ... FOR UPDATE, then updated with one UPDATE per chunk
+
+Status counters and the movement ledger are written from the changed rows,
+in the same transaction. Items can be given by id or by serial number
+(looked up first, matched the way the database compares them).
+"""
+from collections import Counter
+from django.db import connections, transaction
+from django.utils import timezone
+from . import counters, movements
+from .models import InventoryItem
+
+# New status -> statuses an item may have to be moved to it by hand
+ALLOWED_TRANSITIONS = {
+    'available': {'re-cut', 'pending_inspection'},
+    're-cut': {'available', 'pending_inspection'},
+    'junk': {'available', 're-cut', 'pending_inspection'},
+    'sold': {'available', 'on_job'},
+    'lih': {'on_job'},
+    # Only tickets move items onto a job or back for inspection
+    'on_job': set(),
+    'pending_inspection': set(),
+}
+
+# Keys per statement
+CHUNK_SIZE = 1000
+
+
+def allowed_sources(new_status):
+    return ALLOWED_TRANSITIONS.get(new_status, set())
+
+
+def _returns_from_update(connection):
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and connection.Database.sqlite_version_info >= (3, 35)
+
+
+def _chunk_size(connection):
+    # A chunk plus the status parameters must fit in one statement
+    max_params = connection.features.max_query_params
+    return min(CHUNK_SIZE, max_params - 10) if max_params else CHUNK_SIZE
+
+
+def _update_returning(cursor, table, ids, new_status, source, now):
+    """One conditional UPDATE; returns (id, serial_number, location, category_id) of the changed rows."""
+    placeholders = ', '.join(['%s'] * len(ids))
+    cursor.execute(
+        f"UPDATE {table} SET status = %s, updated_at = %s WHERE id IN ({placeholders}) AND status = %s "
+        "RETURNING id, serial_number, location, category_id",
+        [new_status, now, *ids, source],
+    )
+    return cursor.fetchall()
+
+
+def _lock_and_update(cursor, table, ids, new_status, sources, using, now):
+    """SELECT ... FOR UPDATE of the rows allowed to change, then one UPDATE of exactly those."""
+    rows = list(
+        InventoryItem.objects.using(using).select_for_update().order_by()
+        .filter(id__in=ids, status__in=sources)
+        .values_list('id', 'serial_number', 'status', 'location', 'category_id')
+    )
+    if rows:
+        locked = [row[0] for row in rows]
+        cursor.execute(
+            f"UPDATE {table} SET status = %s, updated_at = %s WHERE id IN ({', '.join(['%s'] * len(locked))})",
+            [new_status, now, *locked],
+        )
+    return rows
+
+
+def _ids_of_serials(serials, chunk_size, using):
+    """
+    Returns ({casefolded serial: id}, serials that match no item). The
+    database may compare serial numbers case-insensitively (MySQL's _ci
+    collations), so typed serials are matched to the stored ones the same way.
+    """
+    found = {}
+    for start in range(0, len(serials), chunk_size):
+        rows = InventoryItem.objects.using(using).order_by().filter(
+            serial_number__in=serials[start:start + chunk_size]
+        ).values_list('serial_number', 'id')
+        found.update((serial.casefold(), item_id) for serial, item_id in rows)
+    return found, [serial for serial in serials if serial.casefold() not in found]
+
+
+def change_status(new_status, *, ids=(), serials=(), user=None, using='default'):
+    """
+    Moves the given items (by id and/or serial number) to new_status where
+    ALLOWED_TRANSITIONS permits it. Serial numbers are looked up first, so
+    everything else works on ids. Returns a dict:
+    - changed: serial numbers of the items that changed
+    - rejected: (serial number, current status) of the items that were not
+      allowed to change (already in new_status included)
+    - not_found: the ids/serial numbers that match no item
+    """
+    connection = connections[using]
+    table = connection.ops.quote_name(InventoryItem._meta.db_table)
+    sources = sorted(allowed_sources(new_status))
+    returning = _returns_from_update(connection)
+    chunk_size = _chunk_size(connection)
+    now = timezone.now()
+
+    ids = [int(i) for i in ids]
+    missing_serials = []
+    serials = list(dict.fromkeys(str(s) for s in serials))
+    if serials:
+        found, missing_serials = _ids_of_serials(serials, chunk_size, using)
+        ids += found.values()
+    ids = list(dict.fromkeys(ids))
+
+    changed = []  # (id, serial_number, old status, location, category_id)
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        # No allowed sources: nothing to update, everything is rejected below
+        for start in range(0, len(ids) if sources else 0, chunk_size):
+            chunk = ids[start:start + chunk_size]
+            if returning:
+                for source in sources:
+                    for item_id, serial, location, category_id in _update_returning(
+                            cursor, table, chunk, new_status, source, now):
+                        changed.append((item_id, serial, source, location, category_id))
+            else:
+                changed += _lock_and_update(cursor, table, chunk, new_status, sources, using, now)
+
+        # Counters: each changed item leaves its old bucket for the new one
+        deltas = Counter()
+        for _, _, old_status, location, category_id in changed:
+            deltas[(old_status, location, category_id)] -= 1
+            deltas[(new_status, location, category_id)] += 1
+        counters.apply_deltas(deltas, using=using)
+        movements.record(
+            [(item_id, old_status, new_status) for item_id, _, old_status, _, _ in changed], 'status_change',
+            user=user, timestamp=now, using=using,
+        )
+
+    # Only when something didn't change: what is it now, if it exists at all
+    changed_ids = {row[0] for row in changed}
+    unchanged = [item_id for item_id in ids if item_id not in changed_ids]
+    rejected, missing_ids = [], []
+    for start in range(0, len(unchanged), chunk_size):
+        chunk = unchanged[start:start + chunk_size]
+        rows = InventoryItem.objects.using(using).order_by().filter(id__in=chunk).values_list(
+            'id', 'serial_number', 'status'
+        )
+        found_ids = set()
+        for item_id, serial, status in rows:
+            found_ids.add(item_id)
+            rejected.append((serial, status))
+        missing_ids += [item_id for item_id in chunk if item_id not in found_ids]
+
+    return {
+        'changed': sorted(row[1] for row in changed),
+        'rejected': sorted(rejected),
+        'not_found': missing_ids + missing_serials,
+    }
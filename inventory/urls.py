@@ -12,5 +12,7 @@ urlpatterns = [
     path('change-status/', views.inventory_change_status_view, name='inventory_change_status'),
     path('ajax/search/', views.ajax_inventory_search, name='ajax_inventory_search'),
     path('export/', views.export_inventory_to_excel_view, name='export_inventory_to_excel'),
+    path('where-is/', views.item_where_is_view, name='item_where_is'),
+    path('items/<path:serial_number>/history/', views.item_history_view, name='item_history'),
 
 ]   
\ No newline at end of file
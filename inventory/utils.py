@@ -1,6 +1,11 @@
 import re
+from operator import attrgetter
+import pandas as pd
+from django.conf import settings
 from django.db import transaction
-from .models import InventoryItem, ProductCategory
+from django.db.models import Count, IntegerField, Sum, Value
+from .models import InventoryItem, InventoryStatusCounter, ProductCategory
+from .staging import staged_upsert
 
 def _norm(v):
     if v is None:
@@ -15,40 +20,259 @@ def _norm_key(v):
     v = re.sub(r"\s+", " ", v)
     return v
 
+LOCATION_ALIASES = {
+    "maadi yard": "maadi-yard",
+    "maadi-yard": "maadi-yard",
+    "abu rudies yard": "abu-rudies-yard",
+    "abu-rudies yard": "abu-rudies-yard",
+    "abu-rudies-yard": "abu-rudies-yard",
+}
+
+STATUS_ALIASES = {
+    "available": "available",
+    "on job": "on_job",
+    "on_job": "on_job",
+    "pending inspection": "pending_inspection",
+    "pending_inspection": "pending_inspection",
+    "re cut": "re-cut",
+    "re-cut": "re-cut",
+    "lih": "lih",
+    "junk": "junk",
+    "": "",
+}
+
 def normalize_location(v):
-    key = _norm_key(v)
-    LOCATION_ALIASES = {
-        "maadi yard": "maadi-yard",
-        "maadi-yard": "maadi-yard",
-        "abu rudies yard": "abu-rudies-yard",
-        "abu-rudies yard": "abu-rudies-yard",
-        "abu-rudies-yard": "abu-rudies-yard",
-    }
-    return LOCATION_ALIASES.get(key, _norm(v))
+    return LOCATION_ALIASES.get(_norm_key(v), _norm(v))
 
 def normalize_status(v):
-    key = _norm_key(v)
-    STATUS_ALIASES = {
-        "available": "available",
-        "on job": "on_job",
-        "on_job": "on_job",
-        "pending inspection": "pending_inspection",
-        "pending_inspection": "pending_inspection",
-        "re cut": "re-cut",
-        "re-cut": "re-cut",
-        "lih": "lih",
-        "junk": "junk",
-        "": "",
-    }
-    return STATUS_ALIASES.get(key, _norm(v))
+    return STATUS_ALIASES.get(_norm_key(v), _norm(v))
 
-def process_inventory_file(df, *, strict=False):
+# Column-wise versions of the helpers above, used by the import
+def _norm_column(s):
+    # Blank cells arrive as NaN/None and count as empty
+    return s.where(s.notna(), "").astype(str).str.strip()
+
+def _alias_column(s, aliases):
+    s = _norm_column(s)
+    key = s.str.lower().str.replace(r"\s+", " ", regex=True)
+    return key.map(aliases).fillna(s)
+
+# status -> (page title, export file title)
+STATUS_FILTER_TITLES = {
+    'available': ("Available Items", "Available_Items"),
+    'on_job': ("Items On Job", "On_Job_Items"),
+    'pending_inspection': ("Items Pending Inspection", "Pending_Inspection_Items"),
+    're-cut': ("Items to be Recut", "Recut_Items"),
+    'lih': ("LIH Items", "LIH_Items"),
+    'junk': ("Junk Items", "Junk_Items"),
+    'sold': ("Sold Items", "Sold_Items"),
+}
+
+def filter_items_by_status(queryset, status_filter):
     """
-    strict=False (your requested behavior):
-      - skip only bad rows + report their errors
-      - upsert: update existing by SerialNumber, create if new
+    Applies the ?status= filter used by the filtered list page and the export.
+    Returns (queryset, page_title, export_title); unknown statuses are ignored.
+    """
+    if status_filter in STATUS_FILTER_TITLES:
+        page_title, export_title = STATUS_FILTER_TITLES[status_filter]
+        return queryset.filter(status=status_filter), page_title, export_title
+    return queryset, "Inventory Details", "Full Inventory"
+
+def category_counts(status=None):
+    """
+    [(category id, category name, items)] of the categories that have items
+    (with this status), in name order. Read from the status counters, a small table.
+    """
+    counters = InventoryStatusCounter.objects.filter(count__gt=0)
+    if status in STATUS_FILTER_TITLES:
+        counters = counters.filter(status=status)
+    return list(
+        counters.values_list('category_id', 'category__name').annotate(items=Sum('count')).order_by('category__name')
+    )
+
+def walk_by_category(queryset, category_ids, chunk_size=1000, serial_of=attrgetter('serial_number')):
+    """
+    Yields the rows of queryset in (category name, serial number) order, the
+    list page's and the export's order, without sorting on the joined name:
+    the categories are walked in the given (name) order, and each one's rows
+    are read in keyset chunks on serial_number. Each chunk is a range scan of
+    the (category, serial_number) or (status, category, serial_number) index,
+    which returns the rows already in order.
+    - category_ids: ids in name order (see category_counts())
+    - serial_of(row) gives a row's serial number (rows of a values_list
+      queryset need their own)
+    """
+    for category_id in category_ids:
+        rows = queryset.filter(category_id=category_id).order_by('serial_number')
+        last_serial = None
+        while True:
+            chunk = rows.filter(serial_number__gt=last_serial) if last_serial is not None else rows
+            chunk = list(chunk[:chunk_size])
+            yield from chunk
+            if len(chunk) < chunk_size:
+                break
+            last_serial = serial_of(chunk[-1])
+
+def page_by_category(queryset, counts, start_at=None, per_page=100):
+    """
+    One page of queryset in (category name, serial number) order, starting at
+    start_at (category name, serial number), or at the beginning.
+    Returns (rows, start_at of the next page or None).
+
+    The order is not sorted out of the joined category name: with the item
+    count of every category (counts, see category_counts()), the categories
+    a page needs are known up front (see category_page_queryset). So a page
+    is two queries over at most per_page + 1 rows, whatever the page. Counts
+    above what is left to read (a search, or the category a page starts in)
+    only make pages shorter.
     """
-    summary = {
+    while True:
+        # The first category at or after start_at's (it may have emptied since)
+        first = next((i for i, (_, name, _) in enumerate(counts) if name >= start_at[0]), len(counts)) if start_at else 0
+        if first == len(counts):
+            return [], None
+        page, next_start = category_page_queryset(queryset, counts, first, start_at, per_page + 1)
+        rows = list(page)
+        if len(rows) > per_page:
+            # The extra row is where the next page starts
+            return rows[:per_page], (rows[per_page].category.name, rows[per_page].serial_number)
+        if rows or next_start is None:
+            return rows, next_start
+        # Nothing matched in these categories (a search): go on with the next ones
+        start_at = next_start
+
+def category_page_queryset(queryset, counts, first, start_at, wanted):
+    """
+    The query behind page_by_category: up to `wanted` rows from counts[first]
+    on. It reads some categories to the end and stops in the last one before
+    its (remaining + 1)th serial number, which is looked up first with an
+    index seek. Each category is its own branch of a UNION ALL, a plain range
+    of the (status,) category, serial_number index already in serial order,
+    so the database only merges them.
+    Returns (queryset, start_at of what comes after it or None).
+    """
+    queryset = queryset.order_by()
+    full, planned = [], 0
+    for last in range(first, len(counts)):
+        if planned + counts[last][2] >= wanted:
+            break
+        full.append(last)
+        planned += counts[last][2]
+    else:
+        # Everything left fits: the last category is read to the end too
+        full.pop()
+        planned -= counts[last][2]
+
+    def in_category(index):
+        category_id, name, _ = counts[index]
+        rows = queryset.filter(category_id=category_id)
+        if start_at and name == start_at[0]:
+            rows = rows.filter(serial_number__gte=start_at[1])
+        return rows.annotate(category_rank=Value(index, output_field=IntegerField()))
+
+    # The page stops in the last category, before its (wanted - planned + 1)th serial number
+    cut = wanted - planned
+    stop = in_category(last)
+    next_serial = stop.order_by('serial_number').values_list('serial_number', flat=True)[cut:cut + 1].first()
+    if next_serial is not None:
+        stop = stop.filter(serial_number__lt=next_serial)
+        next_start = (counts[last][1], next_serial)
+    else:
+        next_start = (counts[last + 1][1], '') if last + 1 < len(counts) else None
+
+    page = stop.union(*[in_category(index) for index in full], all=True)
+    return page.order_by('category_rank', 'serial_number')[:wanted], next_start
+
+def recalculate_category_quantities(category_ids=None):
+    """
+    Sets ProductCategory.quantity to the total number of items in each category.
+    - category_ids=None recalculates every category, otherwise only the given IDs.
+    - One aggregated COUNT query plus one bulk write; returns the changed categories.
+    """
+    categories = ProductCategory.objects.only('id', 'name', 'quantity')
+    items = InventoryItem.objects.order_by()
+
+    if category_ids is not None:
+        category_ids = list(category_ids)
+        if not category_ids:
+            return []
+        categories = categories.filter(id__in=category_ids)
+        items = items.filter(category_id__in=category_ids)
+
+    totals = dict(items.values_list('category_id').annotate(total=Count('id')))
+
+    changed = []
+    for category in categories:
+        total = totals.get(category.id, 0)
+        if category.quantity != total:
+            category.quantity = total
+            changed.append(category)
+
+    if changed:
+        ProductCategory.objects.bulk_update(changed, ['quantity'], batch_size=1000)
+    return changed
+
+# Existing items are looked up this many serials at a time
+EXISTING_BATCH_SIZE = 5000
+
+def _append_error(errors, mask, message):
+    """Adds message (a string, or a Series with one message per row) to the masked rows, ' | '-separated."""
+    if not mask.any():
+        return
+    current = errors[mask]
+    if isinstance(message, pd.Series):
+        message = message[mask]
+    errors[mask] = current.where(current == "", current + " | ") + message
+
+def _existing_items(serials):
+    """The items already stored for these serials, as a DataFrame."""
+    records = []
+    for start in range(0, len(serials), EXISTING_BATCH_SIZE):
+        records.extend(
+            InventoryItem.objects.order_by()
+            .filter(serial_number__in=serials[start:start + EXISTING_BATCH_SIZE])
+            .values_list("serial_number", "id", "category_id", "location", "status")
+        )
+    return pd.DataFrame.from_records(
+        records, columns=["SerialNumber", "id", "old_category_id", "old_location", "old_status"]
+    )
+
+def _resolve_categories(rows):
+    """
+    Returns {category name: id} for every category the rows use.
+    Missing categories are created and empty units are filled in bulk (the first
+    non-empty Unit in the file wins), so the number of queries doesn't depend on the file size.
+    """
+    names = rows["CategoryName"].unique().tolist()
+    units = rows.loc[rows["Unit"] != "", ["CategoryName", "Unit"]].drop_duplicates("CategoryName")
+    first_unit = dict(zip(units["CategoryName"], units["Unit"]))
+
+    categories = ProductCategory.objects.only("id", "name", "unit")
+    cats_by_name = {c.name: c for c in categories.filter(name__in=names)}
+
+    missing = [name for name in names if name not in cats_by_name]
+    if missing:
+        # ignore_conflicts: another import may create the same category meanwhile
+        ProductCategory.objects.bulk_create(
+            [ProductCategory(name=name, unit=first_unit.get(name)) for name in missing],
+            ignore_conflicts=True,
+        )
+        cats_by_name.update((c.name, c) for c in categories.filter(name__in=missing))
+
+    without_unit = []
+    for name, category in cats_by_name.items():
+        if not category.unit and first_unit.get(name):
+            category.unit = first_unit[name]
+            without_unit.append(category)
+    if without_unit:
+        ProductCategory.objects.bulk_update(without_unit, ["unit"], batch_size=1000)
+
+    return {name: category.id for name, category in cats_by_name.items()}
+
+REQUIRED_COLUMNS = {"CategoryName", "SerialNumber", "Location", "Status", "Unit"}
+
+def new_import_summary():
+    return {
         "created": 0,
         "updated": 0,
         "skipped": 0,
@@ -56,15 +280,27 @@ def process_inventory_file(df, *, strict=False):
         "warnings": [],
     }
 
+def missing_import_columns(columns):
+    """Returns the required columns missing from these (already stripped) headers."""
+    return REQUIRED_COLUMNS - set(columns)
+
+def process_inventory_file(df, *, strict=False):
+    """
+    strict=False (your requested behavior):
+      - skip only bad rows + report their errors
+      - upsert: update existing by SerialNumber, create if new
+      - recalculates quantities of the categories this file touched
+    Validation works on whole columns, so it costs the same few queries for any file size.
+    Large uploads go through inventory.imports.import_inventory_file instead, chunk by chunk.
+    """
+    summary = new_import_summary()
+
     if df is None or df.empty:
         summary["errors"].append("The uploaded file is empty.")
         return summary
 
-    df = df.copy()
-    df.columns = [str(c).strip() for c in df.columns]
-
-    required = {"CategoryName", "SerialNumber", "Location", "Status", "Unit"}
-    missing = required - set(df.columns)
+    columns = [str(c).strip() for c in df.columns]
+    missing = missing_import_columns(columns)
     if missing:
         summary["errors"].append(f"Missing required columns: {', '.join(sorted(missing))}")
         return summary
@@ -74,119 +310,141 @@ def process_inventory_file(df, *, strict=False):
         summary["errors"].append("The file contains only empty rows.")
         return summary
 
+    df.columns = columns
+    process_inventory_rows(df, summary)
+    return summary
+
+def process_inventory_rows(df, summary, *, seen_serials=None):
+    """
+    Validates and upserts one frame of import rows in its own transaction and
+    adds the outcome to summary. The frame must have stripped headers and no
+    all-empty rows; its index gives the row numbers (0 = first row under the header).
+    It is modified in place.
+    - seen_serials: serials of earlier chunks of the same file (see
+      inventory.imports.SerialSeenSet); repeats are reported as duplicates
+    """
     df["_row"] = df.index + 2  # header=1
 
     # Normalize values
-    df["CategoryName"] = df["CategoryName"].apply(_norm)
-    df["SerialNumber"] = df["SerialNumber"].apply(_norm_serial)
-    df["Location"] = df["Location"].apply(normalize_location)
-    df["Status"] = df["Status"].apply(normalize_status)
-    df["Unit"] = df["Unit"].apply(_norm)
+    df["CategoryName"] = _norm_column(df["CategoryName"])
+    df["SerialNumber"] = _norm_column(df["SerialNumber"]).str.upper()
+    df["Location"] = _alias_column(df["Location"], LOCATION_ALIASES)
+    df["Status"] = _alias_column(df["Status"], STATUS_ALIASES)
+    df["Unit"] = _norm_column(df["Unit"])
+
+    df.loc[df["Status"] == "", "Status"] = "available"
 
     valid_locations = {k for k, _ in InventoryItem.LOCATION_CHOICES}
     valid_status = {k for k, _ in InventoryItem.STATUS_CHOICES}
 
-    # Preload existing items by serial
-    serials = df.loc[df["SerialNumber"] != "", "SerialNumber"].unique().tolist()
-    existing_items = InventoryItem.objects.in_bulk(serials, field_name="serial_number") if serials else {}
-
-    # Preload categories by name
-    cat_names = sorted(set(df["CategoryName"].tolist()) - {""})
-    cats_by_name = {c.name: c for c in ProductCategory.objects.filter(name__in=cat_names)}
-
-    seen_serials_in_file = set()
-
-    to_create = []
-    to_update = []
-
-    for _, r in df.iterrows():
-        row_no = int(r["_row"])
-        cat_name = r["CategoryName"]
-        serial = r["SerialNumber"]
-        location = r["Location"]
-        status = r["Status"] or "available"
-        unit = r["Unit"]
-
-        row_errors = []
-
-        # Validate required
-        if not serial:
-            row_errors.append("SerialNumber is empty.")
-        if not cat_name:
-            row_errors.append("CategoryName is empty.")
-        if not location:
-            row_errors.append("Location is empty.")
-
-        # Validate choices (after mapping)
-        if location and location not in valid_locations:
-            row_errors.append(f"Location '{location}' is invalid. Use: {sorted(valid_locations)}")
-        if status and status not in valid_status:
-            row_errors.append(f"Status '{status}' is invalid. Use: {sorted(valid_status)}")
-
-        # Detect duplicates inside the file (skip the repeated ones)
-        if serial:
-            if serial in seen_serials_in_file:
-                row_errors.append(f"Duplicate SerialNumber '{serial}' in the uploaded file.")
-            else:
-                seen_serials_in_file.add(serial)
-
-        # If row has errors => skip row, report errors, continue
-        if row_errors:
-            summary["skipped"] += 1
-            summary["errors"].append(f"Row {row_no}: " + " | ".join(row_errors))
-            continue
-
-        # Category create/get + set unit on category if needed
-        category = cats_by_name.get(cat_name)
-        if not category:
-            # This is the fix: get_or_create is database-safe.
-            category, created = ProductCategory.objects.get_or_create(
-                name=cat_name, 
-                defaults={'unit': unit or None}
-            )
-            cats_by_name[cat_name] = category
-        else:
-            if unit and not category.unit:
-                category.unit = unit
-                category.save(update_fields=["unit"])
-
-        # UPSERT: update if exists else create
-        existing = existing_items.get(serial)
-        if existing:
-            changed = False
-
-            if existing.category_id != category.id:
-                existing.category = category
-                changed = True
-            if existing.location != location:
-                existing.location = location
-                changed = True
-            if existing.status != status:
-                existing.status = status
-                changed = True
-
-            if changed:
-                to_update.append(existing)
-            else:
-                # No changes, but it's not an error
-                summary["warnings"].append(f"Row {row_no}: Serial '{serial}' already exists (no changes).")
+    # Validate every row at once; errors holds the " | "-joined messages of each row
+    errors = pd.Series("", index=df.index, dtype=object)
+    has_serial = df["SerialNumber"] != ""
+    has_location = df["Location"] != ""
+
+    # Validate required
+    _append_error(errors, ~has_serial, "SerialNumber is empty.")
+    _append_error(errors, df["CategoryName"] == "", "CategoryName is empty.")
+    _append_error(errors, ~has_location, "Location is empty.")
+
+    # Validate choices (after mapping)
+    _append_error(
+        errors, has_location & ~df["Location"].isin(valid_locations),
+        "Location '" + df["Location"] + f"' is invalid. Use: {sorted(valid_locations)}",
+    )
+    _append_error(
+        errors, ~df["Status"].isin(valid_status),
+        "Status '" + df["Status"] + f"' is invalid. Use: {sorted(valid_status)}",
+    )
+
+    # Detect duplicates inside the file (the first one is kept, the repeated ones skipped)
+    duplicated = df["SerialNumber"].duplicated()
+    if seen_serials is not None:
+        duplicated |= seen_serials.contains(df["SerialNumber"])
+        seen_serials.add(df.loc[has_serial, "SerialNumber"])
+    _append_error(
+        errors, has_serial & duplicated,
+        "Duplicate SerialNumber '" + df["SerialNumber"] + "' in the uploaded file.",
+    )
+
+    # Rows with errors => skip them and report their errors
+    bad = errors != ""
+    summary["skipped"] += int(bad.sum())
+    summary["errors"].extend(("Row " + df.loc[bad, "_row"].astype(str) + ": " + errors[bad]).tolist())
+
+    rows = df.loc[~bad, ["_row", "CategoryName", "SerialNumber", "Location", "Status", "Unit"]]
+    if rows.empty:
+        return
+
+    with transaction.atomic():
+        rows["category_id"] = rows["CategoryName"].map(_resolve_categories(rows))
+
+        # UPSERT: update existing by SerialNumber, create if new
+        if import_upsert_mode() == "staging":
+            affected_category_ids = staged_upsert(rows, summary)
         else:
-            to_create.append(
-                InventoryItem(
-                    serial_number=serial,
-                    category=category,
-                    location=location,
-                    status=status,
-                )
-            )
+            affected_category_ids = _orm_upsert(rows, summary)
+
+        recalculate_category_quantities(affected_category_ids)
+
+def import_upsert_mode():
+    """'staging' (set-based SQL upsert, see inventory/staging.py) or 'orm' (diffed in Python)."""
+    return getattr(settings, "INVENTORY_IMPORT_UPSERT", "staging")
+
+def _orm_upsert(rows, summary):
+    """
+    Diffs the rows against the existing items in Python and saves them with
+    bulk_create/bulk_update. Returns the ids of the categories whose size changed.
+    """
+    # Match the rows against existing items by serial
+    rows = rows.merge(_existing_items(rows["SerialNumber"].tolist()), on="SerialNumber", how="left")
+    is_new = rows["id"].isna()
+
+    new_rows = rows[is_new]
+    to_create = [
+        InventoryItem(serial_number=serial, category_id=category_id, location=location, status=status)
+        for serial, category_id, location, status in zip(
+            new_rows["SerialNumber"].tolist(), new_rows["category_id"].tolist(),
+            new_rows["Location"].tolist(), new_rows["Status"].tolist(),
+        )
+    ]
+
+    existing_rows = rows[~is_new]
+    category_changed = existing_rows["category_id"] != existing_rows["old_category_id"]
+    changed = (
+        category_changed
+        | (existing_rows["Location"] != existing_rows["old_location"])
+        | (existing_rows["Status"] != existing_rows["old_status"])
+    )
+
+    # No changes, but it's not an error
+    unchanged_rows = existing_rows[~changed]
+    summary["warnings"].extend((
+        "Row " + unchanged_rows["_row"].astype(str) + ": Serial '" + unchanged_rows["SerialNumber"]
+        + "' already exists (no changes)."
+    ).tolist())
+
+    changed_rows = existing_rows[changed]
+    to_update = [
+        InventoryItem(pk=int(pk), category_id=category_id, location=location, status=status)
+        for pk, category_id, location, status in zip(
+            changed_rows["id"].tolist(), changed_rows["category_id"].tolist(),
+            changed_rows["Location"].tolist(), changed_rows["Status"].tolist(),
+        )
+    ]
 
     # Save changes
-    with transaction.atomic():
-        if to_create:
-            InventoryItem.objects.bulk_create(to_create, batch_size=1000)
-        if to_update:
-            InventoryItem.objects.bulk_update(to_update, ["category", "location", "status"], batch_size=1000)
+    if to_create:
+        InventoryItem.objects.bulk_create(to_create, batch_size=1000)
+    if to_update:
+        InventoryItem.objects.bulk_update(to_update, ["category", "location", "status"], batch_size=1000)
 
-    summary["created"] = len(to_create)
-    summary["updated"] = len(to_update)
-    return summary
+    summary["created"] += len(to_create)
+    summary["updated"] += len(to_update)
+
+    # New items' categories, plus both the old and the new category of moved items
+    moved = existing_rows[category_changed]
+    affected_category_ids = set(new_rows["category_id"].tolist())
+    affected_category_ids.update(int(c) for c in moved["old_category_id"].tolist())
+    affected_category_ids.update(moved["category_id"].tolist())
+    return affected_category_ids
@@ -1,43 +1,41 @@
-from django.shortcuts import render , redirect
-from django.db.models import Count
-from .models import InventoryItem, ProductCategory
+from django.shortcuts import render , redirect, get_object_or_404
+from django.db.models import Count, Sum
+from .models import InventoryItem, InventoryStatusCounter, ProductCategory
 from django.contrib import messages
 from django.db import models
-from django.core.management import call_command
 from django.http import FileResponse
 from django.contrib.staticfiles import finders
-from .utils import process_inventory_file 
-import pandas as pd
+from .utils import category_counts, filter_items_by_status, page_by_category
+from core.models import BackgroundTask
+from core.tasks import enqueue
+from .search import prefix_search_items, search_items
+from .counters import status_totals
+from . import movements, transitions
+from core.pagination import KeysetPage, decode_cursor, encode_cursor, keyset_paginate
 from django.contrib.auth.decorators import login_required 
-from django.db import transaction
 from django.http import JsonResponse
 from django.db.models import Q
-from django.http import HttpResponse
-import openpyxl
-from openpyxl.utils import get_column_letter
+from django.http import HttpResponse, Http404
 
 @login_required
 def inventory_list_view(request):
     search_query = request.GET.get('q', '')
 
-    # Start with the base query that we will group later
-    base_queryset = InventoryItem.objects.all()
+    # The quantities come from the status counters (one row per status,
+    # location and category) instead of a COUNT over every item
+    base_queryset = InventoryStatusCounter.objects.all()
 
     # If there is a search query, we apply the filter logic
     if search_query:
         # We want to find items where EITHER the serial number contains the query
         # OR the related category's name contains the query.
         # This gives us a list of all individual items that match.
-        matching_items = base_queryset.filter(
-            models.Q(serial_number__icontains=search_query) |
-            models.Q(category__name__icontains=search_query)
-        )
+        matching_items = search_items(InventoryItem.objects.all(), search_query)
         
         # Now, we find out which unique category IDs these matching items belong to.
         matching_category_ids = matching_items.values_list('category_id', flat=True).distinct()
         
         # We will now use these category IDs to filter our main summary query.
-        # However, the summary query is on the base_queryset, so we can just filter it directly.
         base_queryset = base_queryset.filter(category_id__in=matching_category_ids)
 
     # Now, perform the aggregation on the (potentially filtered) base_queryset
@@ -46,8 +44,8 @@ def inventory_list_view(request):
         'category__id', 
         'category__name'
     ).annotate(
-        quantity=Count('id')
-    ).order_by('location', 'category__name')
+        quantity=Sum('count')
+    ).filter(quantity__gt=0).order_by('location', 'category__name')
 
     # The rest of the logic remains the same
     maadi_summary = []
@@ -76,49 +74,46 @@ def get_item_details_view(request, category_id, location):
     }
     return render(request, 'inventory/_item_details.html', context)
 
+# Rows per page (and per infinite-scroll load) on the filtered list
+ITEMS_PER_PAGE = 100
+
 @login_required
 def inventory_filtered_list_view(request):
-    title = "Inventory Details"
     status_filter = request.GET.get('status', None)
     search_query = request.GET.get('q', '')
 
-    queryset = InventoryItem.objects.all()
-
-    if status_filter:
-        if status_filter == 'available':
-            title = "Available Items"
-            queryset = queryset.filter(status='available')
-        elif status_filter == 'on_job':
-            title = "Items On Job"
-            queryset = queryset.filter(status='on_job')
-        elif status_filter == 'pending_inspection':
-            title = "Items Pending Inspection"
-            queryset = queryset.filter(status='pending_inspection')
-        elif status_filter == 're-cut':
-            title = "Items to be Recut"
-            queryset = queryset.filter(status='re-cut')
-        elif status_filter == 'lih':
-            title = "LIH Items"
-            queryset = queryset.filter(status='lih')
-        elif status_filter == 'junk':
-            title = "Junk Items"
-            queryset = queryset.filter(status='junk')
-        elif status_filter == 'sold':
-            title = "Sold Items"
-            queryset = queryset.filter(status='sold')
+    queryset, title, _ = filter_items_by_status(InventoryItem.objects.all(), status_filter)
 
     if search_query:
-        queryset = queryset.filter(
-            models.Q(serial_number__icontains=search_query) |
-            models.Q(category__name__icontains=search_query)
-        )
+        queryset = search_items(queryset, search_query)
+
+    # Keyset pagination in the model's ordering (category name, serial number),
+    # planned from the status counters so the database never sorts on the joined
+    # category name: two small queries per page, whatever the page (see page_by_category).
+    # The cursor is where the next page starts; htmx loads further pages as the
+    # user scrolls (see _filtered_list_rows.html).
+    start_at = decode_cursor(request.GET.get('after'), 2)
+    items, next_start = page_by_category(
+        queryset.select_related('category'), category_counts(status_filter), start_at, per_page=ITEMS_PER_PAGE
+    )
+    next_cursor = encode_cursor(next_start) if next_start else None
+    page = KeysetPage(items, next_cursor, request.GET.get('after') or None)
 
     context = {
         'title': title,
-        'items': queryset,
+        'items': page,
+        'page': page,
         'search_query': search_query,
         'status_filter': status_filter,
     }
+    if request.headers.get('HX-Request'):
+        return render(request, 'inventory/_filtered_list_rows.html', context)
+
+    # The total comes from the status counters (no COUNT(*) over the items);
+    # it is unknown for a search
+    if not search_query:
+        totals = status_totals()
+        context['total_count'] = totals[status_filter] if status_filter in totals else sum(totals.values())
     return render(request, 'inventory/inventory_filtered_list.html', context)
 
 @login_required
@@ -129,6 +124,15 @@ def download_template_view(request):
 
 @login_required
 def import_results_view(request):
+    task_id = request.GET.get('task')
+    if task_id:
+        # Results of a background import (see inventory/tasks.py)
+        task = get_object_or_404(BackgroundTask, id=task_id, name='inventory.import_file')
+        if not (request.user.is_staff or task.created_by_id == request.user.id):
+            raise Http404
+        summary = (task.result or {}).get('summary')
+        return render(request, 'inventory/import_results.html', {'summary': summary})
+
     summary = request.session.get('import_summary', None)
     # Clear the summary from the session so it doesn't show again on refresh
     if 'import_summary' in request.session:
@@ -145,41 +149,32 @@ def inventory_import_view(request):
             messages.error(request, "No file was selected for upload.")
             return redirect('inventory_import')
         
-        try:
-            # Read the file into a pandas DataFrame
-            if file.name.endswith('.xlsx'):
-                df = pd.read_excel(file)
-            elif file.name.endswith('.csv'):
-                df = pd.read_csv(file)
-            else:
-                messages.error(request, "Unsupported file format. Please upload a .xlsx or .csv file.")
-                return redirect('inventory_import')
-
-            # Call our reusable processing function
-            summary = process_inventory_file(df, strict=False)
-
-            # Recalculate quantities if there were no critical errors
-            if (summary.get("created", 0) + summary.get("updated", 0)) > 0:
-              call_command('recalculate_quantities')
-
-            
-            # Store summary in session and redirect to results page
-            request.session['import_summary'] = summary
-            return redirect('import_results')
-
-        except Exception as e:
-            messages.error(request, f"An error occurred while processing the file: {e}")
+        if not file.name.endswith(('.xlsx', '.csv')):
+            messages.error(request, "Unsupported file format. Please upload a .xlsx or .csv file.")
             return redirect('inventory_import')
 
+        # The file is stored with the task and imported by a worker (run_tasks),
+        # chunk by chunk; the task page shows the progress and links to the results.
+        task = enqueue(
+            'inventory.import_file',
+            title=f"Inventory import: {file.name}",
+            params={'filename': file.name},
+            input_file=file,
+            user=request.user,
+        )
+        return redirect('task_status', task_id=task.id)
+
     return render(request, 'inventory/import_form.html')
 
 @login_required
 def inventory_change_status_view(request):
     if request.method == "POST":
         selected_ids = request.POST.getlist("selected_items")
+        # Serial numbers can also be pasted, one per line
+        serials = [s.strip() for s in request.POST.get("serial_numbers_text", "").splitlines() if s.strip()]
         new_status = request.POST.get("new_status", "").strip()
 
-        if not selected_ids:
+        if not selected_ids and not serials:
             messages.error(request, "Please select at least one item.")
             return redirect("inventory_change_status")
 
@@ -188,17 +183,34 @@ def inventory_change_status_view(request):
             messages.error(request, "Invalid status selected.")
             return redirect("inventory_change_status")
 
-        with transaction.atomic():
-            items = list(InventoryItem.objects.select_for_update().filter(id__in=selected_ids))
-            InventoryItem.objects.filter(id__in=[i.id for i in items]).update(status=new_status)
-
-        serials = list(InventoryItem.objects.filter(id__in=selected_ids).values_list('serial_number', flat=True))
+        try:
+            selected_ids = [int(i) for i in selected_ids]
+        except ValueError:
+            messages.error(request, "Invalid item selection.")
+            return redirect("inventory_change_status")
 
-        messages.success(request,f"Status updated to '{new_status}' for: {', '.join(serials)}")
+        # Validated and applied in SQL; counters and the movement ledger in the same transaction
+        result = transitions.change_status(new_status, ids=selected_ids, serials=serials, user=request.user)
+
+        status_labels = dict(InventoryItem.STATUS_CHOICES)
+        if result['changed']:
+            messages.success(request, f"Status updated to '{new_status}' for: {', '.join(result['changed'])}")
+        if result['rejected']:
+            rejected = [f"{serial} ({status_labels.get(status, status)})" for serial, status in result['rejected']]
+            messages.warning(
+                request,
+                f"Not changed, '{status_labels[new_status]}' is not allowed from their status: {', '.join(rejected)}",
+            )
+        if result['not_found']:
+            messages.warning(request, f"Not found: {', '.join(map(str, result['not_found']))}")
         return redirect("inventory_change_status")
 
     return render(request, "inventory/change_status.html", {
-        "status_choices": InventoryItem.STATUS_CHOICES
+        "status_choices": InventoryItem.STATUS_CHOICES,
+        "allowed_transitions": [
+            (label, [dict(InventoryItem.STATUS_CHOICES)[s] for s in sorted(transitions.allowed_sources(key))])
+            for key, label in InventoryItem.STATUS_CHOICES
+        ],
     })
 
 @login_required
@@ -207,9 +219,12 @@ def ajax_inventory_search(request):
     if not q:
         return JsonResponse([], safe=False)
 
-    qs = InventoryItem.objects.select_related("category").filter(
-        Q(serial_number__icontains=q) | Q(category__name__icontains=q)
-    )[:30]
+    qs = InventoryItem.objects.select_related("category")
+    # mode=prefix is the fast path for barcode scanners (full or leading serial)
+    if request.GET.get("mode") == "prefix":
+        qs = prefix_search_items(qs, q)[:30]
+    else:
+        qs = search_items(qs, q)[:30]
 
     data = []
     for item in qs:
@@ -226,73 +241,62 @@ def ajax_inventory_search(request):
 @login_required
 def export_inventory_to_excel_view(request):
     """
-    This view handles the export of filtered inventory items to an Excel file.
+    This view handles the export of filtered inventory items.
+    ?format=xlsx (default), csv or csv.gz. The file is written by a background
+    worker (inventory.export_items); the task page offers it for download.
     """
     status_filter = request.GET.get('status', None)
-    
-    # --- Re-use the exact same filtering logic from inventory_filtered_list_view ---
-    queryset = InventoryItem.objects.all().select_related('category')
-    title = "Full Inventory"
-
-    if status_filter:
-        if status_filter == 'available':
-            title = "Available_Items"
-            queryset = queryset.filter(status='available')
-        elif status_filter == 'on_job':
-            title = "On_Job_Items"
-            queryset = queryset.filter(status='on_job')
-        elif status_filter == 'pending_inspection':
-            title = "Pending_Inspection_Items"
-            queryset = queryset.filter(status='pending_inspection')
-        elif status_filter == 're-cut':
-            title = "Recut_Items"
-            queryset = queryset.filter(status='re-cut')
-        elif status_filter == 'lih':
-            title = "LIH_Items"
-            queryset = queryset.filter(status='lih')
-        elif status_filter == 'junk':
-            title = "Junk_Items"
-            queryset = queryset.filter(status='junk')
-        elif status_filter == 'sold':
-            title = "Sold_Items"
-            queryset = queryset.filter(status='sold')
-
-    # --- Create the Excel file in memory ---
-    workbook = openpyxl.Workbook()
-    sheet = workbook.active
-    sheet.title = title
-
-    # Define headers
-    headers = ['Serial Number', 'Category', 'Location', 'Status', 'Updated At']
-    if status_filter == 're-cut':
-        headers.append('Reason') # Add the 'Reason' header only for re-cut items
-
-    # Write headers to the first row
-    for col_num, header in enumerate(headers, 1):
-        cell = sheet.cell(row=1, column=col_num, value=header)
-        cell.font = openpyxl.styles.Font(bold=True)
-        # Auto-adjust column width
-        sheet.column_dimensions[get_column_letter(col_num)].width = 20
-
-    # Write data rows
-    for row_num, item in enumerate(queryset, 2):
-        sheet.cell(row=row_num, column=1, value=item.serial_number)
-        sheet.cell(row=row_num, column=2, value=item.category.name)
-        sheet.cell(row=row_num, column=3, value=item.get_location_display())
-        sheet.cell(row=row_num, column=4, value=item.get_status_display())
-        sheet.cell(row=row_num, column=5, value=item.updated_at.strftime('%Y-%m-%d %H:%M'))
-        
-        if status_filter == 're-cut':
-            sheet.cell(row=row_num, column=6, value=item.recut_reason)
+    export_format = request.GET.get('format', 'xlsx')
+    if export_format not in ('xlsx', 'csv', 'csv.gz'):
+        export_format = 'xlsx'
+
+    # Same filtering logic as inventory_filtered_list_view, just for the title
+    _, _, title = filter_items_by_status(InventoryItem.objects.none(), status_filter)
+
+    task = enqueue(
+        'inventory.export_items',
+        title=f"Export: {title}.{export_format}",
+        params={'status': status_filter, 'format': export_format},
+        user=request.user,
+    )
+    return redirect('task_status', task_id=task.id)
 
-    # --- Prepare the HTTP response ---
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Movements per page on the item history
+MOVEMENTS_PER_PAGE = 50
+
+@login_required
+def item_where_is_view(request):
+    """
+    "Where is serial X": looks the serial up (unique index) and goes to its
+    history page, which shows the job it is on.
+    """
+    serial = request.GET.get('serial', '').strip()
+    if serial and InventoryItem.objects.filter(serial_number=serial).exists():
+        return redirect('item_history', serial_number=serial)
+    if serial:
+        messages.error(request, f"No item with serial number '{serial}'.")
+    return redirect('inventory_list')
+
+@login_required
+def item_history_view(request, serial_number):
+    """
+    Where the item is now and everything that happened to it, newest first,
+    from the movement ledger. Keyset pages on (timestamp, id) walk the
+    (item, timestamp) index, so old pages cost the same as the first one.
+    """
+    item, current_job = movements.where_is(serial_number)
+    if item is None:
+        raise Http404("No such item.")
+
+    page = keyset_paginate(
+        item.movements.select_related('job', 'user'), ['-timestamp', '-id'],
+        after=request.GET.get('after'), before=request.GET.get('before'), per_page=MOVEMENTS_PER_PAGE,
     )
-    # Set the file name for the download
-    response['Content-Disposition'] = f'attachment; filename="{title}.xlsx"'
-    
-    # Save the workbook to the response
-    workbook.save(response)
 
-    return response
+    context = {
+        'item': item,
+        'current_job': current_job,
+        'movements': page,
+        'page': page,
+    }
+    return render(request, 'inventory/item_history.html', context)
@@ -0,0 +1,49 @@
+# jobs/contracts.py
+"""
+Which product categories a customer's contract covers, cached per customer.
+
+The delivery form checks every submit against the contract, so the allowed
+category ids are kept in the Django cache as a frozenset (None for "no
+contract"). jobs/signals.py drops the entry whenever the contract or its
+categories change. The timeout is only a safety net for caches that are not
+shared between processes (the default LocMemCache with several workers).
+"""
+from django.core.cache import cache
+from inventory.models import InventoryItem
+from .models import Contract
+
+CACHE_TIMEOUT = 5 * 60
+
+# Cached for customers without a contract (None can't be told apart from a miss)
+_NO_CONTRACT = 'no-contract'
+
+
+def _key(customer_id):
+    return f'contract_categories:{customer_id}'
+
+
+def allowed_categories(customer_id):
+    """
+    Returns the frozenset of ProductCategory ids the customer's contract
+    covers, or None when the customer has no contract.
+    """
+    cached = cache.get(_key(customer_id))
+    if cached is None:
+        # One query: a row per covered category (LEFT JOIN, so an empty
+        # contract still gives one row, with None), no rows without a contract
+        rows = list(Contract.objects.filter(customer_id=customer_id).values_list('items', flat=True))
+        cached = frozenset(c for c in rows if c is not None) if rows else _NO_CONTRACT
+        cache.set(_key(customer_id), cached, CACHE_TIMEOUT)
+    return None if cached == _NO_CONTRACT else cached
+
+
+def invalidate(*customer_ids):
+    cache.delete_many([_key(customer_id) for customer_id in customer_ids])
+
+
+def out_of_contract_serials(customer_id, item_ids):
+    """Serial numbers of the given items whose category the contract doesn't cover (one query)."""
+    allowed = allowed_categories(customer_id)
+    items = InventoryItem.objects.filter(id__in=item_ids).values_list('serial_number', 'category_id')
+    # No contract: nothing is covered
+    return [serial for serial, category_id in items if allowed is None or category_id not in allowed]
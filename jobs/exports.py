@@ -0,0 +1,165 @@
+# jobs/exports.py
+import multiprocessing
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from django.conf import settings
+from . import pdf_cache, pdf_worker
+from .pdf import render_ticket_html, write_pdf
+
+# Attachments are copied into the archive in blocks of this size
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def _pdf_workers():
+    return getattr(settings, 'PDF_RENDER_WORKERS', None) or min(4, os.cpu_count() or 1)
+
+
+class _ZipSink:
+    """
+    Write-only file object for ZipFile. It has no tell()/seek(), so ZipFile
+    falls back to streaming mode (data descriptors after each entry), and we
+    hand out whatever has been written so far.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _zip_info(name):
+    info = zipfile.ZipInfo(name, date_time=datetime.now().timetuple()[:6])
+    info.compress_type = zipfile.ZIP_DEFLATED
+    return info
+
+
+def _copy_file(zf, sink, field_file, arcname):
+    """Copies a stored file into the archive chunk by chunk."""
+    with field_file.open('rb') as source, zf.open(_zip_info(arcname), 'w', force_zip64=True) as dest:
+        for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b''):
+            dest.write(chunk)
+            data = sink.take()
+            if data:
+                yield data
+    data = sink.take()
+    if data:
+        yield data
+
+
+def ticket_pdfs(tickets, base_url):
+    """
+    Yields (filename, pdf bytes) for each (ticket_type, ticket) pair, in order.
+    Cached PDFs are used as-is; the rest are rendered to HTML here (database
+    work stays in this process) and laid out by a bounded process pool. At
+    most two PDFs per worker are in flight, which bounds memory.
+    """
+    workers = _pdf_workers()
+    pool = None
+    pending = deque()
+
+    try:
+        for ticket_type, ticket in tickets:
+            filename = f"Ticket_{ticket.ticket_number}_{ticket_type.capitalize()}.pdf"
+
+            # We pass 'None' for extra_context because there's no driver info for a bulk export.
+            cache_key = pdf_cache.ticket_cache_key(ticket_type, ticket, None)
+            content = pdf_cache.get(cache_key)
+            if content is None:
+                html_string = render_ticket_html(ticket_type, ticket, None)
+                if workers > 1:
+                    if pool is None:
+                        # Spawned, not forked: a fork would copy the worker's (or web process')
+                        # open database connections and threads into every child
+                        pool = ProcessPoolExecutor(
+                            max_workers=workers, initializer=pdf_worker.init,
+                            mp_context=multiprocessing.get_context('spawn'),
+                        )
+                    content = pool.submit(pdf_worker.write_pdf, html_string, base_url, ticket_type)
+                else:
+                    content = write_pdf(html_string, base_url, ticket_type)
+                    pdf_cache.put(cache_key, content)
+            pending.append((filename, cache_key, content))
+
+            while len(pending) > workers * 2:
+                yield _finish(*pending.popleft())
+
+        while pending:
+            yield _finish(*pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _finish(filename, cache_key, content):
+    # A future from the pool: cached once it is done (in-process renders are cached right away)
+    if not isinstance(content, bytes):
+        content = content.result()
+        pdf_cache.put(cache_key, content)
+    return filename, content
+
+
+def stream_job_export(job, base_url, progress=None):
+    """
+    Yields the job export ZIP as it is produced: ticket PDFs, job
+    attachments and inspection reports.
+    - progress(entries done, total entries, message) is called after each entry
+    """
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+
+        all_tickets = (
+            [('delivery', t) for t in job.delivery_tickets.select_related('job__customer', 'created_by')] +
+            [('receiving', t) for t in job.receiving_tickets.select_related('job__customer', 'created_by')]
+        )
+        attachments = list(job.attachments.all())
+        # The receiving tickets that have an inspection report
+        reported_tickets = list(
+            job.receiving_tickets.exclude(inspection_report='').exclude(inspection_report__isnull=True)
+        )
+
+        total = len(all_tickets) + len(attachments) + len(reported_tickets)
+        done = 0
+
+        def report(message):
+            nonlocal done
+            done += 1
+            if progress:
+                progress(done, total, message)
+
+        # Generate and add a PDF for each ticket
+        if not all_tickets:
+            zf.writestr("no_tickets_found.txt", "This job has no delivery or receiving tickets.")
+        else:
+            for pdf_filename, pdf_content in ticket_pdfs(all_tickets, base_url):
+                zf.writestr(_zip_info(pdf_filename), pdf_content)
+                report(f"Added {pdf_filename}")
+                yield sink.take()
+
+        # Add all job attachments
+        for attachment in attachments:
+            file_name = os.path.basename(attachment.file.name)
+            yield from _copy_file(zf, sink, attachment.file, file_name)
+            report(f"Added {file_name}")
+
+        # Add the inspection reports
+        for ticket in reported_tickets:
+            report_filename = os.path.basename(ticket.inspection_report.name)
+            zip_filename = f"Inspection_Report_for_{ticket.ticket_number}_{report_filename}"
+            yield from _copy_file(zf, sink, ticket.inspection_report, zip_filename)
+            report(f"Added {zip_filename}")
+
+    # Central directory
+    yield sink.take()
@@ -0,0 +1,95 @@
+# jobs/management/commands/backfill_item_movements.py
+
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from inventory.models import InventoryItem, ItemMovement
+from jobs.models import DeliveryTicketItem, ReceivingTicketItem
+
+# Receiving line usage -> the status the item got
+RECEIVED_STATUS = {'used': 'pending_inspection', 'not_used': 'pending_inspection', 'sold': 'sold'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Builds the item movement ledger for items that have no movements yet, from their delivery and '
+        'receiving tickets (plus the inspection outcome of their last receipt). Items that already have '
+        'movements are left alone, so it is safe to run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Items per transaction.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        last_id = 0
+        items_done = movements_written = 0
+
+        while True:
+            items = dict(
+                InventoryItem.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'status')[:batch_size]
+            )
+            if not items:
+                break
+            last_id = max(items)
+
+            with transaction.atomic():
+                # Items with a ledger already (recorded live, or an earlier run)
+                done = set(ItemMovement.objects.filter(item_id__in=list(items)).values_list('item_id', flat=True))
+                pending = {item_id: status for item_id, status in items.items() if item_id not in done}
+                if pending:
+                    movements = self._movements(pending)
+                    ItemMovement.objects.bulk_create(movements, batch_size=1000)
+                    items_done += len(pending)
+                    movements_written += len(movements)
+
+            self.stdout.write(f"  up to item {last_id}: {movements_written} movements")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Backfilled {movements_written} movements for {items_done} items."
+        ))
+
+    def _movements(self, current_status):
+        """The ItemMovements of these items ({id: current status}), rebuilt from their ticket lines."""
+        events = defaultdict(list)  # item_id -> [(timestamp, kind, to_status, job_id, reference, user_id)]
+
+        deliveries = DeliveryTicketItem.objects.filter(item_id__in=list(current_status)).values_list(
+            'item_id', 'is_returnable', 'ticket__job_id', 'ticket__ticket_number', 'ticket__ticket_date',
+            'ticket__created_by_id',
+        )
+        for item_id, returnable, job_id, number, date, user_id in deliveries:
+            events[item_id].append((date, 'delivery', 'on_job' if returnable else 'sold', job_id, number, user_id))
+
+        receipts = ReceivingTicketItem.objects.filter(item_id__in=list(current_status)).values_list(
+            'item_id', 'usage_status', 'ticket__job_id', 'ticket__ticket_number', 'ticket__ticket_date',
+            'ticket__created_by_id', 'ticket__updated_at',
+        )
+        # (item_id, ticket number, job_id) -> when the receipt was last touched (report upload)
+        touched = {}
+        for item_id, usage, job_id, number, date, user_id, updated_at in receipts:
+            events[item_id].append((date, 'receiving', RECEIVED_STATUS[usage], job_id, number, user_id))
+            touched[(item_id, number, job_id)] = max(updated_at, date)
+
+        movements = []
+        for item_id, item_events in events.items():
+            item_events.sort(key=lambda e: e[0])
+            status = ''  # unknown before the first ticket
+            for timestamp, kind, to_status, job_id, reference, user_id in item_events:
+                # A delivery always starts from 'available'
+                from_status = 'available' if kind == 'delivery' else status
+                movements.append(ItemMovement(
+                    item_id=item_id, timestamp=timestamp, kind=kind, from_status=from_status, to_status=to_status,
+                    job_id=job_id, reference=reference, user_id=user_id,
+                ))
+                status = to_status
+
+            # Received for inspection and no longer pending: the current status is the
+            # inspection outcome (the report upload is the last change to the ticket)
+            _, kind, _, job_id, reference, _ = item_events[-1]
+            if kind == 'receiving' and status == 'pending_inspection' and current_status[item_id] != status:
+                movements.append(ItemMovement(
+                    item_id=item_id, timestamp=touched[(item_id, reference, job_id)], kind='inspection',
+                    from_status=status, to_status=current_status[item_id], job_id=job_id, reference=reference,
+                ))
+        return movements
@@ -0,0 +1,88 @@
+# jobs/management/commands/benchmark_ticket_pdf.py
+
+import statistics
+import time
+from django.contrib.staticfiles import finders
+from django.core.management.base import BaseCommand, CommandError
+from weasyprint import CSS, HTML
+from weasyprint.text.fonts import FontConfiguration
+from jobs.models import DeliveryTicket, ReceivingTicket
+from jobs.pdf import load_pdf_ticket, render_ticket_html, write_pdf
+from jobs.pdf_cache import PDF_STYLESHEETS
+
+# What the PDF templates used to link before the fonts were vendored
+GOOGLE_FONTS_URL = 'https://fonts.googleapis.com/css2?family=Roboto:wght@400;700&display=swap'
+
+class Command(BaseCommand):
+    help = (
+        'Benchmarks per-ticket PDF render time: stylesheets and fonts parsed on every render '
+        '(the old behaviour) vs. parsed once per process. The PDF cache is bypassed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--type', dest='ticket_type', choices=['delivery', 'receiving'], default='delivery')
+        parser.add_argument('--ticket', type=int, help='Ticket id (defaults to the latest ticket of that type).')
+        parser.add_argument('--renders', type=int, default=20, help='Renders per method.')
+        parser.add_argument('--base-url', default='http://localhost:8000/')
+        parser.add_argument(
+            '--remote-fonts', action='store_true',
+            help='Also fetch the Google Fonts stylesheet on every render in the per-render method, as the templates used to.',
+        )
+
+    def handle(self, *args, **options):
+        ticket_type = options['ticket_type']
+        ticket_id = options['ticket']
+        if ticket_id is None:
+            model = DeliveryTicket if ticket_type == 'delivery' else ReceivingTicket
+            ticket_id = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+            if ticket_id is None:
+                raise CommandError(f'There are no {ticket_type} tickets to render.')
+
+        ticket = load_pdf_ticket(ticket_type, ticket_id)
+        html_string = render_ticket_html(ticket_type, ticket)
+        base_url = options['base_url']
+        renders = options['renders']
+
+        self.stdout.write(f"Rendering {ticket_type} ticket {ticket.ticket_number} {renders} times per method.")
+        self.stdout.write(f"{'method':<12} {'first ms':>10} {'p50 ms':>10} {'p95 ms':>10}")
+
+        results = {
+            'per-render': self._time(renders, lambda: self._render_uncached(
+                html_string, base_url, ticket_type, options['remote_fonts']
+            )),
+            # The first render also parses the stylesheets and fonts for this process
+            'cached': self._time(renders, lambda: write_pdf(html_string, base_url, ticket_type)),
+        }
+
+        for method, timings in results.items():
+            self.stdout.write(
+                f"{method:<12} {timings[0]:>10.2f} {statistics.median(timings):>10.2f} "
+                f"{self._p95(timings):>10.2f}"
+            )
+
+        self.stdout.write(self.style.SUCCESS('Done.'))
+
+    def _render_uncached(self, html_string, base_url, ticket_type, remote_fonts):
+        # A fresh font configuration and freshly parsed stylesheets on every call
+        font_config = FontConfiguration()
+        stylesheets = [
+            CSS(filename=finders.find(name), font_config=font_config)
+            for name in PDF_STYLESHEETS[ticket_type]
+        ]
+        if remote_fonts:
+            stylesheets.insert(0, CSS(url=GOOGLE_FONTS_URL, font_config=font_config))
+        return HTML(string=html_string, base_url=base_url).write_pdf(
+            stylesheets=stylesheets, font_config=font_config,
+        )
+
+    def _time(self, renders, render):
+        timings = []
+        for _ in range(renders):
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
+
+    def _p95(self, timings):
+        ordered = sorted(timings)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
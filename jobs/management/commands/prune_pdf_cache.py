@@ -0,0 +1,24 @@
+# jobs/management/commands/prune_pdf_cache.py
+
+from django.core.management.base import BaseCommand
+from jobs import pdf_cache
+
+class Command(BaseCommand):
+    help = 'Evicts old or excess rendered ticket PDFs from the PDF cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-mb', type=int, help='Size budget in MB (default: PDF_CACHE_MAX_BYTES).')
+        parser.add_argument('--max-age-days', type=float, help='Maximum age in days (default: PDF_CACHE_MAX_AGE).')
+        parser.add_argument('--clear', action='store_true', help='Remove every cached PDF.')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            removed, freed = pdf_cache.prune(max_bytes=0, max_age=0)
+        else:
+            max_bytes = options['max_mb'] * 1024 * 1024 if options['max_mb'] is not None else None
+            max_age = options['max_age_days'] * 24 * 3600 if options['max_age_days'] is not None else None
+            removed, freed = pdf_cache.prune(max_bytes=max_bytes, max_age=max_age)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Removed {removed} cached PDF(s), freed {freed / (1024 * 1024):.1f} MB.'
+        ))
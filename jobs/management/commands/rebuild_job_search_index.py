@@ -0,0 +1,16 @@
+# jobs/management/commands/rebuild_job_search_index.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from jobs.search import rebuild_index
+
+class Command(BaseCommand):
+    help = 'Rebuilds the job list trigram search index from scratch.'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write('Rebuilding the job search index...')
+
+        with transaction.atomic():
+            total = rebuild_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} jobs.'))
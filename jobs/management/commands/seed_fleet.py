@@ -0,0 +1,315 @@
+# jobs/management/commands/seed_fleet.py
+
+import random
+from array import array
+from datetime import timedelta
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from inventory.models import InventoryItem, ProductCategory
+from jobs import search as job_search
+from jobs import sequences
+from jobs.models import (
+    Contract, Customer, DeliveryTicket, DeliveryTicketItem, Job, NumberSequence,
+    ReceivingTicket, ReceivingTicketItem, inspection_report_upload_path,
+)
+
+TOOLS = [
+    'Drill Pipe 5"', 'Heavy Weight Drill Pipe', 'Drill Collar 6-1/2"', 'Drill Collar 8"', 'Drilling Jar',
+    'Fishing Jar', 'Overshot', 'Washpipe', 'Tubing 3-1/2"', 'Casing Scraper', 'Junk Mill', 'Fishing Magnet',
+    'Crossover Sub', 'Stabilizer', 'Roller Reamer', 'Spear', 'Taper Tap', 'Junk Basket',
+]
+FIELDS = ['Western Desert', 'Gulf of Suez', 'Ras Gharib', 'Abu Rudeis', 'Badr El Din', 'Meleiha', 'Qarun', 'Alamein']
+
+# Status codes for the item plan (index into InventoryItem.STATUS_CHOICES)
+STATUSES = [status for status, _ in InventoryItem.STATUS_CHOICES]
+AVAILABLE, ON_JOB, RECUT, LIH, JUNK, PENDING, SOLD = (STATUSES.index(s) for s in (
+    'available', 'on_job', 're-cut', 'lih', 'junk', 'pending_inspection', 'sold',
+))
+
+# Share of outcomes, as (status code, weight)
+YARD_OUTCOMES = [(AVAILABLE, 85), (RECUT, 8), (JUNK, 4), (LIH, 3)]
+INSPECTION_OUTCOMES = [(AVAILABLE, 80), (RECUT, 12), (JUNK, 5), (LIH, 3)]
+USAGE_OUTCOMES = [('used', 70), ('not_used', 25), ('sold', 5)]
+
+# Open jobs are the ones started in the last OPEN_DAYS days; receiving
+# tickets younger than INSPECTION_DAYS still wait for their inspection report
+OPEN_DAYS = 90
+INSPECTION_DAYS = 14
+
+
+def _pick(rng, outcomes):
+    return rng.choices([o for o, _ in outcomes], weights=[w for _, w in outcomes])[0]
+
+
+class Command(BaseCommand):
+    help = (
+        'Generates a reproducible synthetic fleet for benchmarking: categories, items in both yards, '
+        'customers with contracts, and jobs whose delivery/receiving tickets follow the real lifecycle '
+        '(delivered, on job, received, pending inspection, inspected). Uses bulk inserts throughout.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=100_000)
+        parser.add_argument('--categories', type=int, default=40)
+        parser.add_argument('--customers', type=int, default=30)
+        parser.add_argument('--jobs', type=int, default=2_000)
+        parser.add_argument('--days', type=int, default=3 * 365, help='Job dates are spread over this many days.')
+        parser.add_argument(
+            '--deliver-share', type=float, default=0.5,
+            help='Share of the items that go through at least one delivery.',
+        )
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefix', default='SF', help='Serial number / name prefix of the generated rows.')
+        parser.add_argument('--batch-size', type=int, default=5_000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        self.now = timezone.now()
+
+        if not 0 <= options['deliver_share'] <= 1:
+            raise CommandError('--deliver-share must be between 0 and 1.')
+        if InventoryItem.objects.filter(serial_number__startswith=f'{self.prefix}-').exists():
+            raise CommandError(f"Items with the prefix '{self.prefix}' already exist; pick another --prefix.")
+
+        with transaction.atomic():
+            category_ids = self._categories(options['categories'])
+            customer_ids = self._customers(options['customers'], category_ids)
+            self.stdout.write(f"{len(category_ids)} categories, {len(customer_ids)} customers with contracts")
+
+            # Plan first (which items go out on which ticket and how they come
+            # back), then write everything in bulk
+            jobs = self._plan_jobs(options['jobs'], options['days'], customer_ids)
+            delivered = int(options['items'] * options['deliver_share'])
+            statuses = self._plan_lifecycles(jobs, options['items'], delivered)
+
+            item_ids = self._items(options['items'], category_ids, statuses)
+            self.stdout.write(f"{len(item_ids)} items")
+
+            self._jobs(jobs)
+            tickets, lines = self._tickets(jobs, item_ids)
+            self.stdout.write(f"{len(jobs)} jobs, {tickets} tickets, {lines} ticket lines")
+
+        # The movement ledger of the new items, from their tickets
+        call_command('backfill_item_movements', stdout=self.stdout)
+
+        counts = {status: statuses.count(code) for code, status in enumerate(STATUSES)}
+        self.stdout.write(', '.join(f"{status}: {n}" for status, n in counts.items()))
+        self.stdout.write(self.style.SUCCESS(f"Seeded the '{self.prefix}' fleet (seed {options['seed']})."))
+
+    # ----- Reference data -----
+
+    def _categories(self, count):
+        names = [f"{TOOLS[i % len(TOOLS)]} ({self.prefix}-{i + 1:03d})" for i in range(count)]
+        ProductCategory.objects.bulk_create([
+            ProductCategory(name=name, unit='joint' if 'Pipe' in name or 'Collar' in name else 'pcs')
+            for name in names
+        ])
+        by_name = dict(ProductCategory.objects.filter(name__in=names).values_list('name', 'id'))
+        return [by_name[name] for name in names]
+
+    def _customers(self, count, category_ids):
+        names = [f"{self.prefix} Customer {i + 1:03d}" for i in range(count)]
+        Customer.objects.bulk_create([Customer(name=name) for name in names])
+        by_name = dict(Customer.objects.filter(name__in=names).values_list('name', 'id'))
+        customer_ids = [by_name[name] for name in names]
+
+        Contract.objects.bulk_create([Contract(customer_id=customer_id) for customer_id in customer_ids])
+        contracts = Contract.objects.filter(customer_id__in=customer_ids).values_list('id', flat=True)
+        # Each contract covers 30-70% of the categories
+        Contract.items.through.objects.bulk_create([
+            Contract.items.through(contract_id=contract_id, productcategory_id=category_id)
+            for contract_id in contracts
+            for category_id in self.rng.sample(category_ids, max(1, int(len(category_ids) * self.rng.uniform(0.3, 0.7))))
+        ], batch_size=self.batch_size)
+        return customer_ids
+
+    # ----- Planning -----
+
+    def _plan_jobs(self, count, days, customer_ids):
+        jobs = []
+        for _ in range(count):
+            age = self.rng.randint(0, days)
+            jobs.append({
+                'job': Job(
+                    job_type=self.rng.choice(Job.JOB_TYPE_CHOICES)[0],
+                    customer_id=self.rng.choice(customer_ids),
+                    rig=f"Rig {self.rng.randint(1, 60)}",
+                    well=f"{self.rng.choice(['A', 'B', 'C', 'N', 'S'])}-{self.rng.randint(1, 400)}",
+                    location=self.rng.choice(FIELDS),
+                    date=(self.now - timedelta(days=age)).date(),
+                    status='open' if age <= OPEN_DAYS else 'closed',
+                ),
+                'age': age,
+                'deliveries': [],
+                'receivings': [],
+            })
+        # Oldest first, so job numbers follow the dates
+        jobs.sort(key=lambda j: -j['age'])
+        return jobs
+
+    def _plan_lifecycles(self, jobs, item_count, delivered):
+        """
+        Decides every ticket and line and returns each item's final status.
+        Items 0..delivered-1 go out on the jobs' delivery tickets (each item
+        once); the rest stay in the yard.
+        """
+        statuses = bytearray(item_count)
+        per_job = max(1, delivered // max(1, len(jobs)))
+        next_item = 0
+
+        for plan in jobs:
+            age = plan['age']
+            closed = plan['job'].status == 'closed'
+            outstanding = []
+
+            # 1-3 deliveries in the job's first days
+            budget = self.rng.randint(per_job // 2 + 1, per_job * 3 // 2 + 1)
+            for _ in range(self.rng.randint(1, 3)):
+                size = min(budget, delivered - next_item, self.rng.randint(5, max(5, per_job)))
+                if size <= 0:
+                    break
+                lines = []
+                for index in range(next_item, next_item + size):
+                    if self.rng.random() < 0.05:
+                        # Sold with the delivery, never comes back
+                        statuses[index] = SOLD
+                        lines.append((index, False))
+                    else:
+                        statuses[index] = ON_JOB
+                        lines.append((index, True))
+                        outstanding.append(index)
+                next_item += size
+                budget -= size
+                plan['deliveries'].append({'age': max(0, age - self.rng.randint(0, 3)), 'lines': lines})
+
+            if not outstanding:
+                continue
+
+            # Closed jobs returned everything; open ones part of it, maybe nothing yet
+            returned = outstanding if closed else outstanding[:int(len(outstanding) * self.rng.random())]
+            receivings = self.rng.randint(1, 3) if returned else 0
+            for r in range(receivings):
+                share = returned[r::receivings]
+                # Back a few days after the delivery; a closed job's tickets are all well in the past
+                latest = max(0, age - 4)
+                rt_age = self.rng.randint(max(0, age - 60), latest) if closed else self.rng.randint(0, latest)
+                inspected = closed or rt_age > INSPECTION_DAYS
+                lines = []
+                for index in share:
+                    usage = _pick(self.rng, USAGE_OUTCOMES)
+                    if usage == 'sold':
+                        statuses[index] = SOLD
+                    elif inspected:
+                        statuses[index] = _pick(self.rng, INSPECTION_OUTCOMES)
+                    else:
+                        statuses[index] = PENDING
+                    lines.append((index, usage))
+                plan['receivings'].append({'age': rt_age, 'lines': lines, 'verified': inspected})
+
+        for index in range(next_item, item_count):
+            statuses[index] = _pick(self.rng, YARD_OUTCOMES)
+        return statuses
+
+    # ----- Writing -----
+
+    def _serial(self, index):
+        return f"{self.prefix}-{index + 1:08d}"
+
+    def _items(self, count, category_ids, statuses):
+        """Creates the items in batches and returns their ids, by plan index."""
+        item_ids = array('q')
+        locations = [location for location, _ in InventoryItem.LOCATION_CHOICES]
+        for start in range(0, count, self.batch_size):
+            end = min(count, start + self.batch_size)
+            InventoryItem.objects.bulk_create([
+                InventoryItem(
+                    serial_number=self._serial(index),
+                    category_id=self.rng.choice(category_ids),
+                    location=locations[0] if self.rng.random() < 0.6 else locations[1],
+                    status=STATUSES[statuses[index]],
+                    recut_reason='Thread damage' if statuses[index] == RECUT else None,
+                )
+                for index in range(start, end)
+            ])
+            # Serials are zero-padded, so their order is the plan order
+            item_ids.extend(
+                InventoryItem.objects.filter(serial_number__range=(self._serial(start), self._serial(end - 1)))
+                .order_by('serial_number').values_list('id', flat=True)
+            )
+            if end % (self.batch_size * 20) == 0:
+                self.stdout.write(f"  {end} items...")
+        return item_ids
+
+    def _jobs(self, jobs):
+        new_jobs = sequences.assign_numbers([plan['job'] for plan in jobs])
+        for start in range(0, len(new_jobs), self.batch_size):
+            Job.objects.bulk_create(new_jobs[start:start + self.batch_size])
+        by_number = dict(
+            Job.objects.filter(job_number__in=[job.job_number for job in new_jobs]).values_list('job_number', 'id')
+        )
+        for job in new_jobs:
+            job.id = by_number[job.job_number]
+        job_search.reindex_jobs([job.id for job in new_jobs])
+
+    def _tickets(self, jobs, item_ids):
+        ticket_count = line_count = 0
+        for start in range(0, len(jobs), max(1, self.batch_size // 100)):
+            batch = jobs[start:start + max(1, self.batch_size // 100)]
+            for model, line_model, key in (
+                (DeliveryTicket, DeliveryTicketItem, 'deliveries'),
+                (ReceivingTicket, ReceivingTicketItem, 'receivings'),
+            ):
+                tickets, planned = [], []
+                for plan in batch:
+                    # Numbered per job, oldest first (the job's sequence starts after them)
+                    for number, ticket_plan in enumerate(sorted(plan[key], key=lambda t: -t['age']), start=1):
+                        ticket = model(job_id=plan['job'].id, ticket_date=self.now - timedelta(days=ticket_plan['age']))
+                        ticket.ticket_number = ticket.format_number(number)
+                        if model is ReceivingTicket and ticket_plan['verified']:
+                            # Verified tickets always have their report (only the name; no file is written)
+                            ticket.is_fully_verified = True
+                            ticket.inspection_report.name = inspection_report_upload_path(ticket, 'report.xlsx')
+                        tickets.append(ticket)
+                        planned.append(ticket_plan)
+                if not tickets:
+                    continue
+                model.objects.bulk_create(tickets)
+
+                # ticket_date is auto_now_add: put the planned dates back
+                by_key = {
+                    (job_id, number): ticket_id for ticket_id, job_id, number in model.objects
+                    .filter(job_id__in=[plan['job'].id for plan in batch]).values_list('id', 'job_id', 'ticket_number')
+                }
+                for ticket, ticket_plan in zip(tickets, planned):
+                    ticket.id = by_key[(ticket.job_id, ticket.ticket_number)]
+                    ticket.ticket_date = self.now - timedelta(days=ticket_plan['age'])
+                model.objects.bulk_update(tickets, ['ticket_date'], batch_size=self.batch_size)
+
+                if line_model is DeliveryTicketItem:
+                    lines = [
+                        DeliveryTicketItem(ticket_id=ticket.id, item_id=item_ids[index], is_returnable=returnable)
+                        for ticket, ticket_plan in zip(tickets, planned)
+                        for index, returnable in ticket_plan['lines']
+                    ]
+                else:
+                    lines = [
+                        ReceivingTicketItem(ticket_id=ticket.id, item_id=item_ids[index], usage_status=usage)
+                        for ticket, ticket_plan in zip(tickets, planned)
+                        for index, usage in ticket_plan['lines']
+                    ]
+                line_model.objects.bulk_create(lines, batch_size=self.batch_size)
+
+                # Later tickets of these jobs continue the numbering
+                last_numbers = {}
+                for ticket in tickets:
+                    last_numbers[ticket.sequence_scope] = last_numbers.get(ticket.sequence_scope, 0) + 1
+                NumberSequence.objects.bulk_create([
+                    NumberSequence(scope=scope, last_value=last) for scope, last in last_numbers.items()
+                ])
+                ticket_count += len(tickets)
+                line_count += len(lines)
+        return ticket_count, line_count
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:09
+
+from django.db import migrations, models
+
+
+def _counter(number):
+    try:
+        return int(number.split('-')[-1])
+    except (AttributeError, ValueError, IndexError):
+        return 0
+
+
+def seed_sequences(apps, schema_editor):
+    """Starts every sequence after the highest number already in use."""
+    Job = apps.get_model('jobs', 'Job')
+    DeliveryTicket = apps.get_model('jobs', 'DeliveryTicket')
+    ReceivingTicket = apps.get_model('jobs', 'ReceivingTicket')
+    NumberSequence = apps.get_model('jobs', 'NumberSequence')
+
+    last_values = {}
+
+    def seen(scope, number):
+        last_values[scope] = max(last_values.get(scope, 0), _counter(number))
+
+    for job_type, job_number in Job.objects.values_list('job_type', 'job_number').iterator():
+        seen(f"job:{job_type}", job_number)
+    for job_id, ticket_number in DeliveryTicket.objects.values_list('job_id', 'ticket_number').iterator():
+        seen(f"delivery:{job_id}", ticket_number)
+    for job_id, ticket_number in ReceivingTicket.objects.values_list('job_id', 'ticket_number').iterator():
+        seen(f"receiving:{job_id}", ticket_number)
+
+    NumberSequence.objects.bulk_create(
+        [NumberSequence(scope=scope, last_value=value) for scope, value in last_values.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(max_length=100, unique=True)),
+                ('last_value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
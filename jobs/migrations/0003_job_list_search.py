@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_index(apps, schema_editor):
+    Job = apps.get_model('jobs', 'Job')
+    JobSearchTrigram = apps.get_model('jobs', 'JobSearchTrigram')
+    jobs = Job.objects.order_by('pk').values_list('id', 'job_number', 'customer__name', 'rig', 'well', 'location')
+    last_pk = 0
+    while True:
+        batch = list(jobs.filter(pk__gt=last_pk)[:2000])
+        if not batch:
+            return
+        rows = []
+        for job_id, *values in batch:
+            grams = set()
+            for value in values:
+                value = (value or '').lower()
+                grams.update(value[i:i + 3] for i in range(len(value) - 2))
+            rows.extend(JobSearchTrigram(job_id=job_id, trigram=gram) for gram in grams)
+        JobSearchTrigram.objects.bulk_create(rows, batch_size=5000)
+        last_pk = batch[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0002_numbersequence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobSearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['date', 'id'], name='jobs_job_date_id'),
+        ),
+        migrations.AddField(
+            model_name='jobsearchtrigram',
+            name='job',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_trigrams', to='jobs.job'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='jobsearchtrigram',
+            unique_together={('trigram', 'job')},
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('jobs', '0003_job_list_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='deliveryticket',
+            index=models.Index(fields=['job', 'ticket_date'], name='jobs_dt_job_date'),
+        ),
+        migrations.AddIndex(
+            model_name='deliveryticketitem',
+            index=models.Index(fields=['item', 'ticket'], name='jobs_dti_item_ticket'),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', 'date'], name='jobs_job_status_date'),
+        ),
+        migrations.AddIndex(
+            model_name='receivingticket',
+            index=models.Index(fields=['job', 'ticket_date'], name='jobs_rt_job_date'),
+        ),
+        migrations.AddIndex(
+            model_name='receivingticketitem',
+            index=models.Index(fields=['item', 'ticket'], name='jobs_rti_item_ticket'),
+        ),
+    ]
@@ -5,6 +5,7 @@ from inventory.models import InventoryItem , ProductCategory
 import uuid # We'll use this to generate unique ticket numbers
 from django.contrib.auth.models import User
 import os
+from . import search, sequences
 
 
 class Customer(models.Model):
@@ -12,6 +13,11 @@ class Customer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     def __str__(self): return self.name
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # The customer name is part of each job's search text
+        search.reindex_jobs(self.jobs.values_list('id', flat=True))
+
 class Contract(models.Model):
     customer = models.OneToOneField(Customer, on_delete=models.CASCADE, related_name='contract')
     items = models.ManyToManyField(ProductCategory, related_name='contracts', blank=True)
@@ -19,6 +25,17 @@ class Contract(models.Model):
     end_date = models.DateField(null=True, blank=True)
     def __str__(self): return f"Contract for {self.customer.name}"
 
+class NumberSequence(models.Model):
+    """
+    The last number handed out in a scope (see jobs/sequences.py), e.g.
+    'job:1101' for job numbers or 'delivery:<job id>' for a job's DT numbers.
+    """
+    scope = models.CharField(max_length=100, unique=True)
+    last_value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.scope}: {self.last_value}"
+
 class Job(models.Model):
     JOB_TYPE_CHOICES = [
         ('1101', '1101 (Fishing)'),
@@ -48,27 +65,35 @@ class Job(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Keyset pagination of the job list (newest first)
+            models.Index(fields=['date', 'id'], name='jobs_job_date_id'),
+            # Open jobs, newest first (dashboard)
+            models.Index(fields=['status', 'date'], name='jobs_job_status_date'),
+        ]
 
     def __str__(self):
         return self.job_number if self.job_number else "New Job"
 
+    # Numbering (see jobs/sequences.py): one counter per job type
+    number_field = 'job_number'
+
+    @property
+    def sequence_scope(self):
+        return f"job:{self.job_type}"
+
+    def format_number(self, counter):
+        # e.g. 1101-001
+        return f"{self.job_type}-{counter:03d}"
+
     def save(self, *args, **kwargs):
         # This logic only runs when the job is first created
-        if not self.pk: 
-            # Find the last job of the same type
-            last_job = Job.objects.filter(job_type=self.job_type).order_by('id').last()
-            if last_job:
-                # Extract the counter, increment, and format
-                last_counter = int(last_job.job_number.split('-')[-1])
-                new_counter = last_counter + 1
-            else:
-                # This is the first job of this type
-                new_counter = 1
-            
-            # Format the new job number (e.g., 1101-001)
-            self.job_number = f"{self.job_type}-{new_counter:03d}"
+        if not self.pk and not self.job_number:
+            self.job_number = self.format_number(sequences.next_number(self.sequence_scope))
         
         super().save(*args, **kwargs)
+        # Keep the job list search index in step with the searchable fields
+        search.reindex_jobs([self.pk])
     
 
 class DeliveryTicket(models.Model):
@@ -83,24 +108,27 @@ class DeliveryTicket(models.Model):
     class Meta:
         # This ensures that a ticket number is unique FOR A GIVEN JOB
         unique_together = ('job', 'ticket_number')
+        indexes = [
+            # A job's tickets by date (ticket history, outstanding items)
+            models.Index(fields=['job', 'ticket_date'], name='jobs_dt_job_date'),
+        ]
 
     def __str__(self):
         return self.ticket_number
 
+    # Numbering (see jobs/sequences.py): DT numbers count per job
+    number_field = 'ticket_number'
+
+    @property
+    def sequence_scope(self):
+        return f"delivery:{self.job_id}"
+
+    def format_number(self, counter):
+        return f"DT-{counter:03d}"
+
     def save(self, *args, **kwargs):
-        if not self.pk: # Only generate number for new tickets
-            # --- THE FIX IS HERE: We filter by 'job=self.job' ---
-            last_ticket = DeliveryTicket.objects.filter(job=self.job).order_by('id').last()
-            
-            new_num = 1
-            if last_ticket and last_ticket.ticket_number:
-                try:
-                    last_num = int(last_ticket.ticket_number.split('-')[-1])
-                    new_num = last_num + 1
-                except (ValueError, IndexError):
-                    new_num = 1 # Fallback if parsing fails
-            
-            self.ticket_number = f"DT-{new_num:03d}"
+        if not self.pk and not self.ticket_number: # Only generate number for new tickets
+            self.ticket_number = self.format_number(sequences.next_number(self.sequence_scope))
         
         super().save(*args, **kwargs)
 
@@ -111,6 +139,10 @@ class DeliveryTicketItem(models.Model):
 
     class Meta:
         unique_together = ('ticket', 'item')
+        indexes = [
+            # An item's delivery lines (outstanding items, item history)
+            models.Index(fields=['item', 'ticket'], name='jobs_dti_item_ticket'),
+        ]
 
     def __str__(self):
         return f"{self.ticket.ticket_number} - {self.item.serial_number} ({'Return' if self.is_returnable else 'Sold'})"
@@ -145,6 +177,9 @@ class ReceivingTicketItem(models.Model):
 
     class Meta:
         unique_together = ('ticket', 'item')
+        indexes = [
+            models.Index(fields=['item', 'ticket'], name='jobs_rti_item_ticket'),
+        ]
 
     def __str__(self):
         return f"{self.ticket.ticket_number} - {self.item.serial_number} ({self.get_usage_status_display()})"
@@ -163,24 +198,47 @@ class ReceivingTicket(models.Model):
 
     class Meta:
         unique_together = ('job', 'ticket_number')
+        indexes = [
+            models.Index(fields=['job', 'ticket_date'], name='jobs_rt_job_date'),
+        ]
 
     def __str__(self):
         return self.ticket_number
 
+    # Numbering (see jobs/sequences.py): RT numbers count per job
+    number_field = 'ticket_number'
+
+    @property
+    def sequence_scope(self):
+        return f"receiving:{self.job_id}"
+
+    def format_number(self, counter):
+        return f"RT-{counter:03d}"
+
     def save(self, *args, **kwargs):
-        if not self.pk:
-            last_ticket = ReceivingTicket.objects.filter(job=self.job).order_by('id').last()
-            new_num = 1
-            if last_ticket and last_ticket.ticket_number:
-                try:
-                    last_num = int(last_ticket.ticket_number.split('-')[-1])
-                    new_num = last_num + 1
-                except (ValueError, IndexError):
-                    new_num = 1
-            self.ticket_number = f"RT-{new_num:03d}"
+        if not self.pk and not self.ticket_number:
+            self.ticket_number = self.format_number(sequences.next_number(self.sequence_scope))
         super().save(*args, **kwargs)
 
 
+class JobSearchTrigram(models.Model):
+    """
+    One row per distinct 3-character slice of a job's searchable text
+    (job number, customer name, rig, well, location), like
+    inventory.SerialNumberTrigram. Lets the job list search use an index
+    instead of leading-wildcard LIKEs. Maintained by Job/Customer saves;
+    rebuild with `manage.py rebuild_job_search_index`.
+    """
+    job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='search_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        unique_together = ('trigram', 'job')
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.job_id}"
+
+
 class JobAttachment(models.Model):
     job = models.ForeignKey(Job, on_delete=models.CASCADE, related_name='attachments')
     file = models.FileField(upload_to='job_attachments/')
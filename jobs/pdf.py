@@ -0,0 +1,157 @@
+# jobs/pdf.py
+import mimetypes
+import os
+from functools import lru_cache
+from urllib.parse import unquote, urlsplit
+from urllib.request import url2pathname
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from weasyprint import CSS, HTML, default_url_fetcher
+from weasyprint.text.fonts import FontConfiguration
+from core.instrumentation import timed
+from .models import DeliveryTicket, ReceivingTicket
+from .pdf_cache import PDF_STYLESHEETS, PDF_TEMPLATES
+
+
+def load_pdf_ticket(ticket_type, ticket_id):
+    """
+    Fetches a ticket with everything its PDF header needs.
+    Returns None for an unknown ticket type, raises Http404 for a missing ticket.
+    """
+    if ticket_type == 'delivery':
+        model = DeliveryTicket
+    elif ticket_type == 'receiving':
+        model = ReceivingTicket
+    else:
+        return None
+    return get_object_or_404(model.objects.select_related('job__customer', 'created_by'), id=ticket_id)
+
+
+def render_ticket_html(ticket_type, ticket, extra_context=None):
+    """
+    Renders the HTML of a ticket PDF. All database work happens here, so the
+    returned string can be turned into a PDF anywhere (e.g. in a worker process).
+    """
+    items_by_category = {} # Define this at the top
+
+    if ticket_type == 'delivery':
+
+        # Delivery ticket logic remains the same
+        items_on_ticket = [line.item for line in ticket.lines.select_related('item__category').all() if line.item]
+        for item in items_on_ticket:
+            category_name = item.category.name
+            if category_name not in items_by_category:
+                items_by_category[category_name] = {'count': 0, 'serials': [], 'unit': item.category.unit}
+            items_by_category[category_name]['count'] += 1
+            items_by_category[category_name]['serials'].append(item.serial_number)
+
+    elif ticket_type == 'receiving':
+        # --- START: NEW LOGIC FOR RECEIVING TICKETS ---
+
+        # Instead of fetching items directly, we fetch the "line" items
+        # that contain the usage_status.
+        line_items = ticket.lines.select_related('item__category').all()
+
+        for line in line_items:
+            item = line.item
+            if not item: continue # Skip if the item has been deleted
+
+            category_name = item.category.name
+            if category_name not in items_by_category:
+                items_by_category[category_name] = {'count': 0, 'serials': [], 'unit': item.category.unit}
+
+            items_by_category[category_name]['count'] += 1
+
+            # This is the key change: format the serial string with the usage status
+            usage_display = line.get_usage_status_display() # Gets the friendly name, e.g., "Used"
+            formatted_serial = f"{item.serial_number} ({usage_display})"
+
+            items_by_category[category_name]['serials'].append(formatted_serial)
+
+        # --- END: NEW LOGIC FOR RECEIVING TICKETS ---
+
+    job = ticket.job
+
+    context = {
+        'ticket': ticket,
+        'job': job,
+        'items_by_category': items_by_category,
+    }
+
+    if extra_context:
+        context.update(extra_context)
+
+    creator_name = ticket.created_by.get_full_name() or ticket.created_by.username if ticket.created_by else "N/A"
+    if ticket_type == 'delivery':
+        context['delivered_by'] = creator_name
+    elif ticket_type == 'receiving':
+        context['received_by'] = creator_name
+
+    return render_to_string(PDF_TEMPLATES[ticket_type], context)
+
+
+def _static_path(url):
+    """Maps a file:// URL, or a URL under STATIC_URL, to a file on disk (or None)."""
+    parts = urlsplit(url)
+    if parts.scheme == 'file':
+        path = url2pathname(parts.path)
+        return path if os.path.isfile(path) else None
+
+    static_prefix = '/' + settings.STATIC_URL.lstrip('/')
+    if parts.scheme in ('http', 'https', '') and parts.path.startswith(static_prefix):
+        return finders.find(unquote(parts.path[len(static_prefix):]))
+    return None
+
+
+@lru_cache(maxsize=64)
+def _read_static(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def static_url_fetcher(url, *args, **kwargs):
+    """
+    WeasyPrint URL fetcher that serves static files (fonts, stylesheets,
+    images) from disk and keeps them in memory for the life of the process,
+    instead of requesting them from our own server or the internet.
+    Anything else goes to WeasyPrint's default fetcher.
+    """
+    path = _static_path(url)
+    if path is None:
+        return default_url_fetcher(url, *args, **kwargs)
+    return {
+        'string': _read_static(path),
+        'mime_type': mimetypes.guess_type(path)[0],
+        'filename': os.path.basename(path),
+    }
+
+
+@lru_cache(maxsize=None)
+def _font_config():
+    return FontConfiguration()
+
+
+@lru_cache(maxsize=None)
+def _stylesheet(name):
+    return CSS(filename=finders.find(name), url_fetcher=static_url_fetcher, font_config=_font_config())
+
+
+def ticket_stylesheets(ticket_type):
+    """
+    The parsed stylesheets of a ticket PDF. They (and the fonts their
+    @font-face rules load) are parsed once per process and reused.
+    """
+    return [_stylesheet(name) for name in PDF_STYLESHEETS[ticket_type]]
+
+
+def write_pdf(html_string, base_url, ticket_type):
+    """
+    Lays out the HTML with WeasyPrint and returns the PDF bytes.
+    Needs no database access, so it is safe to run in a process pool.
+    """
+    # Shows up as the request's 'pdf' Server-Timing span
+    with timed('pdf'):
+        html = HTML(string=html_string, base_url=base_url, url_fetcher=static_url_fetcher)
+        return html.write_pdf(stylesheets=ticket_stylesheets(ticket_type), font_config=_font_config())
@@ -0,0 +1,155 @@
+# jobs/pdf_cache.py
+import hashlib
+import os
+import random
+import tempfile
+import time
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.template.loader import get_template
+
+PDF_TEMPLATES = {
+    'delivery': 'jobs/pdf/delivery_ticket_pdf.html',
+    'receiving': 'jobs/pdf/receiving_ticket_pdf.html',
+}
+
+# Static stylesheets applied to each PDF template (see jobs/pdf.py)
+PDF_STYLESHEETS = {
+    'delivery': ['css/pdf/fonts.css', 'css/pdf/delivery_ticket.css'],
+    'receiving': ['css/pdf/fonts.css', 'css/pdf/receiving_ticket.css'],
+}
+
+# The driver fields that ticket_pdf_view passes through to the template
+EXTRA_CONTEXT_FIELDS = ('driver_name', 'truck_no', 'notes', 'id_license')
+
+
+def cache_dir():
+    return Path(getattr(settings, 'PDF_CACHE_DIR', Path(settings.MEDIA_ROOT) / 'pdf_cache'))
+
+
+@lru_cache(maxsize=None)
+def template_version(ticket_type):
+    """Hash of the PDF template and stylesheet sources, so a change to either misses the cache."""
+    digest = hashlib.sha256(get_template(PDF_TEMPLATES[ticket_type]).template.source.encode('utf-8'))
+    for name in PDF_STYLESHEETS[ticket_type]:
+        digest.update(Path(finders.find(name)).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def ticket_cache_key(ticket_type, ticket, extra_context=None):
+    """
+    Builds the cache key of a rendered ticket PDF from everything it shows:
+    the ticket row (type, id, updated_at), its lines, the job header, the
+    template version and the driver fields.
+    """
+    job = ticket.job
+    if ticket_type == 'delivery':
+        lines = ticket.lines.order_by('pk').values_list(
+            'item__serial_number', 'item__category__name', 'item__category__unit', 'is_returnable'
+        )
+    else:
+        lines = ticket.lines.order_by('pk').values_list(
+            'item__serial_number', 'item__category__name', 'item__category__unit', 'usage_status'
+        )
+
+    extra_context = extra_context or {}
+    parts = [
+        ticket_type,
+        ticket.pk,
+        ticket.ticket_number,
+        ticket.ticket_date.isoformat() if ticket.ticket_date else '',
+        ticket.updated_at.isoformat() if ticket.updated_at else '',
+        ticket.created_by.get_full_name() or ticket.created_by.username if ticket.created_by else '',
+        job.job_number, job.customer.name, job.rig, job.well, job.location, job.trans, str(job.date),
+        template_version(ticket_type),
+        [extra_context.get(field, '') for field in EXTRA_CONTEXT_FIELDS],
+        list(lines),
+    ]
+    digest = hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:32]
+    return f"{ticket_type}-{ticket.pk}-{digest}"
+
+
+def _path(key):
+    return cache_dir() / f"{key}.pdf"
+
+
+def get(key):
+    """Returns the cached PDF bytes, or None on a miss."""
+    path = _path(key)
+    try:
+        content = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    # Bump the mtime so size-based eviction drops the least recently used files first
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return content
+
+
+def put(key, content):
+    """Stores a rendered PDF (atomically, so readers never see half a file)."""
+    directory = cache_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, _path(key))
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    # Pruning lists the whole cache directory: only a small share of writes do
+    # it (PDF_CACHE_PRUNE_RATE), so the cache stays near its budget without a
+    # directory walk per PDF. prune_pdf_cache does a full pass on demand.
+    if random.random() < getattr(settings, 'PDF_CACHE_PRUNE_RATE', 0.01):
+        prune()
+
+
+def invalidate_ticket(ticket_type, ticket_id):
+    """Drops every cached version of one ticket."""
+    for path in cache_dir().glob(f"{ticket_type}-{ticket_id}-*.pdf"):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def prune(max_bytes=None, max_age=None):
+    """
+    Evicts files older than max_age seconds, then the least recently used
+    files until the cache fits in max_bytes. Returns (files removed, bytes freed).
+    """
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    if max_age is None:
+        max_age = getattr(settings, 'PDF_CACHE_MAX_AGE', 30 * 24 * 3600)
+
+    entries = []
+    for path in cache_dir().glob('*.pdf'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    removed, freed = 0, 0
+    now = time.time()
+    total = sum(size for _, size, _ in entries)
+    # Oldest first
+    for mtime, size, path in sorted(entries, key=lambda entry: entry[0]):
+        if now - mtime <= max_age and total <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        total -= size
+        removed += 1
+        freed += size
+
+    return removed, freed
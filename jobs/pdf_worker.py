@@ -0,0 +1,21 @@
+# jobs/pdf_worker.py
+"""
+Entry points of the PDF render processes (see exports.ticket_pdfs).
+
+The pool's processes are spawned, so they start from a fresh interpreter
+and import this module before Django is set up. It must not import models
+(or anything that does) at the top: init() sets Django up first, and
+write_pdf() imports the real renderer only then.
+"""
+
+
+def init():
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+
+
+def write_pdf(html_string, base_url, ticket_type):
+    from .pdf import write_pdf
+    return write_pdf(html_string, base_url, ticket_type)
@@ -0,0 +1,123 @@
+# jobs/search.py
+from datetime import date
+from django.db import connection
+from django.db.models import Count, Q
+from inventory.search import trigrams
+from . import models
+
+# Keep IN (...) lists to a sane size
+CHUNK_SIZE = 2000
+
+# What the job list search looks at
+SEARCH_FIELDS = ['job_number', 'customer__name', 'rig', 'well', 'location']
+
+# A trigram found in more jobs than this is "common": intersecting its postings
+# costs more than letting the date-ordered scan check icontains row by row
+COMMON_TRIGRAM = 2000
+
+
+def _trigram_rows(rows):
+    # Each field is sliced on its own, so no trigram spans two fields
+    return [
+        models.JobSearchTrigram(job_id=row[0], trigram=gram)
+        for row in rows
+        for gram in set().union(*(trigrams(value) for value in row[1:]))
+    ]
+
+
+def _job_rows(queryset):
+    return queryset.order_by().values_list('id', *SEARCH_FIELDS)
+
+
+def reindex_jobs(pks):
+    """Drops and rebuilds the index rows of the given job ids."""
+    pks = list(pks)
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        models.JobSearchTrigram.objects.filter(job_id__in=chunk).delete()
+        rows = _job_rows(models.Job.objects.filter(pk__in=chunk))
+        models.JobSearchTrigram.objects.bulk_create(_trigram_rows(rows), batch_size=5000)
+
+
+def rebuild_index(batch_size=CHUNK_SIZE):
+    """Rebuilds the whole index, walking the jobs in primary key order."""
+    models.JobSearchTrigram.objects.all().delete()
+    jobs = _job_rows(models.Job.objects.order_by('pk'))
+    last_pk = 0
+    total = 0
+    while True:
+        rows = list(jobs.filter(pk__gt=last_pk).order_by('pk')[:batch_size])
+        if not rows:
+            return total
+        models.JobSearchTrigram.objects.bulk_create(_trigram_rows(rows), batch_size=5000)
+        last_pk = rows[-1][0]
+        total += len(rows)
+
+
+def _date_q(query):
+    """Q for a YYYY-MM-DD or YYYY-MM query (an index range on date), else None."""
+    parts = query.split('-')
+    try:
+        if len(parts) == 3:
+            return Q(date=date(int(parts[0]), int(parts[1]), int(parts[2])))
+        if len(parts) == 2 and len(parts[0]) == 4:
+            first = date(int(parts[0]), int(parts[1]), 1)
+            after = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+            return Q(date__gte=first, date__lt=after)
+    except ValueError:
+        pass
+    return None
+
+
+def _posting_sizes(grams):
+    """
+    {trigram: number of jobs containing it, capped at COMMON_TRIGRAM + 1}.
+    One query; the LIMIT keeps each count cheap however common the trigram is.
+    """
+    grams = sorted(grams)
+    table = connection.ops.quote_name(models.JobSearchTrigram._meta.db_table)
+    columns = ', '.join(
+        f"(SELECT COUNT(*) FROM (SELECT 1 FROM {table} WHERE trigram = %s LIMIT {COMMON_TRIGRAM + 1}) p{i})"
+        for i in range(len(grams))
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {columns}", grams)
+        return dict(zip(grams, cursor.fetchone()))
+
+
+def search_jobs(queryset, query):
+    """
+    Filters jobs whose job number, customer name, rig, well or location
+    contains `query` (case-insensitive), or whose date matches a
+    YYYY-MM-DD / YYYY-MM query.
+
+    When the query has rare trigrams, the candidates come from the trigram
+    index and the icontains checks only run on those. When all of its trigrams
+    are common, matches are dense, and the date-ordered scan finds a page of
+    them after a few rows, so the index is skipped.
+    """
+    query = query.strip()
+    contains = Q()
+    for field in SEARCH_FIELDS:
+        contains |= Q(**{f"{field}__icontains": query})
+
+    grams = trigrams(query)
+    if grams:
+        sizes = _posting_sizes(grams)
+        rare = [gram for gram, size in sizes.items() if size <= COMMON_TRIGRAM]
+        if any(size == 0 for size in sizes.values()):
+            # Some trigram is in no job at all
+            contains = Q(pk__in=[])
+        elif rare:
+            candidates = (
+                models.JobSearchTrigram.objects
+                .filter(trigram__in=rare)
+                .values('job_id')
+                .annotate(hits=Count('trigram'))
+                .filter(hits=len(rare))
+                .values('job_id')
+            )
+            contains &= Q(id__in=candidates)
+
+    date_q = _date_q(query)
+    return queryset.filter(contains | date_q if date_q else contains)
@@ -0,0 +1,73 @@
+# jobs/sequences.py
+"""
+Gap-tolerant, collision-free counters for job and ticket numbers.
+
+Each scope ('job:1101', 'delivery:<job id>', 'receiving:<job id>') has one
+NumberSequence row. Numbers are handed out by incrementing that row in a
+single atomic statement, so two requests can never get the same number
+(the old "read the last ticket and add one" could).
+"""
+from collections import defaultdict
+from django.db import connection, transaction
+from . import models
+
+
+def allocate(scope, count=1):
+    """
+    Reserves `count` consecutive numbers in `scope` (one round trip on
+    MySQL, PostgreSQL and SQLite) and returns them as a range.
+    A new scope starts at 1.
+    """
+    if count < 1:
+        raise ValueError("count must be at least 1.")
+
+    table = connection.ops.quote_name(models.NumberSequence._meta.db_table)
+
+    if connection.vendor == 'mysql':
+        # LAST_INSERT_ID(expr) hands the new value back in the OK packet (cursor.lastrowid)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (scope, last_value) VALUES (%s, LAST_INSERT_ID(%s)) "
+                f"ON DUPLICATE KEY UPDATE last_value = LAST_INSERT_ID(last_value + %s)",
+                [scope, count, count],
+            )
+            last = cursor.lastrowid
+    elif connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {table} (scope, last_value) VALUES (%s, %s) "
+                f"ON CONFLICT (scope) DO UPDATE SET last_value = {table}.last_value + EXCLUDED.last_value "
+                f"RETURNING last_value",
+                [scope, count],
+            )
+            last = cursor.fetchone()[0]
+    else:
+        # Anything else: lock the row for the increment
+        with transaction.atomic():
+            sequence, _ = models.NumberSequence.objects.select_for_update().get_or_create(scope=scope)
+            sequence.last_value += count
+            sequence.save(update_fields=['last_value'])
+            last = sequence.last_value
+
+    return range(last - count + 1, last + 1)
+
+
+def next_number(scope):
+    return allocate(scope)[0]
+
+
+def assign_numbers(objects):
+    """
+    Numbers unsaved Jobs/tickets in place, for bulk_create: one allocation
+    per scope, however many objects share it. Objects that already have a
+    number are left alone.
+    """
+    by_scope = defaultdict(list)
+    for obj in objects:
+        if not obj.pk and not getattr(obj, obj.number_field):
+            by_scope[obj.sequence_scope].append(obj)
+
+    for scope, pending in by_scope.items():
+        for obj, counter in zip(pending, allocate(scope, len(pending))):
+            setattr(obj, obj.number_field, obj.format_number(counter))
+    return objects
@@ -0,0 +1,47 @@
+# jobs/signals.py
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from . import contracts, pdf_cache
+from .models import Contract, DeliveryTicket, DeliveryTicketItem, ReceivingTicket, ReceivingTicketItem
+
+
+# Line edits (e.g. the admin inlines) change what a ticket PDF shows.
+# The cache key already covers the lines; this just frees the stale files early.
+@receiver([post_save, post_delete], sender=DeliveryTicketItem)
+def invalidate_delivery_ticket_pdf(sender, instance, **kwargs):
+    pdf_cache.invalidate_ticket('delivery', instance.ticket_id)
+
+
+@receiver([post_save, post_delete], sender=ReceivingTicketItem)
+def invalidate_receiving_ticket_pdf(sender, instance, **kwargs):
+    pdf_cache.invalidate_ticket('receiving', instance.ticket_id)
+
+
+@receiver(post_delete, sender=DeliveryTicket)
+def drop_deleted_delivery_ticket_pdf(sender, instance, **kwargs):
+    pdf_cache.invalidate_ticket('delivery', instance.pk)
+
+
+@receiver(post_delete, sender=ReceivingTicket)
+def drop_deleted_receiving_ticket_pdf(sender, instance, **kwargs):
+    pdf_cache.invalidate_ticket('receiving', instance.pk)
+
+
+# The cached contract categories (jobs/contracts.py) go stale when the
+# contract or its categories change
+@receiver([post_save, post_delete], sender=Contract)
+def invalidate_contract_categories(sender, instance, **kwargs):
+    contracts.invalidate(instance.customer_id)
+
+
+@receiver(m2m_changed, sender=Contract.items.through)
+def invalidate_contract_category_changes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        # contract.items.add/remove/clear(...)
+        contracts.invalidate(instance.customer_id)
+        return
+    # category.contracts.add/remove/clear(...): every contract involved
+    affected = Contract.objects.filter(pk__in=pk_set) if pk_set else instance.contracts.all()
+    contracts.invalidate(*affected.values_list('customer_id', flat=True))
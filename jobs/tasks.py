@@ -0,0 +1,51 @@
+# jobs/tasks.py
+import tempfile
+from django.core.files import File
+from django.urls import reverse
+from core.tasks import TaskFailed, task
+from .exports import stream_job_export
+from .models import Job, ReceivingTicket
+from .utils import apply_inspection_report
+
+
+@task('jobs.export_job')
+def export_job(task, job_id, base_url):
+    """Builds the job's ZIP bundle (tickets, attachments, inspection reports) into task.result_file."""
+    job = Job.objects.get(id=job_id)
+
+    def progress(done, total, message):
+        task.set_progress(done, total, message)
+
+    with tempfile.TemporaryFile() as output:
+        for chunk in stream_job_export(job, base_url, progress=progress):
+            output.write(chunk)
+        output.seek(0)
+        task.result_file.save(f"job_{job.job_number}_export.zip", File(output), save=True)
+
+    return {
+        'message': f"Export of job {job.job_number} is ready.",
+        'link_url': reverse('job_detail', args=[job.id]),
+        'link_label': 'Back to job',
+    }
+
+
+@task('jobs.apply_inspection_report')
+def apply_inspection_report_task(task, ticket_id, filename):
+    """Applies an uploaded inspection report (stored as task.input_file) to a receiving ticket."""
+    ticket = ReceivingTicket.objects.select_related('job').get(id=ticket_id)
+    task.set_progress(0, None, "Reading the report...")
+
+    with task.input_file.open('rb') as report_file:
+        try:
+            level, message = apply_inspection_report(ticket, report_file, filename, user=task.created_by)
+        except ValueError as e:
+            raise TaskFailed(f"An error occurred while processing the file: {e}")
+
+    return {
+        'message': message,
+        'level': level,
+        # Serial numbers in the message are escaped by apply_inspection_report
+        'safe': True,
+        'link_url': reverse('job_detail', args=[ticket.job_id]),
+        'link_label': 'Back to job',
+    }
@@ -1,3 +1,210 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock, skipIf
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from core.testing import QueryBudgetMixin, TemporaryMediaMixin
+from inventory.models import InventoryItem, ProductCategory
+from .models import Contract, Customer, DeliveryTicket, DeliveryTicketItem, Job, ReceivingTicket, ReceivingTicketItem
+from .utils import outstanding_items, outstanding_lines
+from . import contracts, exports, sequences, urls
 
-# Create your tests here.
+
+class SequenceTests(TestCase):
+    def setUp(self):
+        self.customer = Customer.objects.create(name='Customer')
+
+    def test_numbers_per_scope(self):
+        job = Job.objects.create(job_type='1101', customer=self.customer, rig='r', location='l', well='w')
+        other = Job.objects.create(job_type='1102', customer=self.customer, rig='r', location='l', well='w')
+        self.assertEqual((job.job_number, other.job_number), ('1101-001', '1102-001'))
+
+        # DT and RT numbers count separately, per job
+        tickets = [DeliveryTicket.objects.create(job=job) for _ in range(2)]
+        self.assertEqual([t.ticket_number for t in tickets], ['DT-001', 'DT-002'])
+        self.assertEqual(ReceivingTicket.objects.create(job=job).ticket_number, 'RT-001')
+        self.assertEqual(DeliveryTicket.objects.create(job=other).ticket_number, 'DT-001')
+
+    def test_bulk_allocation(self):
+        job = Job.objects.create(job_type='1103', customer=self.customer, rig='r', location='l', well='w')
+        DeliveryTicket.objects.create(job=job)
+
+        with self.assertNumQueries(1):
+            tickets = sequences.assign_numbers([DeliveryTicket(job=job) for _ in range(5)])
+        DeliveryTicket.objects.bulk_create(tickets)
+
+        self.assertEqual(
+            list(DeliveryTicket.objects.filter(job=job).order_by('id').values_list('ticket_number', flat=True)),
+            ['DT-001', 'DT-002', 'DT-003', 'DT-004', 'DT-005', 'DT-006'],
+        )
+        self.assertEqual(sequences.allocate('test:scope', 3), range(1, 4))
+        self.assertEqual(sequences.allocate('test:scope', 2), range(4, 6))
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite serialises writers; the race needs a server database.")
+class SequenceConcurrencyTests(TransactionTestCase):
+    CREATORS = 50
+
+    def test_parallel_ticket_creation_never_collides(self):
+        customer = Customer.objects.create(name='Customer')
+        job = Job.objects.create(job_type='1101', customer=customer, rig='r', location='l', well='w')
+
+        def create_ticket(_):
+            # Every thread has its own database connection
+            try:
+                return DeliveryTicket.objects.create(job_id=job.id).ticket_number
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=self.CREATORS) as pool:
+            numbers = list(pool.map(create_ticket, range(self.CREATORS)))
+
+        self.assertEqual(len(set(numbers)), self.CREATORS)
+        self.assertEqual(sorted(numbers), [f"DT-{n:03d}" for n in range(1, self.CREATORS + 1)])
+
+
+class ContractCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.customer = Customer.objects.create(name='Customer')
+        self.pipe, self.jar = (ProductCategory.objects.create(name=name) for name in ('Pipe', 'Jar'))
+        self.contract = Contract.objects.create(customer=self.customer)
+        self.contract.items.add(self.pipe)
+        self.job = Job.objects.create(job_type='1101', customer=self.customer, rig='r', location='l', well='w')
+        self.items = [
+            InventoryItem.objects.create(serial_number=serial, category=category, location='maadi-yard')
+            for serial, category in (('P-1', self.pipe), ('J-1', self.jar))
+        ]
+        self.client.force_login(User.objects.create_user('contracts'))
+
+    def _check(self):
+        url = reverse('ajax_bulk_check_contract', args=[self.job.id])
+        return self.client.get(url, {'item_ids[]': [item.id for item in self.items]}).json()['out_of_contract_serials']
+
+    def test_cached_until_the_contract_changes(self):
+        self.assertEqual(contracts.allowed_categories(self.customer.id), frozenset([self.pipe.id]))
+        with self.assertNumQueries(0):
+            contracts.allowed_categories(self.customer.id)
+        self.assertEqual(self._check(), ['J-1'])
+
+        self.contract.items.add(self.jar)
+        self.assertEqual(self._check(), [])
+        self.jar.contracts.remove(self.contract)
+        self.assertEqual(self._check(), ['J-1'])
+        self.contract.items.clear()
+        self.assertEqual(contracts.allowed_categories(self.customer.id), frozenset())
+
+        # No contract: nothing is covered
+        self.contract.delete()
+        self.assertIsNone(contracts.allowed_categories(self.customer.id))
+        self.assertEqual(sorted(self._check()), ['J-1', 'P-1'])
+
+
+class JobsQueryBudgetTests(QueryBudgetMixin, TestCase):
+    url_patterns = urls.urlpatterns
+
+    def requests(self, fleet):
+        job = fleet.job.id
+        dt, rt = fleet.delivery_ticket, fleet.receiving_ticket
+        available = list(InventoryItem.objects.filter(status='available').values_list('id', flat=True)[:10])
+        outstanding = [str(i) for i in outstanding_items(fleet.job).values_list('id', flat=True)[:10]]
+        available_serials = InventoryItem.objects.filter(id__in=available).values_list('serial_number', flat=True)
+        report = SimpleUploadedFile('report.xlsx', b'PK')
+        return [
+            ('job_list', 'get', reverse('job_list'), None),
+            ('job_list (search)', 'get', reverse('job_list'), {'q': 'Rig 1'}),
+            ('job_detail', 'get', reverse('job_detail', args=[job]), None),
+            ('job_detail (delivery)', 'post', reverse('job_detail', args=[job]),
+             {'submit_delivery': '1', 'selected_items': available}),
+            ('job_detail (receiving)', 'post', reverse('job_detail', args=[job]),
+             {'submit_receiving': '1', 'used_items': outstanding[:5], 'not_used_items': outstanding[5:]}),
+            ('job_section_outstanding', 'get', reverse('job_section_outstanding', args=[job]), None),
+            ('job_section_attachments', 'get', reverse('job_section_attachments', args=[job]), None),
+            ('job_section_tickets', 'get', reverse('job_section_tickets', args=[job]), None),
+            ('job_section_tickets (older)', 'get', reverse('job_section_tickets', args=[job]), {'page': '2'}),
+            ('job_ticket_lines', 'get', reverse('job_ticket_lines', args=['delivery', dt.id]), None),
+            ('job_ticket_lines (receiving)', 'get', reverse('job_ticket_lines', args=['receiving', rt.id]), None),
+            ('job_create', 'get', reverse('job_create'), None),
+            ('load_available_items', 'get', reverse('load_available_items', args=[job]), {'location': 'maadi-yard'}),
+            ('load_on_job_items', 'get', reverse('load_on_job_items', args=[job]), None),
+            ('ticket_pdf', 'get', reverse('ticket_pdf', args=['delivery', dt.id]), None),
+            ('ticket_pdf (receiving)', 'get', reverse('ticket_pdf', args=['receiving', rt.id]), None),
+            ('end_job', 'get', reverse('end_job', args=[job]), None),
+            ('reopen_job', 'get', reverse('reopen_job', args=[job]), None),
+            ('ajax_smart_search', 'get', reverse('ajax_smart_search', args=[job]), {'q': 'QB-0'}),
+            ('ajax_smart_search (on job)', 'get', reverse('ajax_smart_search', args=[job]), {'q': 'QB-0', 'type': 'on_job'}),
+            ('delivery_ticket_quick_create', 'get', reverse('delivery_ticket_quick_create', args=[job]), None),
+            ('delivery_ticket_quick_create (submit)', 'post', reverse('delivery_ticket_quick_create', args=[job]),
+             {'serial_numbers_text': '\n'.join(available_serials)}),
+            ('receiving_ticket_quick_create', 'get', reverse('receiving_ticket_quick_create', args=[job]), None),
+            ('ajax_bulk_check_contract', 'get', reverse('ajax_bulk_check_contract', args=[job]), {'item_ids[]': available}),
+            ('upload_inspection_report', 'get', reverse('upload_inspection_report', args=[rt.id]), None),
+            ('upload_inspection_report (upload)', 'post', reverse('upload_inspection_report', args=[rt.id]), {'report_file': report}),
+            ('ticket_edit', 'get', reverse('ticket_edit', args=['delivery', dt.id]), None),
+            ('ticket_edit (receiving)', 'get', reverse('ticket_edit', args=['receiving', rt.id]), None),
+            # Saving a ticket resubmits all of its items (they grow with the fleet)
+            ('ticket_edit (save delivery)', 'post', reverse('ticket_edit', args=['delivery', dt.id]),
+             {'items': list(dt.lines.values_list('item_id', flat=True))}),
+            ('ticket_edit (save receiving)', 'post', reverse('ticket_edit', args=['receiving', rt.id]),
+             {'items': list(rt.lines.values_list('item_id', flat=True))}),
+            ('job_export', 'get', reverse('job_export', args=[job]), None),
+        ]
+
+
+@override_settings(PDF_RENDER_WORKERS=1)
+class TicketPdfCacheTests(TemporaryMediaMixin, TestCase):
+    def test_in_process_renders_are_cached(self):
+        job = Job.objects.create(job_type='1101', customer=Customer.objects.create(name='Cached'), rig='R', well='W', location='L')
+        tickets = [('delivery', DeliveryTicket.objects.create(job=job))]
+
+        with mock.patch.object(exports, 'write_pdf', return_value=b'%PDF-1.7') as write_pdf:
+            first = list(exports.ticket_pdfs(tickets, 'http://testserver/'))
+            second = list(exports.ticket_pdfs(tickets, 'http://testserver/'))
+
+        self.assertEqual(write_pdf.call_count, 1)
+        self.assertEqual(first, second)
+
+
+class OutstandingItemsTests(TestCase):
+    def test_deliveries_with_the_same_date_count_once(self):
+        category = ProductCategory.objects.create(name='Drill Pipe', unit='joint')
+        item = InventoryItem.objects.create(serial_number='OUT-1', category=category, location='maadi-yard', status='on_job')
+        job = Job.objects.create(job_type='1101', customer=Customer.objects.create(name='Twice'), rig='R', well='W', location='L')
+        tickets = [DeliveryTicket.objects.create(job=job) for _ in range(2)]
+        DeliveryTicket.objects.filter(id__in=[t.id for t in tickets]).update(ticket_date=tickets[0].ticket_date)
+        DeliveryTicketItem.objects.bulk_create([DeliveryTicketItem(ticket=ticket, item=item) for ticket in tickets])
+
+        self.assertEqual(list(outstanding_lines(ticket__job=job).values_list('ticket_id', flat=True)), [tickets[1].id])
+        self.assertEqual(list(outstanding_items(job)), [item])
+
+
+class BackfillItemMovementsTests(TestCase):
+    def test_history_is_rebuilt_from_the_tickets(self):
+        category = ProductCategory.objects.create(name='Drill Pipe', unit='joint')
+        items = [
+            InventoryItem.objects.create(serial_number=f'BF-{i}', category=category, location='maadi-yard')
+            for i in range(2)
+        ]
+        job = Job.objects.create(job_type='1101', customer=Customer.objects.create(name='Backfill'), rig='R', well='W', location='L')
+        delivery = DeliveryTicket.objects.create(job=job)
+        DeliveryTicketItem.objects.bulk_create([DeliveryTicketItem(ticket=delivery, item=item) for item in items])
+        receiving = ReceivingTicket.objects.create(job=job)
+        ReceivingTicketItem.objects.create(ticket=receiving, item=items[0])
+        # items[0] was inspected as junk, items[1] is still out
+        InventoryItem.objects.filter(id=items[0].id).update(status='junk')
+        InventoryItem.objects.filter(id=items[1].id).update(status='on_job')
+
+        call_command('backfill_item_movements', stdout=StringIO())
+        call_command('backfill_item_movements', stdout=StringIO())  # a second run adds nothing
+
+        self.assertEqual(
+            list(items[0].movements.order_by('timestamp', 'id').values_list('kind', 'from_status', 'to_status')),
+            [('delivery', 'available', 'on_job'), ('receiving', 'on_job', 'pending_inspection'),
+             ('inspection', 'pending_inspection', 'junk')],
+        )
+        self.assertEqual(list(items[1].movements.values_list('kind', 'job')), [('delivery', job.id)])
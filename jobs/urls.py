@@ -4,6 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.job_list_view, name='job_list'),
     path('<int:job_id>/', views.job_detail_view, name='job_detail'),
+    # Job detail sections, loaded by htmx
+    path('<int:job_id>/sections/outstanding/', views.job_section_outstanding_view, name='job_section_outstanding'),
+    path('<int:job_id>/sections/attachments/', views.job_section_attachments_view, name='job_section_attachments'),
+    path('<int:job_id>/sections/tickets/', views.job_section_tickets_view, name='job_section_tickets'),
+    path('ticket/<str:ticket_type>/<int:ticket_id>/lines/', views.job_ticket_lines_view, name='job_ticket_lines'),
     
     path('create/', views.job_create_view, name='job_create'),
 
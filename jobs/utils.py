@@ -0,0 +1,213 @@
+# jobs/utils.py
+import openpyxl
+from django.db import transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.html import escape
+from inventory import movements
+from inventory.models import InventoryItem
+from .models import DeliveryTicket, DeliveryTicketItem, ReceivingTicket, ReceivingTicketItem
+
+
+def outstanding_lines(**job_filter):
+    """
+    Returns the DeliveryTicketItem lines that are still "out" on a job.
+
+    An item is outstanding on a job when it is 'on_job' and its latest delivery
+    for that job is newer than its latest receiving for the same job. We keep
+    exactly one line per (job, item): the most recent delivery. Everything is
+    done in SQL, so the cost does not grow with the number of items.
+
+    job_filter is applied to the delivery lines, e.g. ticket__job=job,
+    ticket__job__in=jobs or ticket__job=OuterRef('pk') inside a subquery.
+    """
+    last_received = ReceivingTicketItem.objects.filter(
+        item=OuterRef('item'),
+        ticket__job=OuterRef('ticket__job'),
+    ).order_by('-ticket__ticket_date').values('ticket__ticket_date')[:1]
+
+    # A later delivery of the same item to the same job; two deliveries with the
+    # same ticket_date are ordered by ticket id, so exactly one line survives
+    later_delivery = DeliveryTicketItem.objects.filter(
+        Q(ticket__ticket_date__gt=OuterRef('ticket__ticket_date')) |
+        Q(ticket__ticket_date=OuterRef('ticket__ticket_date'), ticket_id__gt=OuterRef('ticket_id')),
+        item=OuterRef('item'),
+        ticket__job=OuterRef('ticket__job'),
+    )
+
+    return (
+        DeliveryTicketItem.objects
+        .filter(item__status='on_job', **job_filter)
+        .annotate(last_received=Subquery(last_received))
+        .filter(~Exists(later_delivery))
+        .filter(Q(last_received__isnull=True) | Q(ticket__ticket_date__gt=F('last_received')))
+    )
+
+
+def annotate_job_counts(queryset):
+    """
+    Adds per-job delivery_ticket_count, receiving_ticket_count and
+    outstanding_count as correlated subqueries, so a page of jobs and its
+    counts come back in one query (and only the rows on the page are counted).
+    """
+    def count_of(rows, job_field):
+        # Grouping by the (single) job turns the subquery into one COUNT
+        return Coalesce(Subquery(
+            rows.order_by().values(job_field).annotate(total=Count('pk')).values('total')[:1]
+        ), 0)
+
+    return queryset.annotate(
+        delivery_ticket_count=count_of(DeliveryTicket.objects.filter(job=OuterRef('pk')), 'job'),
+        receiving_ticket_count=count_of(ReceivingTicket.objects.filter(job=OuterRef('pk')), 'job'),
+        outstanding_count=count_of(outstanding_lines(ticket__job=OuterRef('pk')), 'ticket__job'),
+    )
+
+
+def outstanding_items(job):
+    """
+    Returns a queryset of the InventoryItems still on this job (one query).
+    """
+    item_ids = outstanding_lines(ticket__job=job).values('item_id')
+    return InventoryItem.objects.filter(id__in=item_ids).select_related('category')
+
+
+def outstanding_items_by_job(jobs):
+    """
+    Returns {job_id: [InventoryItem, ...]} for many jobs at once (one query).
+    Jobs with nothing outstanding are present with an empty list.
+    """
+    job_ids = [getattr(job, 'pk', job) for job in jobs]
+    result = {job_id: [] for job_id in job_ids}
+
+    lines = (
+        outstanding_lines(ticket__job__in=job_ids)
+        .select_related('item__category', 'ticket')
+        .order_by('item__category__name', 'item__serial_number')
+    )
+    for line in lines:
+        result[line.ticket.job_id].append(line.item)
+
+    return result
+
+
+# Inspection report wording -> inventory status
+INSPECTION_STATUS_ALIASES = {
+    'ok': 'available',
+    'good': 'available',
+    'need repair': 're-cut',
+    'repair': 're-cut',
+    'damage': 'junk',
+    'damaged': 'junk',
+}
+
+
+def apply_inspection_report(ticket, report_file, filename, user=None):
+    """
+    Applies an inspection report (Excel) to the items of a receiving ticket,
+    stores the report on the ticket and marks the ticket verified once no item
+    is pending inspection any more. The outcomes go to the item movement
+    ledger under `user`.
+    Returns (message level, message); raises ValueError for an unusable report.
+    """
+    try:
+        workbook = openpyxl.load_workbook(report_file)
+    except Exception as e:
+        # Not a readable workbook: retrying won't help
+        raise ValueError(f"Could not read the Excel file ({e}).")
+    sheet = workbook.active
+
+    header_row_index = -1
+    serial_col_index = -1
+    status_col_index = -1
+    reason_col_index = -1
+
+    for i, row in enumerate(sheet.iter_rows(min_row=1, max_row=20, values_only=True)):
+        row_values = [str(cell).lower() if cell is not None else '' for cell in row]
+        found_serial, found_status = False, False
+        for j, cell_value in enumerate(row_values):
+            if 'serial' in cell_value:
+                serial_col_index = j
+                found_serial = True
+            if 'status' in cell_value:
+                status_col_index = j
+                found_status = True
+            if 'reason' in cell_value:
+                reason_col_index = j
+        if found_serial and found_status:
+            header_row_index = i + 1
+            break
+
+    if header_row_index == -1:
+        raise ValueError("Could not find a header row with 'Serial' and 'Status' columns.")
+
+    report_data = []
+    for row in sheet.iter_rows(min_row=header_row_index + 1, values_only=True):
+        serial = row[serial_col_index]
+        status = row[status_col_index]
+        reason = row[reason_col_index] if reason_col_index != -1 else None
+
+        if serial:
+            report_data.append({'serial': str(serial).strip(), 'status': str(status).strip().lower(), 'reason': str(reason).strip() if reason else None })
+
+    items_on_ticket_map = {item.serial_number: item for item in ticket.items.all()}
+    # Statuses before the report, for the movement ledger
+    previous_status = {item.id: item.status for item in items_on_ticket_map.values()}
+    valid_statuses = [choice[0] for choice in InventoryItem.STATUS_CHOICES]
+    updated_items = []
+    ignored_items = []
+
+    with transaction.atomic():
+        for entry in report_data:
+            serial = entry['serial']
+            raw_status = entry['status']
+            system_status = INSPECTION_STATUS_ALIASES.get(raw_status, raw_status)
+
+            if serial in items_on_ticket_map:
+                item = items_on_ticket_map[serial]
+
+                if system_status in valid_statuses:
+                    item.status = system_status
+                    if system_status == 're-cut':
+                        item.recut_reason = entry['reason']
+                    else:
+                        item.recut_reason = None
+
+                    updated_items.append(item)
+                else:
+                    raise ValueError(f"Invalid or unrecognized status '{raw_status}' for serial number {serial}.")
+            else:
+                ignored_items.append(serial)
+
+        if updated_items:
+            InventoryItem.objects.bulk_update(updated_items, ['status', 'recut_reason'])
+            # One movement per item (a serial may be listed twice; the last row wins)
+            outcome = {item.id: item.status for item in updated_items}
+            movements.record(
+                [(item_id, previous_status[item_id], status) for item_id, status in outcome.items()],
+                'inspection', job=ticket.job_id, reference=ticket.ticket_number, user=user,
+            )
+
+        report_file.seek(0)
+        ticket.inspection_report.save(filename, report_file, save=True)
+
+    items_still_pending = ticket.items.filter(status='pending_inspection')
+
+    # If there are no items left pending, then the ticket is fully verified.
+    if not items_still_pending.exists():
+        ticket.is_fully_verified = True
+        ticket.save()
+
+        message = "Successfully processed the report. All items on this ticket are now verified."
+        if ignored_items:
+            message += f"<br><b>Note:</b> The following items from the report were ignored because they were not on this ticket: {escape(', '.join(ignored_items))}"
+        return 'success', message
+
+    # Some items are still pending inspection
+    pending_serials = [item.serial_number for item in items_still_pending]
+    message = (
+        f"Report processed, but some items still need verification. "
+        f"The following items are still pending inspection: {escape(', '.join(pending_serials))}"
+    )
+    if ignored_items:
+        message += f" The following items from the report were ignored: {escape(', '.join(ignored_items))}"
+    return 'warning', message
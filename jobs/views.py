@@ -2,43 +2,54 @@ import base64
 from django.shortcuts import render
 from django.urls import reverse
 from django.shortcuts import render, get_object_or_404, redirect
+from inventory import movements
 from inventory.models import InventoryItem
+from inventory.search import prefix_search_items, search_items
 from django.contrib import messages
 from django.db import transaction
 from .models import Job, DeliveryTicket, DeliveryTicketItem,ReceivingTicket , JobAttachment ,ReceivingTicketItem
 from operator import attrgetter
 from .forms import JobAttachmentForm
 from django.conf import settings
-from django.http import HttpResponse
-from django.template.loader import render_to_string
-from weasyprint import HTML
+from django.http import Http404, HttpResponse
 import os
-from io import BytesIO
-import zipfile
 from django.contrib.staticfiles import finders
 from django.http import JsonResponse
-from django.db.models import Q
+from django.db.models import Count, Q, Value
+from django.core.paginator import Paginator
 from django.contrib.auth.decorators import login_required
 from .forms import JobAttachmentForm, JobForm 
-import openpyxl
+from .utils import annotate_job_counts, outstanding_items
+from .search import search_jobs
+from core.pagination import keyset_paginate
+from . import contracts
+from . import pdf_cache
+from core.tasks import enqueue
+from .pdf import load_pdf_ticket, render_ticket_html, write_pdf
 from django.urls import reverse
 
+# Jobs per page on the job list
+JOBS_PER_PAGE = 50
+
 @login_required
 def job_list_view(request):
-    search_query = request.GET.get('q', '')
-    queryset = Job.objects.all()
+    search_query = request.GET.get('q', '').strip()
+    queryset = annotate_job_counts(Job.objects.select_related('customer'))
 
     if search_query:
-        # Search in job_number OR customer OR date
-        # The date search is a simple "contains" search
-        queryset = queryset.filter(
-            Q(job_number__icontains=search_query) |
-            Q(customer__icontains=search_query) | # <-- THIS IS THE PROBLEM
-            Q(date__icontains=search_query)
-        )
+        # Job number, customer name, rig, well or location contains the query
+        # (trigram index), or a YYYY-MM-DD / YYYY-MM date
+        queryset = search_jobs(queryset, search_query)
+
+    # Keyset pagination on (date, id), newest first: every page is one index range scan
+    page = keyset_paginate(
+        queryset, ['-date', '-id'],
+        after=request.GET.get('after'), before=request.GET.get('before'), per_page=JOBS_PER_PAGE,
+    )
 
     context = {
-        'jobs': queryset.order_by('-date'), # Order the final results
+        'jobs': page,
+        'page': page,
         'search_query': search_query,
     }
     return render(request, 'jobs/job_list.html', context)
@@ -46,7 +57,7 @@ def job_list_view(request):
 @login_required
 def load_available_items_view(request, job_id):
     location = request.GET.get('location')
-    items = InventoryItem.objects.filter(status='available', location=location)
+    items = InventoryItem.objects.filter(status='available', location=location).select_related('category')
     return render(request, 'jobs/partials/_delivery_item_list.html', {'items': items})
 
 @login_required
@@ -54,18 +65,7 @@ def load_on_job_items_view(request, job_id):
     job = get_object_or_404(Job, id=job_id) # Get the job object
     
     # Use the same robust logic as the main page
-    all_items_ever_delivered_for_job = InventoryItem.objects.filter(
-        delivery_tickets__job=job
-    ).distinct()
-
-    items_to_receive = []
-    for item in all_items_ever_delivered_for_job:
-        if item.status == 'on_job':
-            last_delivery = item.delivery_tickets.filter(job=job).order_by('-ticket_date').first()
-            last_receiving = item.receiving_tickets.filter(job=job).order_by('-ticket_date').first()
-            if last_delivery:
-                if not last_receiving or last_delivery.ticket_date > last_receiving.ticket_date:
-                    items_to_receive.append(item)
+    items_to_receive = outstanding_items(job)
 
     return render(request, 'jobs/partials/_receiving_item_list.html', {'items': items_to_receive})
 
@@ -74,65 +74,21 @@ def load_on_job_items_view(request, job_id):
 @login_required
 def job_export_view(request, job_id):
     job = get_object_or_404(Job, id=job_id)
-
-    # Get all tickets for the job
-    all_tickets = list(job.delivery_tickets.all()) + list(job.receiving_tickets.all())
     base_url = request.build_absolute_uri('/') # Base URL for WeasyPrint
 
-    in_memory_zip = BytesIO()
-    with zipfile.ZipFile(in_memory_zip, 'w', zipfile.ZIP_DEFLATED) as zf:
-        
-        # Generate and add a PDF for each ticket
-        if not all_tickets:
-            zf.writestr("no_tickets_found.txt", "This job has no delivery or receiving tickets.")
-        else:
-            for ticket in all_tickets:
-                ticket_type_str = 'delivery' if isinstance(ticket, DeliveryTicket) else 'receiving'
-                
-                # Call the helper to get the PDF content.
-                # We pass 'None' for extra_context because there's no driver info for a bulk export.
-                pdf_content, ticket_number = generate_ticket_pdf_content(
-                    ticket_type_str, ticket.id, base_url, extra_context=None
-                )
-                
-                if pdf_content:
-                    pdf_filename = f"Ticket_{ticket_number}_{ticket_type_str.capitalize()}.pdf"
-                    zf.writestr(pdf_filename, pdf_content)
-
-        # Add all job attachments
-        for attachment in job.attachments.all():
-            file_name = os.path.basename(attachment.file.name)
-            with attachment.file.open('rb') as f:
-                zf.writestr(file_name, f.read())
-    
-    # ===== START: NEW LOGIC TO ADD INSPECTION REPORTS =====
-
-    # Find all receiving tickets for this job that have a report file.
-        receiving_tickets_with_reports = job.receiving_tickets.filter(inspection_report__isnull=False)
-
-        for ticket in receiving_tickets_with_reports:
-            # Get just the filename from the full path
-            report_filename = os.path.basename(ticket.inspection_report.name)
-            
-            # Create a descriptive name for the file in the zip
-            zip_filename = f"Inspection_Report_for_{ticket.ticket_number}_{report_filename}"
-            
-            # Read the file content and write it to the zip
-            with ticket.inspection_report.open('rb') as f:
-                zf.writestr(zip_filename, f.read())
-                
-        # ===== END: NEW LOGIC =====
-
-
-    in_memory_zip.seek(0)
-    response = HttpResponse(in_memory_zip, content_type='application/zip')
-    response['Content-Disposition'] = f'attachment; filename="job_{job.job_number}_export.zip"'
-    
-    return response
+    # The ZIP (ticket PDFs, attachments, inspection reports) is built by a
+    # background worker (jobs.export_job); the task page offers it for download.
+    task = enqueue(
+        'jobs.export_job',
+        title=f"Job {job.job_number} export",
+        params={'job_id': job.id, 'base_url': base_url},
+        user=request.user,
+    )
+    return redirect('task_status', task_id=task.id)
 
 @login_required
 def job_detail_view(request, job_id):
-    job = get_object_or_404(Job, id=job_id)
+    job = get_object_or_404(Job.objects.select_related('customer'), id=job_id)
     attachment_form = JobAttachmentForm()
 
     if request.method == 'POST':
@@ -196,6 +152,10 @@ def job_detail_view(request, job_id):
 
                     InventoryItem.objects.bulk_update(items_to_update, ['status'])
                     DeliveryTicketItem.objects.bulk_create(delivery_lines)
+                    movements.record(
+                        [(item.id, 'available', item.status) for item in items_to_update], 'delivery',
+                        job=job, reference=ticket.ticket_number, user=request.user, timestamp=ticket.ticket_date,
+                    )
 
                     messages.success(request, f"Successfully created Delivery Ticket {ticket.ticket_number}.")
 
@@ -220,6 +180,8 @@ def job_detail_view(request, job_id):
                     
                     # Create dictionaries for fast lookups
                     item_map = {str(item.id): item for item in items_to_process}
+                    # Statuses before receiving, for the movement ledger
+                    previous_status = {item.id: item.status for item in items_to_process}
                     
                     receiving_lines_to_create = []
                     inventory_items_to_update = []
@@ -262,6 +224,11 @@ def job_detail_view(request, job_id):
                     
                     # Update the status for all InventoryItems in one query
                     InventoryItem.objects.bulk_update(inventory_items_to_update, ['status'])
+                    movements.record(
+                        [(item.id, previous_status[item.id], item.status) for item in inventory_items_to_update],
+                        'receiving', job=job, reference=ticket.ticket_number, user=request.user,
+                        timestamp=ticket.ticket_date,
+                    )
                     
                     messages.success(request, f"Successfully created Receiving Ticket {ticket.ticket_number}.")
 
@@ -271,160 +238,109 @@ def job_detail_view(request, job_id):
         return redirect('job_detail', job_id=job.id)
 
     # ---------------- GET LOGIC ----------------
+    # The first paint only needs the job (and its customer, for the header).
+    # Outstanding items, attachments and the ticket history are loaded by
+    # htmx from the job_section_* views below, each with its own small queries.
+    allowed_categories = contracts.allowed_categories(job.customer_id)
+    context = {
+        'job': job,
+        'attachment_form': attachment_form,
+        'preselect_receive_ids': request.GET.getlist('preselect_receive'),
+        # The delivery form checks the contract in the browser with these
+        # (None: no contract, so nothing is covered)
+        'contract_category_ids': None if allowed_categories is None else sorted(allowed_categories),
+    }
+    return render(request, 'jobs/job_detail.html', context)
+
+# Tickets per page in the job's ticket history
+TICKETS_PER_PAGE = 20
 
-    # Delivery tickets now use lines__item (through model)
-    delivery_tickets_qs = job.delivery_tickets.all().prefetch_related('lines__item')
+@login_required
+def job_section_outstanding_view(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    # Items delivered for THIS job that have not been received back yet.
+    context = {'job': job, 'on_job_items': outstanding_items(job)}
+    return render(request, 'jobs/partials/_job_outstanding.html', context)
 
-    # Receiving still uses direct items M2M
-    receiving_tickets_qs = job.receiving_tickets.all().prefetch_related('items')
+@login_required
+def job_section_attachments_view(request, job_id):
+    job = get_object_or_404(Job, id=job_id)
+    context = {'job': job, 'attachments': job.attachments.order_by('-uploaded_at')}
+    return render(request, 'jobs/partials/_job_attachments.html', context)
 
-    ticket_history_list = []
+@login_required
+def job_section_tickets_view(request, job_id):
+    """
+    One page of the job's ticket history (delivery and receiving, newest
+    first). Lines are not loaded; each ticket shows its line count and
+    expands on demand (job_ticket_lines_view).
+    """
+    job = get_object_or_404(Job, id=job_id)
 
-    for ticket in delivery_tickets_qs:
-        ticket_history_list.append({
-            'type': 'Delivery',
-            'ticket_obj': ticket,
-            # list of DeliveryTicketItem objects (each has .item and .is_returnable)
-            'items_list': list(ticket.lines.all())
-        })
+    # Both ticket types in one ordered list of (type, id, date)
+    deliveries = job.delivery_tickets.annotate(kind=Value('delivery')).values('kind', 'id', 'ticket_date')
+    receivings = job.receiving_tickets.annotate(kind=Value('receiving')).values('kind', 'id', 'ticket_date')
+    history = deliveries.union(receivings, all=True).order_by('-ticket_date', '-id')
 
-    for ticket in receiving_tickets_qs:
-        items_on_ticket = ticket.items.all()
+    page = Paginator(history, TICKETS_PER_PAGE).get_page(request.GET.get('page'))
 
-        verification_status = 'not_verified' # Default to Red
+    ids = {'delivery': [], 'receiving': []}
+    for row in page:
+        ids[row['kind']].append(row['id'])
 
-        # First, check the permanent flag. If it's true, the ticket is ALWAYS green.
+    tickets = {}
+    for ticket in DeliveryTicket.objects.filter(id__in=ids['delivery']).annotate(line_count=Count('lines')):
+        tickets[('delivery', ticket.id)] = {'type': 'Delivery', 'ticket_obj': ticket}
+    for ticket in ReceivingTicket.objects.filter(id__in=ids['receiving']).annotate(line_count=Count('lines')):
+        # Green: fully verified; yellow: a report was uploaded but items are still pending; red: no report
         if ticket.is_fully_verified:
             verification_status = 'fully_verified'
-
-        # ONLY if the permanent flag is false, check if a report has been uploaded.
-        # If so, it must be a partial verification (Yellow).
         elif ticket.inspection_report:
             verification_status = 'partially_verified'
-
-        ticket_history_list.append({
-            'type': 'Receiving',
-            'ticket_obj': ticket,
-            'items_list': list(items_on_ticket),
-            'verification_status': verification_status,
-        })
-        
-    ticket_history = sorted(
-        ticket_history_list, key=lambda t: t['ticket_obj'].ticket_date, reverse=True
-    )
-
-    # Compute "still out" items: returnable delivered items that are not received yet
-    returnable_delivered_ids = DeliveryTicketItem.objects.filter(
-        ticket__job=job,
-        is_returnable=True
-    ).values_list('item_id', flat=True)
-
-    received_ids = ReceivingTicket.objects.filter(
-        job=job
-    ).values_list('items__id', flat=True)
-
-    # First, get a list of all items that have EVER been delivered for THIS specific job.
-    items_delivered_for_this_job = InventoryItem.objects.filter(
-        delivery_tickets__job=job
-    ).distinct()
-
-    # Now, from that specific list, find the ones that are STILL on the job.
-    on_job_items = items_delivered_for_this_job.filter(
-        status='on_job'
-    ).select_related('category')
-
-    attachments = job.attachments.all()
-
-    preselect_receive_ids = request.GET.getlist('preselect_receive')
-    
-    on_job_items_for_js = [{
-        'id': item.id,
-        'serial': item.serial_number,
-        'category': item.category.name,
-        'location': item.get_location_display()
-    } for item in on_job_items]
+        else:
+            verification_status = 'not_verified'
+        tickets[('receiving', ticket.id)] = {
+            'type': 'Receiving', 'ticket_obj': ticket, 'verification_status': verification_status,
+        }
 
     context = {
         'job': job,
-        'on_job_items': on_job_items,
-        'ticket_history': ticket_history,
-        'attachment_form': attachment_form,
-        'attachments': attachments,
-        'preselect_receive_ids': preselect_receive_ids,
-        'on_job_items_json': on_job_items_for_js,
+        'page': page,
+        'ticket_history': [tickets[(row['kind'], row['id'])] for row in page],
     }
-    return render(request, 'jobs/job_detail.html', context)
+    return render(request, 'jobs/partials/_job_tickets.html', context)
+
+@login_required
+def job_ticket_lines_view(request, ticket_type, ticket_id):
+    # The serial numbers on one ticket, when its history entry is expanded
+    if ticket_type == 'delivery':
+        lines = DeliveryTicketItem.objects.filter(ticket_id=ticket_id)
+    elif ticket_type == 'receiving':
+        lines = ReceivingTicketItem.objects.filter(ticket_id=ticket_id)
+    else:
+        raise Http404
+    lines = lines.select_related('item').order_by('item__serial_number')
+    return render(request, 'jobs/partials/_ticket_lines.html', {'lines': lines})
+
 def generate_ticket_pdf_content(ticket_type, ticket_id, base_url, extra_context=None):
     """
     Generates PDF content for a ticket using the app's specific logic.
     - base_url is required for WeasyPrint to find static files like CSS/images.
     - extra_context is a dict for optional data like driver_name, truck_no, etc.
     """
-    items_by_category = {} # Define this at the top
-
-    if ticket_type == 'delivery':
-        ticket = get_object_or_404(DeliveryTicket, id=ticket_id)
-        template_name = 'jobs/pdf/delivery_ticket_pdf.html'
-        
-        # Delivery ticket logic remains the same
-        items_on_ticket = [line.item for line in ticket.lines.select_related('item__category').all() if line.item]
-        for item in items_on_ticket:
-            category_name = item.category.name
-            if category_name not in items_by_category:
-                items_by_category[category_name] = {'count': 0, 'serials': [], 'unit': item.category.unit}
-            items_by_category[category_name]['count'] += 1
-            items_by_category[category_name]['serials'].append(item.serial_number)
-
-    elif ticket_type == 'receiving':
-        ticket = get_object_or_404(ReceivingTicket, id=ticket_id)
-        template_name = 'jobs/pdf/receiving_ticket_pdf.html'
-        
-        # --- START: NEW LOGIC FOR RECEIVING TICKETS ---
-        
-        # Instead of fetching items directly, we fetch the "line" items 
-        # that contain the usage_status.
-        line_items = ticket.lines.select_related('item__category').all()
-
-        for line in line_items:
-            item = line.item
-            if not item: continue # Skip if the item has been deleted
-
-            category_name = item.category.name
-            if category_name not in items_by_category:
-                items_by_category[category_name] = {'count': 0, 'serials': [], 'unit': item.category.unit}
-            
-            items_by_category[category_name]['count'] += 1
-            
-            # This is the key change: format the serial string with the usage status
-            usage_display = line.get_usage_status_display() # Gets the friendly name, e.g., "Used"
-            formatted_serial = f"{item.serial_number} ({usage_display})"
-            
-            items_by_category[category_name]['serials'].append(formatted_serial)
-        
-        # --- END: NEW LOGIC FOR RECEIVING TICKETS ---
-
-    else:
+    ticket = load_pdf_ticket(ticket_type, ticket_id)
+    if ticket is None:
         return None, None
 
-    job = ticket.job
-
-    context = {
-        'ticket': ticket,
-        'job': job,
-        'items_by_category': items_by_category,
-    }
-
-    if extra_context:
-        context.update(extra_context)
-    
-    creator_name = ticket.created_by.get_full_name() or ticket.created_by.username if ticket.created_by else "N/A"
-    if ticket_type == 'delivery':
-        context['delivered_by'] = creator_name
-    elif ticket_type == 'receiving':
-        context['received_by'] = creator_name
+    # Unchanged tickets are served from the PDF cache without touching WeasyPrint
+    cache_key = pdf_cache.ticket_cache_key(ticket_type, ticket, extra_context)
+    cached_pdf = pdf_cache.get(cache_key)
+    if cached_pdf is not None:
+        return cached_pdf, ticket.ticket_number
 
-    html_string = render_to_string(template_name, context)
-    pdf_file = HTML(string=html_string, base_url=base_url).write_pdf()
+    html_string = render_ticket_html(ticket_type, ticket, extra_context)
+    pdf_file = write_pdf(html_string, base_url, ticket_type)
+    pdf_cache.put(cache_key, pdf_file)
 
     return pdf_file, ticket.ticket_number
 
@@ -483,18 +399,7 @@ def end_job_view(request, job_id):
 
     # --- THIS IS THE NEW, CORRECT LOGIC ---
     # We use the same robust calculation from the job detail page.
-    all_items_ever_delivered_for_job = InventoryItem.objects.filter(
-        delivery_tickets__job=job
-    ).distinct()
-
-    on_job_items = []
-    for item in all_items_ever_delivered_for_job:
-        if item.status == 'on_job':
-            last_delivery = item.delivery_tickets.filter(job=job).order_by('-ticket_date').first()
-            last_receiving = item.receiving_tickets.filter(job=job).order_by('-ticket_date').first()
-            if last_delivery:
-                if not last_receiving or last_delivery.ticket_date > last_receiving.ticket_date:
-                    on_job_items.append(item)
+    on_job_items = list(outstanding_items(job))
 
     # THE CORE CHECK: Is the list of items currently on job empty?
     if len(on_job_items) == 0:
@@ -545,25 +450,22 @@ def smart_search_items_view(request, job_id):
     elif search_type == 'on_job':
         job = get_object_or_404(Job, id=job_id)
         # Use our robust "on job" logic to get the correct item PKs
-        all_items_ever_delivered_for_job = InventoryItem.objects.filter(delivery_tickets__job=job).distinct()
-        on_job_items_pks = []
-        for item in all_items_ever_delivered_for_job:
-            if item.status == 'on_job':
-                # (... include the full timestamp comparison logic here ...)
-                last_delivery = item.delivery_tickets.filter(job=job).order_by('-ticket_date').first()
-                last_receiving = item.receiving_tickets.filter(job=job).order_by('-ticket_date').first()
-                if last_delivery and (not last_receiving or last_delivery.ticket_date > last_receiving.ticket_date):
-                    on_job_items_pks.append(item.pk)
-        queryset = queryset.filter(pk__in=on_job_items_pks)
+        queryset = outstanding_items(job)
 
     # Filter by the user's search query
-    items = queryset.filter(serial_number__icontains=query)[:20]
+    # (mode=prefix is the fast path for barcode scanners)
+    if request.GET.get('mode') == 'prefix':
+        queryset = prefix_search_items(queryset, query)
+    else:
+        queryset = search_items(queryset, query, categories=False)
+    items = queryset.select_related('category')[:20]
     
     # Return a rich JSON object with all the data we need
     results = [{
         'id': item.id, 
         'serial': item.serial_number,
         'category': item.category.name,
+        'category_id': item.category_id,
         'location': item.get_location_display()
     } for item in items]
     
@@ -575,23 +477,15 @@ def bulk_check_contract_view(request, job_id):
     if not item_ids:
         return JsonResponse({'error': 'No item IDs provided'}, status=400)
 
-    try:
-        job = Job.objects.select_related('customer__contract').get(id=job_id)
-        
-        # If customer has no contract, all items are out of contract
-        if not hasattr(job.customer, 'contract'):
-            items_out_of_contract = InventoryItem.objects.filter(id__in=item_ids)
-        else:
-            contract_item_categories = job.customer.contract.items.all()
-            # Find all items from the selection that are NOT in the contract categories
-            items_out_of_contract = InventoryItem.objects.filter(id__in=item_ids).exclude(category__in=contract_item_categories)
-
-        # Return a list of the serial numbers for the out-of-contract items
-        out_of_contract_serials = [item.serial_number for item in items_out_of_contract]
-        return JsonResponse({'out_of_contract_serials': out_of_contract_serials})
-
-    except Job.DoesNotExist:
+    customer_id = Job.objects.filter(id=job_id).values_list('customer_id', flat=True).first()
+    if customer_id is None:
         return JsonResponse({'error': 'Job not found'}, status=404)
+
+    # The contract's categories come from the cache (see jobs/contracts.py);
+    # the items' categories are one values_list, compared in memory.
+    # If the customer has no contract, all items are out of contract.
+    out_of_contract_serials = contracts.out_of_contract_serials(customer_id, item_ids)
+    return JsonResponse({'out_of_contract_serials': out_of_contract_serials})
     
 
 @login_required 
@@ -648,10 +542,20 @@ def ticket_edit_view(request, ticket_type, ticket_id):
         if removed_item_ids:
             if ticket_type == 'delivery':
                 # If removed from a DELIVERY ticket, the item becomes AVAILABLE again.
-                InventoryItem.objects.filter(id__in=removed_item_ids).update(status='available')
+                new_status = 'available'
             elif ticket_type == 'receiving':
                 # If removed from a RECEIVING ticket, the item is still ON THE JOB.
-                InventoryItem.objects.filter(id__in=removed_item_ids).update(status='on_job')
+                new_status = 'on_job'
+            # The status change and its ledger rows commit together
+            with transaction.atomic():
+                previous_status = dict(
+                    InventoryItem.objects.select_for_update().filter(id__in=removed_item_ids).values_list('id', 'status')
+                )
+                InventoryItem.objects.filter(id__in=removed_item_ids).update(status=new_status)
+                movements.record(
+                    [(item_id, status, new_status) for item_id, status in previous_status.items()], 'ticket_edit',
+                    job=job, reference=ticket.ticket_number, user=request.user,
+                )
 
         # Update the items
         if ticket_type == 'delivery':
@@ -660,9 +564,9 @@ def ticket_edit_view(request, ticket_type, ticket_id):
             ticket.lines.all().delete() # Remove old item lines
             new_lines = []
             for item_id in new_item_ids:
-                item = InventoryItem.objects.get(id=item_id)
                 # We assume any edited item is still returnable; this could be made more complex if needed.
-                new_lines.append(DeliveryTicketItem(ticket=ticket, item=item, is_returnable=True))
+                # (item_id is enough for the line, no need to load each item)
+                new_lines.append(DeliveryTicketItem(ticket=ticket, item_id=item_id, is_returnable=True))
             DeliveryTicketItem.objects.bulk_create(new_lines)
         else: # Receiving
             # Direct M2M is easy; .set() handles adding and removing
@@ -678,6 +582,7 @@ def ticket_edit_view(request, ticket_type, ticket_id):
         # Update the 'modified_by' field and save
         ticket.modified_by = request.user
         ticket.save()
+        pdf_cache.invalidate_ticket(ticket_type, ticket.id)
 
         messages.success(request, f"Ticket {ticket.ticket_number} updated successfully.")
         return redirect('job_detail', job_id=job.id)
@@ -754,6 +659,10 @@ def delivery_ticket_quick_create_view(request, job_id):
                 # Perform bulk operations for efficiency
                 DeliveryTicketItem.objects.bulk_create(delivery_lines)
                 InventoryItem.objects.bulk_update(found_items, ['status'])
+                movements.record(
+                    [(item.id, 'available', 'on_job') for item in found_items], 'delivery',
+                    job=job, reference=ticket.ticket_number, user=request.user, timestamp=ticket.ticket_date,
+                )
 
                 messages.success(request, f"Successfully created Delivery Ticket {ticket.ticket_number} with {len(found_items)} items.")
                 return redirect('job_detail', job_id=job.id)
@@ -831,118 +740,16 @@ def upload_inspection_report_view(request, ticket_id):
             messages.error(request, "Invalid file type. Please upload an Excel file (.xlsx or .xls).")
             return redirect('upload_inspection_report', ticket_id=ticket.id)
 
-        try:
-            workbook = openpyxl.load_workbook(report_file)
-            sheet = workbook.active
-
-            header_row_index = -1
-            serial_col_index = -1
-            status_col_index = -1
-            reason_col_index = -1
-
-            for i, row in enumerate(sheet.iter_rows(min_row=1, max_row=20, values_only=True)):
-                row_values = [str(cell).lower() if cell is not None else '' for cell in row]
-                found_serial, found_status = False, False
-                for j, cell_value in enumerate(row_values):
-                    if 'serial' in cell_value:
-                        serial_col_index = j
-                        found_serial = True
-                    if 'status' in cell_value:
-                        status_col_index = j
-                        found_status = True
-                    if 'reason' in cell_value: 
-                        reason_col_index = j    
-                if found_serial and found_status:
-                    header_row_index = i + 1
-                    break
-            
-            if header_row_index == -1:
-                raise ValueError("Could not find a header row with 'Serial' and 'Status' columns.")
-
-            report_data = []
-            for row in sheet.iter_rows(min_row=header_row_index + 1, values_only=True):
-                serial = row[serial_col_index]
-                status = row[status_col_index]
-                reason = row[reason_col_index] if reason_col_index != -1 else None
-
-                if serial:
-                    report_data.append({'serial': str(serial).strip(), 'status': str(status).strip().lower(), 'reason': str(reason).strip() if reason else None })
-            
-            items_on_ticket = ticket.items.all()
-            items_on_ticket_map = {item.serial_number: item for item in items_on_ticket}
-            
-            STATUS_ALIASES = {
-                'ok': 'available',
-                'good': 'available',
-                'need repair': 're-cut',
-                'repair': 're-cut', 
-                'damage': 'junk',    
-                'damaged': 'junk',        
-            }
-
-            valid_statuses = [choice[0] for choice in InventoryItem.STATUS_CHOICES]
-            updated_items = []
-            ignored_items = []
-
-            with transaction.atomic():
-                for entry in report_data:
-                    serial = entry['serial']
-                    raw_status = entry['status']
-                    reason_text = entry['reason']
-                    system_status = STATUS_ALIASES.get(raw_status, raw_status)
-
-                    if serial in items_on_ticket_map:
-                        item = items_on_ticket_map[serial]
-                       
-                        if system_status in valid_statuses:
-                            item.status = system_status
-                            if system_status == 're-cut':
-                                item.recut_reason = reason_text
-                            else:
-                                item.recut_reason = None
-
-                            updated_items.append(item)
-                        else:
-                            raise ValueError(f"Invalid or unrecognized status '{raw_status}' for serial number {serial}.")
-                    else:
-                        ignored_items.append(serial)
-            
-                if updated_items:
-                    InventoryItem.objects.bulk_update(updated_items, ['status', 'recut_reason'])
-                
-                ticket.inspection_report.save(report_file.name, report_file, save=True)
-                
-            # --- THIS BLOCK IS NOW CORRECTLY INDENTED ---
-            items_still_pending = ticket.items.filter(status='pending_inspection')
-
-# If there are no items left pending, then the ticket is fully verified.
-            if not items_still_pending.exists():
-               ticket.is_fully_verified = True
-               ticket.save()
-    
-               # Create a GREEN success message
-               success_message = f"Successfully processed the report. All items on this ticket are now verified."
-               if ignored_items:
-                   success_message += f"<br><b>Note:</b> The following items from the report were ignored because they were not on this ticket: {', '.join(ignored_items)}"
-               messages.success(request, success_message, extra_tags='safe')
-
-            else: # Some items are still pending inspection
-               # Create a YELLOW warning message
-               pending_serials = [item.serial_number for item in items_still_pending]
-               warning_message = (
-                   f"Report processed, but some items still need verification. "
-                   f"The following items are still pending inspection: {', '.join(pending_serials)}"
-                )
-               
-               if ignored_items:
-                    warning_message += f" The following items from the report were ignored: {', '.join(ignored_items)}"
-               messages.warning(request, warning_message, extra_tags='safe')
-
-            return redirect('job_detail', job_id=job.id)
-
-        except Exception as e:
-            messages.error(request, f"An error occurred while processing the file: {e}")
-            return redirect('upload_inspection_report', ticket_id=ticket.id)
+        # A worker applies the report (jobs.apply_inspection_report); the task
+        # page shows the outcome and links back to the job.
+        task = enqueue(
+            'jobs.apply_inspection_report',
+            title=f"Inspection report for receiving ticket {ticket.ticket_number}",
+            params={'ticket_id': ticket.id, 'filename': report_file.name},
+            input_file=report_file,
+            user=request.user,
+        )
+        return redirect('task_status', task_id=task.id)
 
     context = {'ticket': ticket}
     return render(request, 'jobs/upload_inspection_report.html', context)
\ No newline at end of file
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import pymysql
 from dotenv import load_dotenv
 import dj_database_url
@@ -69,6 +70,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so its total covers every other middleware too
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     "debug_toolbar.middleware.DebugToolbarMiddleware",
@@ -182,7 +185,35 @@ MEDIA_URL = '/media/'
 
 # This is the absolute path on the server's hard drive where the files will be stored.
 # BASE_DIR is your project's root folder. This will create a 'media' folder there.
-MEDIA_ROOT = BASE_DIR / 'media'
+# The web and the worker (run_tasks) processes must see the same MEDIA_ROOT: uploads
+# for imports/inspection reports are written by the web process and read by the
+# worker (BackgroundTask.input_file), exports the other way round (result_file).
+# start.sh runs both in one container for that reason; a separate worker service
+# needs MEDIA_ROOT on storage both can reach.
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR / 'media'))
+
+# Rendered ticket PDFs are cached here, keyed by ticket content and template version.
+PDF_CACHE_DIR = MEDIA_ROOT / 'pdf_cache'
+PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 512 MB
+PDF_CACHE_MAX_AGE = 30 * 24 * 3600  # 30 days
+# Share of cache writes that also prune the cache (0.01 = one in a hundred).
+PDF_CACHE_PRUNE_RATE = 0.01
+# Size of the process pool that renders ticket PDFs for job exports (None = min(4, CPUs)).
+PDF_RENDER_WORKERS = None
+
+# How inventory imports write their rows: 'staging' (temporary table + one SQL upsert,
+# see inventory/staging.py) or 'orm' (diffed in Python, bulk_create/bulk_update).
+INVENTORY_IMPORT_UPSERT = 'staging'
+
+# Per-request timings (core/middleware.py): a Server-Timing header on every response,
+# and a log line on the 'core.performance' logger for requests slower than
+# PERF_SLOW_REQUEST_MS (a warning). Set PERF_LOG_ALL_REQUESTS=True in the environment
+# to log every request (at INFO). A PERF_SLOW_SAMPLE_RATE share of requests also keeps
+# its SQL, so slow ones among them list their PERF_SLOW_QUERIES slowest statements.
+PERF_LOG_ALL_REQUESTS = os.environ.get('PERF_LOG_ALL_REQUESTS', 'False') == 'True'
+PERF_SLOW_REQUEST_MS = 1000
+PERF_SLOW_SAMPLE_RATE = 0.1
+PERF_SLOW_QUERIES = 5
 
 
 DISCORD_WEBHOOK_URL = 'https://discord.com/api/webhooks/1442494009959383040/bR5-JV_nx50lwk8XfmdFIYUzyLwxmJz0nGpeuoRuInE7U8zUc4H4-k9Z0oY_tJukwzga'
@@ -228,6 +259,13 @@ LOGGING = {
             'level': 'INFO', # The logger will process all messages of INFO level and up
             'propagate': True,
         },
+        # Request timings from ServerTimingMiddleware, one JSON line per logged request
+        # (silent under manage.py test: assertLogs still sees the lines)
+        'core.performance': {
+            'handlers': ['console'],
+            'level': 'CRITICAL' if sys.argv[1:2] == ['test'] else 'INFO' if PERF_LOG_ALL_REQUESTS else 'WARNING',
+            'propagate': False,
+        },
     },
 }
 
@@ -0,0 +1,23 @@
+#!/bin/sh
+# start.sh
+# Starts the web service: the background task worker (run_tasks) and gunicorn,
+# in the same container.
+#
+# They have to run side by side: task input files (import uploads, inspection
+# reports) are written to MEDIA_ROOT by the web process and read by the worker,
+# and results (exports, job ZIPs) the other way round. The worker also reads job
+# attachments. On Railway a volume attaches to a single service, so a separate
+# worker service would not see those files.
+#
+# Extra arguments go to gunicorn, e.g. `sh start.sh --timeout 120`.
+
+# Restart the worker if it ever exits; it stops with the container
+(
+    while true; do
+        python manage.py run_tasks
+        echo "run_tasks exited, restarting in 5 seconds..."
+        sleep 5
+    done
+) &
+
+exec gunicorn napesco_portal.wsgi --bind "0.0.0.0:${PORT:-8000}" "$@"